@@ -13,6 +13,21 @@ def bytes_to_int(b: bytes) -> int:
     #字节串转整数（大端序）
     return int.from_bytes(b, 'big')
 
+def kdf(Z: bytes, klen: int) -> bytes:
+    #密钥派生函数（GB/T 32918.4 5.4.3）：依次拼接Ha_i = SM3(Z || ct)，ct为从1开始的32位计数器，取前klen字节
+    t = b''
+    ct = 1
+    while len(t) < klen:
+        t += sm3_hash(Z + ct.to_bytes(4, byteorder='big'))
+        ct += 1
+    return t[:klen]
+
+def xor_keystream(data: bytes, t: bytes) -> bytes:
+    #明文/密文与等长密钥流t整块异或：转为大整数一次异或，结果与逐字节data[i] ^ t[i]相同
+    if not data:
+        return b''
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(t[:len(data)], 'big')).to_bytes(len(data), 'big')
+
 def precompute_Z(ID: bytes, Q: ECPoint) -> bytes:
     #计算用户标识杂凑值Z，作为签名消息杂凑的前缀
     #Z = SM3(ENTL || ID || a || b || xG || yG || xA || yA)
@@ -32,12 +47,16 @@ def generate_key():
 
 def encrypt(Q: ECPoint, plaintext: bytes):
     #SM2加密算法。输入公钥Q和明文，输出密文三元组
-    k = random.randint(1, n-1)
-    kG = G.multiply(k)
-    kQ = Q.multiply(k)
-    x2, y2 = kQ.x, kQ.y
-    t = sm3_hash(int_to_bytes(x2) + int_to_bytes(y2))
-    c2 = bytes([p ^ t[i % len(t)] for i, p in enumerate(plaintext)])
+    #C2 = M xor KDF(x2 || y2, klen)；t全为0时重新选取k（GB/T 32918.4 6.1节A5）
+    while True:
+        k = random.randint(1, n-1)
+        kG = G.multiply(k)
+        kQ = Q.multiply(k)
+        x2, y2 = kQ.x, kQ.y
+        t = kdf(int_to_bytes(x2) + int_to_bytes(y2), len(plaintext))
+        if not plaintext or any(t):
+            break
+    c2 = xor_keystream(plaintext, t)
     c3 = sm3_hash(int_to_bytes(x2) + plaintext + int_to_bytes(y2))
     return (kG.x, kG.y), c2, c3
 
@@ -47,8 +66,10 @@ def decrypt(k: int, cipher):
     c1 = ECPoint(x1, y1)
     kc1 = c1.multiply(k)
     x2, y2 = kc1.x, kc1.y
-    t = sm3_hash(int_to_bytes(x2) + int_to_bytes(y2))
-    plaintext = bytes([c ^ t[i % len(t)] for i, c in enumerate(c2)])
+    t = kdf(int_to_bytes(x2) + int_to_bytes(y2), len(c2))
+    if c2 and not any(t):
+        raise ValueError("解密失败")
+    plaintext = xor_keystream(c2, t)
     if sm3_hash(int_to_bytes(x2) + plaintext + int_to_bytes(y2)) != c3:
         raise ValueError("解密失败")
     return plaintext
@@ -1,3 +1,5 @@
+import contextlib
+
 #SM2椭圆曲线参数（GB/T 35276-2017）
 p = 0x8542D69E4C044F18E8B92435BF6FF7DE457283915C45517D722EDB8B08F1DFC3
 a = 0x787968B4FA32C3FD2417842E73BBFEFF2F3C848B6831D7E0EC65228B3937E498
@@ -54,4 +56,34 @@ class ECPoint:
         return result
 
 #基点G实例
-G = ECPoint(Gx, Gy)
\ No newline at end of file
+G = ECPoint(Gx, Gy)
+
+#运算计数（按需启用）：count_operations()期间临时替换ECPoint.__add__，按分支统计
+#仿射坐标下一般点加为1I + 2M + 1S，倍点为1I + 2M + 2S；与无穷远点相加或P + (-P)不计
+#退出时恢复原方法，未启用时没有额外开销
+OPERATION_KINDS = ('mul', 'sqr', 'inv', 'add', 'dbl')
+
+@contextlib.contextmanager
+def count_operations():
+    ops = dict.fromkeys(OPERATION_KINDS, 0)
+    original = ECPoint.__add__
+
+    def counted_add(self, other):
+        if not (self.is_infinity or other.is_infinity):
+            if self.x != other.x:
+                ops['add'] += 1
+                ops['mul'] += 2
+                ops['sqr'] += 1
+                ops['inv'] += 1
+            elif (self.y + other.y) % p != 0:
+                ops['dbl'] += 1
+                ops['mul'] += 2
+                ops['sqr'] += 2
+                ops['inv'] += 1
+        return original(self, other)
+
+    ECPoint.__add__ = counted_add
+    try:
+        yield ops
+    finally:
+        ECPoint.__add__ = original
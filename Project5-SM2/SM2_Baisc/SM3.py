@@ -1,3 +1,7 @@
+def rotl(x, n):
+    #32位循环左移
+    return ((x << n) | (x >> (32 - n))) & 0xFFFFFFFF
+
 def sm3_hash(message: bytes) -> bytes:
     #SM3哈希函数，输入为字节串，输出为32字节哈希值
     #算法流程严格遵循国标GB/T 32905-2016
@@ -18,27 +22,27 @@ def sm3_hash(message: bytes) -> bytes:
         B = message[i:i+64]
         W = [0] * 68
         for j in range(16):
-            W[j] = int.from_bytes(B[j*4:(j+1)*4], 'big') & 0xFFFFFFFF
+            W[j] = int.from_bytes(B[j*4:(j+1)*4], 'big')
         for j in range(16, 68):
-            W[j] = (W[j-16] ^ W[j-9] ^ \
-                   ((W[j-3] << 15) | (W[j-3] >> 17)) ^ \
-                   ((W[j-13] << 7) | (W[j-13] >> 25))) & 0xFFFFFFFF
+            x = W[j-16] ^ W[j-9] ^ rotl(W[j-3], 15)
+            W[j] = x ^ rotl(x, 15) ^ rotl(x, 23) ^ rotl(W[j-13], 7) ^ W[j-6]
         W_ = [W[j] ^ W[j+4] for j in range(64)]
 
         A, B_, C, D, E, F, G_, H = V
         for j in range(64):
             if j < 16:
-                SS1 = ((A << 12) | (A >> 20)) + E + (T[0] << j)
+                SS1 = rotl((rotl(A, 12) + E + rotl(T[0], j)) & 0xFFFFFFFF, 7)
+                FF = A ^ B_ ^ C
+                GG = E ^ F ^ G_
             else:
-                SS1 = ((A << 12) | (A >> 20)) + E + (T[1] << (j % 32))
-            SS1 = SS1 & 0xFFFFFFFF
-            SS2 = SS1 ^ ((A << 12) | (A >> 20))
-            TT1 = (A ^ B_ ^ C) + D + SS2 + W_[j]
-            TT2 = (E ^ F ^ G_) + H + SS1 + W[j]
-            TT1, TT2 = TT1 & 0xFFFFFFFF, TT2 & 0xFFFFFFFF
-            A, B_, C, D = TT1, A, (B_ << 9) | (B_ >> 23), C
-            E = (TT2 ^ ((TT2 << 9) | (TT2 >> 23)) ^ ((TT2 << 17) | (TT2 >> 15))) & 0xFFFFFFFF
-            F, G_, H = E, F, G_
+                SS1 = rotl((rotl(A, 12) + E + rotl(T[1], j % 32)) & 0xFFFFFFFF, 7)
+                FF = (A & B_) | (A & C) | (B_ & C)
+                GG = (E & F) | (~E & G_)
+            SS2 = SS1 ^ rotl(A, 12)
+            TT1 = (FF + D + SS2 + W_[j]) & 0xFFFFFFFF
+            TT2 = (GG + H + SS1 + W[j]) & 0xFFFFFFFF
+            A, B_, C, D = TT1, A, rotl(B_, 9), C
+            E, F, G_, H = TT2 ^ rotl(TT2, 9) ^ rotl(TT2, 17), E, rotl(F, 19), G_
         V = [(V[k] ^ [A, B_, C, D, E, F, G_, H][k]) & 0xFFFFFFFF for k in range(8)]
     hex_digest = ''.join(f'{x:08x}' for x in V)
     return bytes.fromhex(hex_digest)
\ No newline at end of file
@@ -1,8 +1,14 @@
 from SM2_Sign import SM2Signature
-from SM2 import generate_key, encrypt, decrypt
+from SM2 import generate_key, encrypt, decrypt, kdf, xor_keystream
+from SM2_Base import G, n, ECPoint, count_operations, OPERATION_KINDS
+from SM3 import sm3_hash
 import time
 
 def test_all():
+    #========== SM3标准向量测试 ==========
+    assert sm3_hash(b"abc").hex() == "66c7f0f462eeedd9d1f2d46bdc10e4e24167c4875cf2f7a2297da02b8f4ba8e0", "SM3标准向量错误"
+    print("SM3标准向量测试通过")
+
     #========== SM2加解密测试 ==========
     k, Q = generate_key()
     print("密钥对生成成功")
@@ -12,6 +18,20 @@ def test_all():
     assert decrypted == plaintext, "加解密失败"
     print("加解密测试通过")
 
+    #KDF：GB/T 32918.5示例中x2 || y2派生的t（与优化实现的密文互通）
+    Z = bytes.fromhex("335E18D751E51F040E27D468138B7AB1DC86AD7F981D7D416222FD6AB3ED230D"
+                      "AB743EBCFB22D64F7B6AB791F70658F25B48FA93E54064FDBFBED3F0BD847AC9")
+    assert kdf(Z, 19).hex() == "44e60fdbf0bae81437665374bef26749046c9e", "KDF结果错误"
+    assert kdf(Z, 70)[:19] == kdf(Z, 19) and len(kdf(Z, 70)) == 70 and kdf(Z, 0) == b""
+
+    #整块异或与逐字节异或结果一致
+    t = kdf(b"keystream", 1000)
+    for length in (0, 1, 31, 32, 33, 1000):
+        data = bytes(range(256)) * 4
+        data = data[:length]
+        assert xor_keystream(data, t) == bytes([c ^ t[i] for i, c in enumerate(data)]), "整块异或结果错误"
+    print("整块异或测试通过")
+
     #========== SM2签名/验签测试 ==========
     signer = SM2Signature()
     d, Q2 = signer.generate_keypair()
@@ -53,6 +73,38 @@ def test_performance():
     
     print(f"性能测试: 100次签名耗时{sign_time:.4f}s, 100次验签耗时{verify_time:.4f}s")
 
+def test_operation_counts():
+    #运算计数：二进制展开法每比特一次倍点，每个1比特一次点加；退出后恢复原方法
+    original = ECPoint.__add__
+    k = n - 12345
+    with count_operations() as ops:
+        P = G.multiply(k)
+    assert ECPoint.__add__ is original, "计数结束后应恢复原方法"
+    assert ops['dbl'] == k.bit_length() and ops['add'] == bin(k).count('1') - 1, "点运算计数错误"
+    R = G.multiply(k)
+    assert ops['inv'] == ops['add'] + ops['dbl'] and (P.x, P.y) == (R.x, R.y)
+
+    #每种高层操作的运算代价表
+    signer = SM2Signature()
+    d, Q = signer.generate_keypair()
+    signature = signer.sign(b"cost", d, Q)
+    cipher = encrypt(Q, b"cost")  #密文在计数之外生成，decrypt一行只计解密本身
+    rows = [("G.multiply(k)", lambda: G.multiply(k)),
+            ("sign", lambda: signer.sign(b"cost", d, Q)),
+            ("verify", lambda: signer.verify(b"cost", signature, Q)),
+            ("encrypt", lambda: encrypt(Q, b"cost")),
+            ("decrypt", lambda: decrypt(d, cipher))]
+    counts = {}
+    print("运算代价表: " + " ".join(f"{kind:>6}" for kind in OPERATION_KINDS))
+    for label, fn in rows:
+        with count_operations() as ops:
+            fn()
+        counts[label] = dict(ops)
+        print(f"  {label:<14}" + " ".join(f"{ops[kind]:>6}" for kind in OPERATION_KINDS))
+    #解密只有一次点乘dC1，加密有kG与kQ两次
+    assert counts["decrypt"]["dbl"] < counts["encrypt"]["dbl"], "decrypt的计数不应包含加密"
+
 if __name__ == "__main__":
     test_all()
+    test_operation_counts()
     test_performance()
\ No newline at end of file
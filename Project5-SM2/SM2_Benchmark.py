@@ -0,0 +1,383 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+#SM2基础实现与优化实现的性能基准
+#两个实现的模块同名（SM2/SM2_Sign/SM3），每个实现在独立子进程中导入并测量，结果以JSON返回
+#每项指标先预热，再逐次计时，报告中位数/p95延迟及按中位数换算的吞吐量
+#优化实现的公钥表缓存（KeyTableCache）首次遇到公钥时建wNAF表，第promote_after次使用时升级为固定点表，
+#因此验签与加密分两种指标报告：
+#  verify/encrypt：测试公钥先用满promote_after次，测量升级后的热点公钥路径，p95不含一次性建表
+#  verify-cold/encrypt-cold：每次换一个新公钥，测量调用方第一次使用某公钥时的代价（含Z值与建表）
+#
+#用法：
+#  python SM2_Benchmark.py -o result.json                       运行并保存结果
+#  python SM2_Benchmark.py --compare baseline.json             运行并与基线比较，回退超过阈值时退出码为1
+#  python SM2_Benchmark.py --input result.json --compare baseline.json --threshold 0.15
+#  python SM2_Benchmark.py --reports [名称,...]                 优化实现各组件的专项吞吐量报告
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+IMPLEMENTATIONS = {
+    'basic': os.path.join(ROOT, 'SM2_Baisc'),
+    'opti': os.path.join(ROOT, 'SM2_Opti'),
+}
+DEFAULT_SIZES = (64, 1024, 16384)  #消息字节数
+DEFAULT_THRESHOLD = 0.10  #吞吐量下降超过10%视为回退
+
+def _summarize(latencies, size=None):
+    #延迟列表（秒） -> 中位数/p95（毫秒）与吞吐量
+    ordered = sorted(latencies)
+    median = ordered[len(ordered) // 2] if len(ordered) % 2 else \
+        (ordered[len(ordered) // 2 - 1] + ordered[len(ordered) // 2]) / 2
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    result = {
+        'runs': len(ordered),
+        'median_ms': median * 1e3,
+        'p95_ms': p95 * 1e3,
+        'ops_per_sec': 1 / median,
+    }
+    if size is not None:
+        result['mb_per_sec'] = size / median / 1e6
+    return result
+
+def _measure(fn, iterations, warmup, size=None):
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return _summarize(latencies, size)
+
+def _promote_keys(points):
+    #把公钥推过KeyTableCache的升级阈值，至多使用promote_after次（基础实现没有该缓存，直接返回）
+    try:
+        from SM2_Base import key_tables
+    except ImportError:
+        return
+    for point in points:
+        for _ in range(key_tables.promote_after):
+            if key_tables.entry(point).fixed is not None:
+                break
+
+def run_worker(name, sizes, iterations, warmup):
+    #在当前进程中测量一个实现（由子进程调用），返回{指标名: 统计}
+    sys.path.insert(0, IMPLEMENTATIONS[name])
+    from SM2 import generate_key, encrypt, decrypt
+    from SM2_Sign import SM2Signature
+    from SM3 import sm3_hash
+
+    results = {}
+    signer = SM2Signature()
+    d, Q = signer.generate_keypair()
+    k, P = generate_key()
+    _promote_keys([Q, P])
+    results['keygen'] = _measure(signer.generate_keypair, iterations, warmup)
+    for size in sizes:
+        message = os.urandom(size)
+        signature = signer.sign(message, d, Q)
+        cipher = encrypt(P, message)
+        results[f'sign/{size}'] = _measure(lambda: signer.sign(message, d, Q), iterations, warmup)
+        results[f'verify/{size}'] = _measure(lambda: signer.verify(message, signature, Q), iterations, warmup)
+        results[f'encrypt/{size}'] = _measure(lambda: encrypt(P, message), iterations, warmup)
+        #冷路径：每次计时使用一个未见过的公钥（密钥生成与签名在计时之外）
+        fresh = [signer.generate_keypair() for _ in range(warmup + iterations)]
+        fresh_signed = iter([(signer.sign(message, key, public), public) for key, public in fresh])
+        fresh_public = iter([public for _, public in fresh])
+        results[f'verify-cold/{size}'] = _measure(
+            lambda: signer.verify(message, *next(fresh_signed)), iterations, warmup)
+        results[f'encrypt-cold/{size}'] = _measure(
+            lambda: encrypt(next(fresh_public), message), iterations, warmup)
+        results[f'decrypt/{size}'] = _measure(lambda: decrypt(k, cipher), iterations, warmup)
+        results[f'sm3/{size}'] = _measure(lambda: sm3_hash(message), iterations, warmup, size)
+    return results
+
+def run_benchmark(implementations=tuple(IMPLEMENTATIONS), sizes=DEFAULT_SIZES, iterations=20, warmup=3):
+    #逐个实现启动子进程测量，汇总为一个JSON对象
+    report = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'config': {'sizes': list(sizes), 'iterations': iterations, 'warmup': warmup},
+        'results': {},
+    }
+    for name in implementations:
+        command = [sys.executable, os.path.abspath(__file__), '--worker', name,
+                   '--sizes', ','.join(map(str, sizes)),
+                   '--iterations', str(iterations), '--warmup', str(warmup)]
+        output = subprocess.run(command, cwd=IMPLEMENTATIONS[name], check=True,
+                                stdout=subprocess.PIPE, text=True).stdout
+        report['results'][name] = json.loads(output)
+    return report
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    #逐项比较吞吐量，返回回退项列表[(实现, 指标, 基线ops/s, 当前ops/s, 变化比例)]
+    #只比较两边都存在的指标
+    regressions = []
+    for name, metrics in baseline['results'].items():
+        for metric, old in metrics.items():
+            new = current['results'].get(name, {}).get(metric)
+            if new is None:
+                continue
+            change = new['ops_per_sec'] / old['ops_per_sec'] - 1
+            if change < -threshold:
+                regressions.append((name, metric, old['ops_per_sec'], new['ops_per_sec'], change))
+    return regressions
+
+def format_report(report):
+    #按指标列出各实现的中位数延迟、p95与吞吐量，并给出优化实现相对基础实现的加速比
+    results = report['results']
+    names = list(results)
+    metrics = list(next(iter(results.values()))) if results else []
+    lines = [f"{'metric':<20}" + ''.join(f"{name + ' median/p95 ms':>28}{'ops/s':>12}" for name in names) +
+             ('    speedup' if {'basic', 'opti'} <= set(names) else '')]
+    for metric in metrics:
+        line = f'{metric:<20}'
+        for name in names:
+            stats = results[name].get(metric)
+            if stats is None:
+                line += f"{'-':>28}{'-':>12}"
+                continue
+            line += f"{stats['median_ms']:>18.3f} / {stats['p95_ms']:<7.3f}{stats['ops_per_sec']:>12.1f}"
+        if {'basic', 'opti'} <= set(names) and metric in results['basic'] and metric in results['opti']:
+            line += f"{results['opti'][metric]['ops_per_sec'] / results['basic'][metric]['ops_per_sec']:>10.2f}x"
+        if metric.startswith('sm3/'):
+            line += '  (' + ', '.join(f"{name} {results[name][metric]['mb_per_sec']:.3f}MB/s"
+                                      for name in names if metric in results[name]) + ')'
+        lines.append(line)
+    return '\n'.join(lines)
+
+#优化实现各组件的专项报告：只在当前进程导入优化实现，逐项打印（Test_Opti.py只做行为检查，不计时）
+def report_xor():
+    #密钥流异或吞吐量：整块异或 vs 逐字节异或（100MB只测整块路径）
+    from SM2 import xor_bytes
+    for label, size in (("1KB", 1 << 10), ("1MB", 1 << 20), ("100MB", 100 << 20)):
+        data, key = os.urandom(size), os.urandom(size)
+        start = time.perf_counter()
+        xor_bytes(data, key)
+        bulk = size / (time.perf_counter() - start) / 1e6
+        line = f"密钥流异或{label}: 整块{bulk:.1f}MB/s"
+        if size <= 1 << 20:
+            start = time.perf_counter()
+            bytes([c ^ key[i] for i, c in enumerate(data)])
+            line += f", 逐字节{size / (time.perf_counter() - start) / 1e6:.1f}MB/s"
+        print(line)
+        del data, key
+
+def report_pool():
+    #多进程批量服务：1 ~ N个进程的吞吐量（N为CPU核数，至少测到2）
+    from SM2_Pool import benchmark_scaling
+    for processes, rates in benchmark_scaling(max(2, os.cpu_count() or 1), count=128):
+        print(f"多进程批量服务{processes}进程: " + ", ".join(f"{op} {rate:.0f}次/秒" for op, rate in rates.items()))
+
+def report_sm3_many():
+    #批量SM3吞吐量（短消息，按批大小；不足NUMPY_SM3_MIN_LANES条时逐条计算）
+    import SM3
+    path = "NumPy多通道" if SM3.np is not None else f"逐条{SM3.SM3_BACKEND}后端"
+    for batch in (1, 16, 64, 256, 4096):
+        records = [b"record-%08d" % i for i in range(batch)]
+        start = time.perf_counter()
+        SM3.sm3_hash_many(records)
+        elapsed = time.perf_counter() - start
+        print(f"批量SM3({path})批大小{batch}: {batch / elapsed:.0f}次/秒")
+
+def report_hmac():
+    #HMAC-SM3短消息：缓存内外层中间状态 vs 标准库hmac每条消息重新压缩密钥分组
+    import hmac
+    from SM3 import SM3, SM3HMACKey
+    key = SM3HMACKey(b"benchmark key")
+    records = [b"record-%08d" % i for i in range(200)]
+    start = time.perf_counter()
+    for record in records:
+        key.mac(record)
+    cached = len(records) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for record in records:
+        hmac.new(b"benchmark key", record, SM3).digest()
+    uncached = len(records) / (time.perf_counter() - start)
+    print(f"HMAC-SM3短消息: 缓存中间状态{cached:.0f}次/秒, 标准库hmac{uncached:.0f}次/秒")
+
+def report_sm3_backends():
+    #各SM3后端的长消息吞吐量（原生后端须先用SM3_Native.py build编译）
+    import SM3
+    import SM3_Native
+    data = bytes(1 << 16)
+    backends = {'python': SM3.python_sm3_hash}
+    backends.update((name, SM3_Native.load_backend(name).oneshot) for name in SM3_Native.available_backends())
+    for name, hash_function in backends.items():
+        rounds = 4 if name == 'python' else 200
+        start = time.perf_counter()
+        for _ in range(rounds):
+            hash_function(data)
+        elapsed = time.perf_counter() - start
+        print(f"SM3后端{name}: {rounds * len(data) / elapsed / 1e6:.2f}MB/s")
+
+def report_fixed_base():
+    #固定点预计算表规模与密钥生成（固定点点乘）耗时
+    from SM2_Base import get_precomputed_table
+    from SM2_Sign import SM2Signature
+    precomputed_G = get_precomputed_table()
+    print(f"固定点预计算表: 窗口宽度{precomputed_G.window}, {precomputed_G.size()}个仿射点, "
+          f"约{precomputed_G.memory_bytes() / 1024:.0f}KB")
+    signer = SM2Signature()
+    start = time.perf_counter()
+    for _ in range(100):
+        signer.generate_keypair()
+    print(f"密钥生成: 100次耗时{time.perf_counter() - start:.4f}s")
+
+def report_fields():
+    #各域运算后端单次约简耗时、当前选择的后端，及sm2p256v1上各后端的非固定点点乘吞吐量
+    from SM2_Base import get_curve
+    from SM2_Field import SM2P256_P, available_backends, benchmark_fields
+    timings = benchmark_fields(SM2P256_P)
+    print("域运算后端约简耗时: " + ", ".join(f"{name} {t * 1e6:.2f}us" for name, t in timings.items()) +
+          f"; 当前选择: {get_curve().field.name}")
+    for backend in available_backends(SM2P256_P):
+        curve = get_curve('sm2p256v1', backend)
+        scalars = [curve.n - 12345 * (i + 1) for i in range(20)]
+        start = time.perf_counter()
+        for k in scalars:
+            curve.G.multiply(k)
+        elapsed = time.perf_counter() - start
+        print(f"域运算后端{backend}: {len(scalars) / elapsed:.1f}次点乘/秒")
+
+def report_strategies():
+    #非固定点点乘各策略耗时（默认策略见SM2_Base.NON_FIXED_STRATEGY）
+    from SM2_Base import G, n, SCALAR_MULT_STRATEGIES, NON_FIXED_STRATEGY
+    P = G.multiply(12345).to_affine()
+    scalars = [n - 12345 * (i + 1) for i in range(20)]
+    for strategy in SCALAR_MULT_STRATEGIES:
+        start = time.perf_counter()
+        for k in scalars:
+            P.multiply_non_fixed(k, strategy)
+        elapsed = time.perf_counter() - start
+        default = '（默认）' if strategy == NON_FIXED_STRATEGY else ''
+        print(f"非固定点点乘策略{strategy}{default}: 平均{elapsed / len(scalars) * 1000:.2f}ms")
+
+def report_stream():
+    #流式加密吞吐量（纯Python SM3时受其速度限制）
+    import io
+    from SM2 import generate_key, encrypt_stream
+    _, Q = generate_key()
+    data = bytes(16 * 1024)
+    start = time.perf_counter()
+    encrypt_stream(Q, io.BytesIO(data), io.BytesIO())
+    elapsed = time.perf_counter() - start
+    print(f"流式加密: {len(data) // 1024}KB耗时{elapsed:.3f}s, {len(data) / elapsed / 1024:.1f}KB/s")
+
+def report_handles():
+    #绑定密钥的句柄：每密钥的Z值、(1+d)^-1与Q的预计算表只在构造时计算一次
+    from SM2_Sign import SM2Signature, SM2PrivateKeyHandle
+    d, _ = SM2Signature().generate_keypair()
+    message = b"Test Message" * 10
+    start = time.perf_counter()
+    private = SM2PrivateKeyHandle(d)
+    public = private.public_key
+    setup_time = time.perf_counter() - start
+    signature = private.sign(message)
+    start = time.perf_counter()
+    for _ in range(100):
+        private.sign(message)
+    handle_sign_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(100):
+        public.verify(message, signature)
+    handle_verify_time = time.perf_counter() - start
+    print(f"密钥句柄: 构造耗时{setup_time:.4f}s, 100次签名耗时{handle_sign_time:.4f}s, "
+          f"100次验签耗时{handle_verify_time:.4f}s")
+
+def report_sm3_compress():
+    #SM3压缩函数：两段展开实现 vs 逐轮分支实现
+    import SM3
+    block = bytes(range(64))
+    timings = {}
+    for compress in (SM3._compress_loop, SM3._compress):
+        start = time.perf_counter()
+        for _ in range(500):
+            compress(SM3.IV, block)
+        timings[compress.__name__] = (time.perf_counter() - start) / 500
+    print(f"SM3压缩函数: 逐轮分支{timings['_compress_loop'] * 1e6:.0f}us/分组, "
+          f"两段展开{timings['_compress'] * 1e6:.0f}us/分组, "
+          f"加速{timings['_compress_loop'] / timings['_compress']:.2f}x")
+
+REPORTS = {
+    'xor': report_xor,
+    'pool': report_pool,
+    'sm3_many': report_sm3_many,
+    'hmac': report_hmac,
+    'sm3_backends': report_sm3_backends,
+    'fixed_base': report_fixed_base,
+    'fields': report_fields,
+    'strategies': report_strategies,
+    'stream': report_stream,
+    'handles': report_handles,
+    'sm3_compress': report_sm3_compress,
+}
+
+def run_reports(names=None):
+    sys.path.insert(0, IMPLEMENTATIONS['opti'])
+    for name in names or REPORTS:
+        REPORTS[name]()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='SM2基础实现/优化实现性能基准')
+    parser.add_argument('--impl', default=','.join(IMPLEMENTATIONS),
+                        help='要测量的实现，逗号分隔（basic,opti）')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='消息字节数，逗号分隔')
+    parser.add_argument('--iterations', type=int, default=20, help='每项指标的计时次数')
+    parser.add_argument('--warmup', type=int, default=3, help='每项指标的预热次数')
+    parser.add_argument('-o', '--output', help='结果JSON的保存路径')
+    parser.add_argument('--input', help='不重新测量，直接读取已有结果JSON')
+    parser.add_argument('--compare', metavar='BASELINE', help='与基线JSON比较，有回退时退出码为1')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='允许的吞吐量下降比例（默认0.10）')
+    parser.add_argument('--reports', nargs='?', const='', metavar='NAMES',
+                        help=f"只运行优化实现的专项报告，逗号分隔（默认全部：{', '.join(REPORTS)}）")
+    parser.add_argument('--worker', choices=IMPLEMENTATIONS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+
+    if args.reports is not None:
+        names = [name for name in args.reports.split(',') if name]
+        for name in names:
+            if name not in REPORTS:
+                parser.error(f'未知的报告: {name}')
+        run_reports(names)
+        return 0
+
+    if args.worker:
+        json.dump(run_worker(args.worker, sizes, args.iterations, args.warmup), sys.stdout)
+        return 0
+
+    if args.input:
+        with open(args.input, encoding='utf-8') as f:
+            report = json.load(f)
+    else:
+        implementations = [name for name in args.impl.split(',') if name]
+        for name in implementations:
+            if name not in IMPLEMENTATIONS:
+                parser.error(f'未知的实现: {name}')
+        report = run_benchmark(implementations, sizes, args.iterations, args.warmup)
+    print(format_report(report))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for name, metric, old, new, change in regressions:
+            print(f'回退: {name} {metric} {old:.1f} -> {new:.1f} ops/s ({change:+.1%})')
+        if regressions:
+            return 1
+        print(f'与基线相比无超过{args.threshold:.0%}的回退')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,22 @@
 import random
-from SM2_Base import a, b, Gx, Gy, G, n, p, ECPoint, mod_inverse, multiply_fixed
-from SM3 import sm3_hash
+
+try:
+    import numpy as np  #可选依赖：有NumPy时大块异或走向量化路径
+except ImportError:
+    np = None
+
+from SM2_Base import p, ECPoint, mod_inverse, multiply_fixed, batch_normalize, \
+                     key_tables, get_curve
+from SM2_Field import MontgomeryField
+from SM2_Codec import encode_point, decode_point, point_size
+from SM3 import SM3
+from SM2_Sign import ZCache
 
 #蒙哥马利模约参数（预计算）
-r = 1 << 256
+montgomery_field = MontgomeryField(p)
+r = montgomery_field.R
 r_inv = mod_inverse(r, p)
-r_sq = (r * r) % p
+r_sq = montgomery_field.r_sq
 
 def montgomery_mul(a: int, b: int) -> int:
     #蒙哥马利乘法：计算 (a * b) mod p
@@ -14,16 +25,12 @@ def montgomery_mul(a: int, b: int) -> int:
     return (a * b) % p
 
 def montgomery_reduce(t: int) -> int:
-    #蒙哥马利约简：将 t * r 约简到 [0, p)
-    m = (t * r_inv) % r
-    u = (t + m * p) // r
-    if u >= p:
-        u -= p
-    return u
+    #蒙哥马利约简（REDC）：计算 t * r^-1 mod p
+    return montgomery_field.reduce(t)
 
 def montgomery_mul_domain(a: int, b: int) -> int:
-    #蒙哥马利域乘法：假设输入已在蒙哥马利域中
-    return montgomery_reduce(a * b)
+    #蒙哥马利域乘法：假设输入已在蒙哥马利域中（a·r, b·r -> a·b·r）
+    return montgomery_field.reduce(a * b)
 
 def int_to_bytes(x: int, length: int = None) -> bytes:
     if length is None:
@@ -34,67 +41,213 @@ def int_to_bytes(x: int, length: int = None) -> bytes:
 def bytes_to_int(b: bytes) -> int:
     return int.from_bytes(b, 'big')
 
+#加解密模块共享的Z值缓存
+z_cache = ZCache()
+
 def precompute_Z(ID: bytes, Q: ECPoint) -> bytes:
-    #计算用户标识杂凑值Z
-    ID = ID or b'1234567812345678'
-    entl = len(ID) * 8
-    data = int_to_bytes(entl, 2) + ID + int_to_bytes(a) + int_to_bytes(b) + \
-           int_to_bytes(Gx) + int_to_bytes(Gy) + int_to_bytes(Q.x) + int_to_bytes(Q.y)
-    return sm3_hash(data)
-
-def generate_key():
-    #生成密钥对（使用预计算表优化）
-    k = random.randint(1, n-1)
-    Q = multiply_fixed(k)  #固定点G的点乘使用预计算表
+    #计算用户标识杂凑值Z（按(ID, Q)缓存）
+    return z_cache.get(ID, Q)
+
+def compute_c3(x2: int, message: bytes, y2: int) -> bytes:
+    #C3 = SM3(x2 || M || y2)，增量哈希避免拼接大块明文
+    h = SM3(int_to_bytes(x2))
+    h.update(message)
+    h.update(int_to_bytes(y2))
+    return h.digest()
+
+def kdf_blocks(Z: bytes):
+    #GB/T 32918.4密钥派生函数的分组生成器：依次产出Ha_i = SM3(Z || ct)，ct为从1开始的32位计数器
+    #Z = x2 || y2恰为一个64字节分组，先压缩一次保存中间状态，之后每个分组只需一次压缩
+    base = SM3(Z)
+    ct = 1
+    while True:
+        h = base.copy()
+        h.update(ct.to_bytes(4, byteorder='big'))
+        yield h.digest()
+        ct += 1
+
+def kdf(Z: bytes, klen: int) -> bytes:
+    #密钥派生函数：输出klen字节
+    blocks = kdf_blocks(Z)
+    return b''.join(next(blocks) for _ in range((klen + 31) // 32))[:klen]
+
+#不小于该长度时使用NumPy异或（更短的数据大整数路径更快）
+NUMPY_XOR_THRESHOLD = 4096
+
+def xor_bytes(data, key) -> bytes:
+    #整块异或：转为大整数一次异或（或NumPy向量化异或），避免逐字节循环（key长度不小于data）
+    length = len(data)
+    if not length:
+        return b''
+    if np is not None and length >= NUMPY_XOR_THRESHOLD:
+        return np.bitwise_xor(np.frombuffer(data, dtype=np.uint8),
+                              np.frombuffer(key, dtype=np.uint8, count=length)).tobytes()
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(key[:length], 'big')).to_bytes(length, 'big')
+
+def keystream_is_zero(t: bytes, length: int = None) -> bool:
+    #GB/T 32918.4 A5/B4：t全为0时加密须重新选取k，解密须报错（空明文不检查）
+    #length给出时只检查t的前length字节（流式接口只检查第一个密钥流分组）
+    t = t if length is None else t[:length]
+    return len(t) > 0 and not any(t)
+
+class _KeyStream:
+    #按需从KDF分组生成器中取出任意长度的密钥流；first_block为第一个分组，供全0检查
+    def __init__(self, Z: bytes):
+        self._blocks = kdf_blocks(Z)
+        self._pending = self.first_block = next(self._blocks)
+
+    def read(self, size: int) -> bytes:
+        need = size - len(self._pending)
+        parts = [self._pending]
+        if need > 0:
+            parts.extend(next(self._blocks) for _ in range((need + 31) // 32))
+        stream = b''.join(parts)
+        self._pending = stream[size:]
+        return stream[:size]
+
+STREAM_CHUNK_SIZE = 1 << 16
+
+def generate_key(curve=None):
+    #生成密钥对（使用预计算表优化），curve默认为测试曲线
+    curve = curve or get_curve()
+    k = random.randint(1, curve.n-1)
+    Q = multiply_fixed(k, curve).to_affine()  #固定点G的点乘使用预计算表
     return k, Q
 
+def generate_keys(count: int, curve=None):
+    #批量生成密钥对：所有公钥共用一次模逆转换为仿射坐标
+    curve = curve or get_curve()
+    ks = [random.randint(1, curve.n-1) for _ in range(count)]
+    Qs = batch_normalize([multiply_fixed(k, curve) for k in ks])
+    return list(zip(ks, Qs))
+
+def _encrypt_with_points(C1: ECPoint, kQ: ECPoint, plaintext: bytes):
+    #由仿射坐标的C1 = kG与kQ = (x2, y2)生成密文三元组；t = KDF(x2 || y2, klen)全为0时返回None，调用方换k重试
+    #C2 = M xor t（GB/T 32918.4），与encrypt_stream/decrypt_stream的密钥流相同
+    x2, y2 = kQ.x, kQ.y
+    t = kdf(int_to_bytes(x2) + int_to_bytes(y2), len(plaintext))
+    if keystream_is_zero(t):
+        return None
+    c2 = xor_bytes(plaintext, t)
+    c3 = compute_c3(x2, plaintext, y2)
+    return (C1.x, C1.y), c2, c3
+
 def encrypt(Q: ECPoint, plaintext: bytes):
-    #加密优化：预计算表+蒙哥马利模乘
-    k = random.randint(1, n-1)
-    #优化1：固定点G的点乘使用预计算表
-    kG = multiply_fixed(k)
-    #优化2：非固定点Q的点乘使用Co-Z方法
-    kQ = Q.multiply_non_fixed(k)
-    
-    #优化3：蒙哥马利模乘加速坐标转换
-    z_inv = mod_inverse(kQ.z, p)
-    z_inv_sq = montgomery_mul(z_inv, z_inv)
-    z_inv_cu = montgomery_mul(z_inv_sq, z_inv)
-    x2 = montgomery_mul(kQ.x, z_inv_sq)
-    y2 = montgomery_mul(kQ.y, z_inv_cu)
-    
-    #流水线计算哈希值
-    t = sm3_hash(int_to_bytes(x2) + int_to_bytes(y2))
-    c2 = bytes([p ^ t[i % len(t)] for i, p in enumerate(plaintext)])
-    c3 = sm3_hash(int_to_bytes(x2) + plaintext + int_to_bytes(y2))
-    
-    #kG坐标转换（复用蒙哥马利优化）
-    z1_inv = mod_inverse(kG.z, p)
-    z1_inv_sq = montgomery_mul(z1_inv, z1_inv)
-    z1_inv_cu = montgomery_mul(z1_inv_sq, z1_inv)
-    c1x = montgomery_mul(kG.x, z1_inv_sq)
-    c1y = montgomery_mul(kG.y, z1_inv_cu)
-    return (c1x, c1y), c2, c3
-
-def decrypt(k: int, cipher):
-    #解密优化：Co-Z点乘+模运算优化
+    #加密优化：预计算表 + 联合求逆（曲线取自公钥Q）
+    while True:
+        k = random.randint(1, Q.curve.n-1)
+        #优化1：固定点G的点乘使用预计算表
+        kG = multiply_fixed(k, Q.curve)
+        #优化2：Q的点乘使用公钥预计算表缓存（热点公钥自动升级为固定点路径）
+        kQ = key_tables.multiply(Q, k)
+        #优化3：kG与kQ共用一次模逆转换为仿射坐标
+        kG, kQ = batch_normalize([kG, kQ])
+        cipher = _encrypt_with_points(kG, kQ, plaintext)
+        if cipher is not None:  #t全为0时重新选取k
+            return cipher
+
+def encrypt_batch(Q: ECPoint, plaintexts):
+    #批量加密：全部2n个点（kG与kQ）共用一次模逆转换为仿射坐标
+    plaintexts = list(plaintexts)
+    points = []
+    for _ in plaintexts:
+        k = random.randint(1, Q.curve.n-1)
+        points.append(multiply_fixed(k, Q.curve))
+        points.append(key_tables.multiply(Q, k))
+    points = batch_normalize(points)
+    #个别t全为0的明文单独换k重新加密
+    return [_encrypt_with_points(points[2*i], points[2*i+1], plaintext) or encrypt(Q, plaintext)
+            for i, plaintext in enumerate(plaintexts)]
+
+def decrypt(k: int, cipher, curve=None):
+    #解密优化：Co-Z点乘+模运算优化，curve须与加密时公钥所在曲线一致
+    curve = curve or get_curve()
     (x1, y1), c2, c3 = cipher
-    c1 = ECPoint(x1, y1)
-    #优化1：使用Co-Z非固定点点乘
+    #B1：C1须为曲线上的点，否则私钥会与无效曲线上的点相乘
+    if not (0 <= x1 < curve.p and 0 <= y1 < curve.p) or \
+            (y1 * y1 - x1 * x1 * x1 - curve.a * x1 - curve.b) % curve.p != 0:
+        raise ValueError("C1不在曲线上")
+    c1 = ECPoint(x1, y1, curve=curve)
+    #优化1：非固定点点乘（默认为Jacobian NAF，可选共Z Montgomery阶梯）
     kc1 = c1.multiply_non_fixed(k)
     
-    #优化2：蒙哥马利模乘加速坐标转换
-    z_inv = mod_inverse(kc1.z, p)
-    z_inv_sq = montgomery_mul(z_inv, z_inv)
-    z_inv_cu = montgomery_mul(z_inv_sq, z_inv)
-    x2 = montgomery_mul(kc1.x, z_inv_sq)
-    y2 = montgomery_mul(kc1.y, z_inv_cu)
+    #优化2：使用曲线域后端的约简加速坐标转换
+    red = curve.field.mod
+    z_inv = curve.field.inv(kc1.z)
+    z_inv_sq = red(z_inv * z_inv)
+    z_inv_cu = red(z_inv_sq * z_inv)
+    x2 = red(kc1.x * z_inv_sq)
+    y2 = red(kc1.y * z_inv_cu)
     
-    #优化3：复用哈希计算结果
-    t = sm3_hash(int_to_bytes(x2) + int_to_bytes(y2))
-    plaintext = bytes([c ^ t[i % len(t)] for i, c in enumerate(c2)])
+    #优化3：KDF的x2 || y2分组只压缩一次，密钥流整块异或
+    t = kdf(int_to_bytes(x2) + int_to_bytes(y2), len(c2))
+    if keystream_is_zero(t):
+        raise ValueError("解密失败")
+    plaintext = xor_bytes(c2, t)
     
-    if sm3_hash(int_to_bytes(x2) + plaintext + int_to_bytes(y2)) != c3:
+    if compute_c3(x2, plaintext, y2) != c3:
         raise ValueError("解密失败")
     return plaintext
-    
\ No newline at end of file
+    
+def encrypt_stream(Q: ECPoint, reader, writer, chunk_size: int = STREAM_CHUNK_SIZE,
+                   compressed: bool = False) -> int:
+    #流式加密：从reader读出明文，向writer依次写出C1 || C2 || C3，返回明文字节数
+    #C1默认为65字节未压缩格式，compressed为True时写出33字节压缩格式
+    #C2 = M xor KDF(x2 || y2, klen)，密钥流按计数器分组惰性生成；C3 = SM3(x2 || M || y2)增量计算
+    #内存占用只与chunk_size有关，与明文长度无关
+    #先读第一块明文：第一个密钥流分组中被它覆盖的部分全为0时重新选取k（短明文即t全为0）
+    curve = Q.curve
+    chunk = reader.read(chunk_size)
+    while True:
+        k = random.randint(1, curve.n-1)
+        C1, kQ = batch_normalize([multiply_fixed(k, curve), key_tables.multiply(Q, k)])
+        x2, y2 = int_to_bytes(kQ.x), int_to_bytes(kQ.y)
+        keystream = _KeyStream(x2 + y2)
+        if not keystream_is_zero(keystream.first_block, len(chunk)):
+            break
+    c3 = SM3(x2)
+    writer.write(encode_point(C1, compressed))
+    total = 0
+    while chunk:
+        c3.update(chunk)
+        writer.write(xor_bytes(chunk, keystream.read(len(chunk))))
+        total += len(chunk)
+        chunk = reader.read(chunk_size)
+    c3.update(y2)
+    writer.write(c3.digest())
+    return total
+
+def decrypt_stream(k: int, reader, writer, curve=None, chunk_size: int = STREAM_CHUNK_SIZE) -> int:
+    #流式解密encrypt_stream的输出，返回明文字节数
+    #明文边解密边写出，第一个密钥流分组全为0或C3校验失败时在末尾抛出ValueError，调用方应丢弃已写出的内容
+    curve = curve or get_curve()
+    prefix = reader.read(1)
+    if not prefix or prefix[0] not in (2, 3, 4):
+        raise ValueError("C1格式错误")
+    header = prefix + reader.read(point_size(curve, compressed=prefix[0] != 4) - 1)
+    C1 = decode_point(header, curve)  #长度不符或不在曲线上时抛出ValueError
+    kC1 = C1.multiply_non_fixed(k).to_affine()
+    x2, y2 = int_to_bytes(kC1.x), int_to_bytes(kC1.y)
+    keystream = _KeyStream(x2 + y2)
+    c3 = SM3(x2)
+    tail = b''  #末尾32字节为C3，始终保留最后32字节不解密
+    total = 0
+    while True:
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            break
+        data = tail + chunk
+        body, tail = data[:-32], data[-32:]
+        if body:
+            plain = xor_bytes(body, keystream.read(len(body)))
+            c3.update(plain)
+            writer.write(plain)
+            total += len(body)
+    if len(tail) != 32:
+        raise ValueError("密文长度不足")
+    if keystream_is_zero(keystream.first_block, total):
+        raise ValueError("解密失败")
+    c3.update(y2)
+    if c3.digest() != tail:
+        raise ValueError("解密失败")
+    return total
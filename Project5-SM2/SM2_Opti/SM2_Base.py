@@ -1,3 +1,12 @@
+import contextlib
+import hashlib
+import os
+import sys
+import tempfile
+from collections import OrderedDict
+
+from SM2_Field import fastest_field, make_field, cache_dir
+
 #SM2椭圆曲线参数（GB/T 35276-2017）
 p = 0x8542D69E4C044F18E8B92435BF6FF7DE457283915C45517D722EDB8B08F1DFC3
 a = 0x787968B4FA32C3FD2417842E73BBFEFF2F3C848B6831D7E0EC65228B3937E498
@@ -10,68 +19,224 @@ def mod_inverse(x, mod):
     #计算x关于mod的乘法逆元
     return pow(x, -1, mod)
 
+def _xycz_add(X1, Y1, X2, Y2, p, red):
+    #XYCZ-ADD：共Z点P1, P2 -> (P1 + P2, P1')，两结果共享新的Z' = Z·(X1 - X2)，全程不涉及Z
+    C = red((X1 - X2) ** 2)
+    W1 = red(X1 * C)
+    W2 = red(X2 * C)
+    A1 = red(Y1 * (W1 - W2))
+    dY = Y1 - Y2
+    X3 = (red(dY * dY) - W1 - W2) % p
+    Y3 = (red(dY * (W1 - X3)) - A1) % p
+    return X3, Y3, W1, A1
+
+def _xycz_addc(X1, Y1, X2, Y2, p, red):
+    #XYCZ-ADDC：共Z点P1, P2 -> (P1 + P2, P1 - P2)，共享中间量，两结果同Z
+    C = red((X1 - X2) ** 2)
+    W1 = red(X1 * C)
+    W2 = red(X2 * C)
+    A1 = red(Y1 * (W1 - W2))
+    dY = Y1 - Y2
+    X3 = (red(dY * dY) - W1 - W2) % p
+    Y3 = (red(dY * (W1 - X3)) - A1) % p
+    sY = Y1 + Y2
+    X4 = (red(sY * sY) - W1 - W2) % p
+    Y4 = (red(sY * (W1 - X4)) - A1) % p
+    return X3, Y3, X4, Y4
+
+#Jacobian点运算元组核心：点表示为(X, Y, Z)，Z == 0表示无穷远点，输入输出坐标均已约简到[0, p)
+#坐标与系数a均为域后端的表示（蒙哥马利域后端下为x·R mod p），red为该后端的乘积约简
+JACOBIAN_INFINITY = (1, 1, 0)
+
+def jacobian_double(X1, Y1, Z1, a, p, red):
+    #倍点：2M + 4S + 若干乘常数
+    if not Z1 or not Y1:
+        return JACOBIAN_INFINITY
+    Y1_sq = red(Y1 * Y1)
+    Z1_sq = red(Z1 * Z1)
+    S = red(4 * X1 * Y1_sq)
+    M = (red(3 * X1 * X1) + red(a * red(Z1_sq * Z1_sq))) % p
+    X3 = (red(M * M) - 2 * S) % p
+    Y3 = (red(M * (S - X3)) - red(8 * Y1_sq * Y1_sq)) % p
+    return X3, Y3, red(2 * Y1 * Z1)
+
+def jacobian_add_mixed(X1, Y1, Z1, x2, y2, a, p, red, one=1):
+    #Jacobian + 仿射混合点加（(x2, y2)为有限点）：8M + 3S，one为域内表示的1
+    if not Z1:
+        return x2, y2, one
+    Z1_sq = red(Z1 * Z1)
+    H = (red(x2 * Z1_sq) - X1) % p
+    R = (red(y2 * red(Z1_sq * Z1)) - Y1) % p
+    if not H:
+        if not R:
+            return jacobian_double(X1, Y1, Z1, a, p, red)  #同一点，退化为倍点
+        return JACOBIAN_INFINITY  #互逆点
+    H_sq = red(H * H)
+    H_cu = red(H_sq * H)
+    V = red(X1 * H_sq)
+    X3 = (red(R * R) - H_cu - 2 * V) % p
+    Y3 = (red(R * (V - X3)) - red(Y1 * H_cu)) % p
+    return X3, Y3, red(Z1 * H)
+
+def jacobian_add(X1, Y1, Z1, X2, Y2, Z2, a, p, red):
+    #一般Jacobian点加：12M + 4S
+    if not Z1:
+        return X2, Y2, Z2
+    if not Z2:
+        return X1, Y1, Z1
+    Z1_sq = red(Z1 * Z1)
+    Z2_sq = red(Z2 * Z2)
+    U1 = red(X1 * Z2_sq)
+    S1 = red(Y1 * red(Z2_sq * Z2))
+    H = (red(X2 * Z1_sq) - U1) % p
+    R = (red(Y2 * red(Z1_sq * Z1)) - S1) % p
+    if not H:
+        if not R:
+            return jacobian_double(X1, Y1, Z1, a, p, red)
+        return JACOBIAN_INFINITY
+    H_sq = red(H * H)
+    H_cu = red(H_sq * H)
+    V = red(U1 * H_sq)
+    X3 = (red(R * R) - H_cu - 2 * V) % p
+    Y3 = (red(R * (V - X3)) - red(S1 * H_cu)) % p
+    return X3, Y3, red(red(Z1 * Z2) * H)
+
+class Curve:
+    #椭圆曲线 y² = x³ + ax + b (mod p) 的参数及其域运算后端
+    #未指定后端时使用缓存的测量结果或固定默认后端（见SM2_Field.fastest_field）
+    #同一曲线的不同后端实例各自持有独立的基点预计算表
+    def __init__(self, name, p, a, b, n, Gx, Gy, field=None):
+        self.name = name
+        self.p, self.a, self.b, self.n = p, a, b, n
+        self.Gx, self.Gy = Gx, Gy
+        self.field = field or fastest_field(p)
+        self.field_a = self.field.to_domain(a)  #点运算核心使用的域内表示系数a
+        self.G = ECPoint(Gx, Gy, curve=self)  #基点（Jacobian坐标z=1）
+        self.precomputed = None  #基点G的FixedBaseTable，首次使用时载入或构建
+        self._variants = {self.field.name: self}
+
+    def with_field(self, backend):
+        #返回使用指定域运算后端的同一曲线
+        variant = self._variants.get(backend)
+        if variant is None:
+            variant = Curve(self.name, self.p, self.a, self.b, self.n, self.Gx, self.Gy,
+                            make_field(self.p, backend))
+            variant._variants = self._variants
+            self._variants[backend] = variant
+        return variant
+
+    def __reduce__(self):
+        #序列化时只记录名称与后端，反序列化时从注册表取回同一实例（进程池传递点对象时使用）
+        return get_curve, (self.name, self.field.name)
+
+    def __repr__(self):
+        return f'Curve({self.name!r}, field={self.field.name!r})'
+
+#曲线注册表：名称 -> Curve
+CURVES = {}
+
+def register_curve(curve):
+    CURVES[curve.name] = curve
+    return curve
+
+def get_curve(name=None, field=None):
+    #按名称取曲线（默认曲线为sm2-test），field指定域运算后端（generic/solinas/montgomery）
+    curve = CURVES[name] if name is not None else DEFAULT_CURVE
+    return curve.with_field(field) if field is not None else curve
+
 class ECPoint:
-    def __init__(self, x, y, is_infinity=False, z=1):
+    #点对象只在API边界创建；点乘等循环内部使用下方的元组核心，避免每步分配对象与重复取模
+    __slots__ = ('x', 'y', 'z', 'is_infinity', 'curve')
+
+    def __init__(self, x, y, is_infinity=False, z=1, curve=None):
+        curve = curve or DEFAULT_CURVE
+        p = curve.p
+        self.curve = curve
         self.x = x % p
         self.y = y % p
         self.z = z % p  #Jacobian坐标系z分量（仿射坐标z=1）
         self.is_infinity = is_infinity  #无穷远点
 
+    def jacobian(self):
+        #返回普通表示下的(X, Y, Z)，无穷远点为Z = 0
+        if self.is_infinity:
+            return JACOBIAN_INFINITY
+        return self.x, self.y, self.z
+
+    def field_jacobian(self):
+        #返回域后端表示下的(X, Y, Z)，作为元组核心的输入
+        if self.is_infinity:
+            return JACOBIAN_INFINITY
+        field = self.curve.field
+        if not field.domain:
+            return self.x, self.y, self.z
+        to = field.to_domain
+        return to(self.x), to(self.y), to(self.z)
+
+    def infinity(self):
+        #同一曲线上的无穷远点
+        return _point(self.curve, *JACOBIAN_INFINITY)
+
     def copy(self):
-        return ECPoint(self.x, self.y, self.is_infinity, self.z)
+        return _point(self.curve, *self.jacobian())
+
+    def to_affine(self):
+        #Jacobian坐标转换为仿射坐标（z=1）
+        if self.is_infinity or self.z == 1:
+            return self.copy()
+        curve = self.curve
+        mod = curve.field.mod
+        z_inv = curve.field.inv(self.z)
+        z_inv_sq = mod(z_inv * z_inv)
+        return _point(curve, mod(self.x * z_inv_sq), mod(mod(self.y * z_inv_sq) * z_inv), 1)
 
     def __eq__(self, other):
         if self.is_infinity or other.is_infinity:
             return self.is_infinity == other.is_infinity
         #验证Jacobian坐标下的仿射等价性
-        x1z2_sq = (self.x * pow(other.z, 2, p)) % p
-        x2z1_sq = (other.x * pow(self.z, 2, p)) % p
-        y1z2_cu = (self.y * pow(other.z, 3, p)) % p
-        y2z1_cu = (other.y * pow(self.z, 3, p)) % p
-        return x1z2_sq == x2z1_sq and y1z2_cu == y2z1_cu
+        mod = self.curve.field.mod
+        z1_sq = mod(self.z * self.z)
+        z2_sq = mod(other.z * other.z)
+        if mod(self.x * z2_sq) != mod(other.x * z1_sq):
+            return False
+        return mod(self.y * mod(z2_sq * other.z)) == mod(other.y * mod(z1_sq * self.z))
 
     def __add__(self, other):
-        #Jacobian坐标系下的点加法（优化模逆运算）
-        if self.is_infinity:
-            return other.copy()
-        if other.is_infinity:
-            return self.copy()
+        #Jacobian坐标系下的一般点加，仅在H == 0时判断是否退化为倍点
+        curve = self.curve
+        return _from_field(curve, *jacobian_add(*self.field_jacobian(), *other.field_jacobian(),
+                                                curve.field_a, curve.p, curve.field.reduce))
 
-        x1, y1, z1 = self.x, self.y, self.z
-        x2, y2, z2 = other.x, other.y, other.z
+    def double(self):
+        #双倍点计算（Jacobian优化公式）
+        curve = self.curve
+        return _from_field(curve, *jacobian_double(*self.field_jacobian(), curve.field_a, curve.p,
+                                                   curve.field.reduce))
 
-        if self == other:
-            #双倍点计算（Jacobian优化公式）
-            s = (4 * x1 * pow(y1, 2, p)) % p
-            m = (3 * pow(x1, 2, p) + a * pow(z1, 4, p)) % p
-            x3 = (pow(m, 2, p) - 2 * s) % p
-            y3 = (m * (s - x3) - 8 * pow(y1, 4, p)) % p
-            z3 = (2 * y1 * z1) % p
-        else:
-            #不同点加法（Jacobian优化公式）
-            u1 = (x1 * pow(z2, 2, p)) % p
-            u2 = (x2 * pow(z1, 2, p)) % p
-            s1 = (y1 * pow(z2, 3, p)) % p
-            s2 = (y2 * pow(z1, 3, p)) % p
-            h = (u2 - u1) % p
-            r = (s2 - s1) % p
-
-            if h == 0:
-                return ECPoint(0, 0, is_infinity=True)  #互逆点
-
-            h_sq = pow(h, 2, p)
-            h_cu = (h_sq * h) % p
-            x3 = (pow(r, 2, p) - h_cu - 2 * u1 * h_sq) % p
-            y3 = (r * (u1 * h_sq - x3) - s1 * h_cu) % p
-            z3 = (z1 * z2 * h) % p
+    def __neg__(self):
+        #负点：(X, -Y, Z)
+        if self.is_infinity:
+            return self.copy()
+        return _point(self.curve, self.x, (-self.y) % self.curve.p, self.z)
 
-        return ECPoint(x3, y3, z=z3)
+    def add_mixed(self, other):
+        #Jacobian + 仿射混合点加（other.z必须为1），省去other侧的z幂运算
+        if other.is_infinity:
+            return self.copy()
+        curve = self.curve
+        field = curve.field
+        x2, y2, _ = other.field_jacobian()
+        return _from_field(curve, *jacobian_add_mixed(*self.field_jacobian(), x2, y2, curve.field_a,
+                                                      curve.p, field.reduce, field.one))
 
     def multiply(self, scalar):
-        #NAF编码优化点乘（减少30%点加运算）
-        scalar = scalar % n
-        if scalar == 0:
-            return ECPoint(0, 0, is_infinity=True)
+        #NAF编码优化点乘（减少30%点加运算），从高位到低位倍点-混合点加
+        curve = self.curve
+        field = curve.field
+        a, p, red, one = curve.field_a, curve.p, field.reduce, field.one
+        scalar = scalar % curve.n
+        if scalar == 0 or self.is_infinity:
+            return self.infinity()
         
         #NAF编码生成
         naf = []
@@ -85,17 +250,16 @@ class ECPoint:
                 naf.append(0)
             k = k // 2
 
-        result = ECPoint(0, 0, is_infinity=True)
-        current = self.copy()
-        for digit in naf:
+        x, y, _ = self.to_affine().field_jacobian()  #基点转为仿射坐标后可全程使用混合点加
+        neg_y = p - y  #负点运算（避免额外逆运算）
+        X, Y, Z = JACOBIAN_INFINITY
+        for digit in reversed(naf):
+            X, Y, Z = jacobian_double(X, Y, Z, a, p, red)
             if digit == 1:
-                result += current
+                X, Y, Z = jacobian_add_mixed(X, Y, Z, x, y, a, p, red, one)
             elif digit == -1:
-                #负点运算（避免额外逆运算）
-                neg_current = ECPoint(current.x, (-current.y) % p, z=current.z)
-                result += neg_current
-            current = current + current  #双倍点
-        return result
+                X, Y, Z = jacobian_add_mixed(X, Y, Z, x, neg_y, a, p, red, one)
+        return _from_field(curve, X, Y, Z)
 
     def add_co_z(self, other):
         #Co-Z点加优化（当self.z == other.z时使用）
@@ -108,25 +272,79 @@ class ECPoint:
         if self == other:
             return self + other  #调用双倍点方法
         
+        curve = self.curve
+        p, red = curve.p, curve.field.mod
         x1, y1, z = self.x, self.y, self.z
         x2, y2 = other.x, other.y
 
         #Co-Z点加公式（优化版）
-        A = pow((x2 - x1) % p, 2, p)
-        B = (x1 * A) % p
-        C = (x2 * A) % p
-        D = pow((y2 - y1) % p, 2, p)
+        A = red((x2 - x1) ** 2)
+        B = red(x1 * A)
+        C = red(x2 * A)
+        D = red((y2 - y1) ** 2)
         x3 = (D - B - C) % p
-        y3 = ((y2 - y1) * (B - x3) - y1 * (C - B)) % p
-        z3 = (z * (x2 - x1)) % p
+        y3 = red((y2 - y1) * (B - x3)) - red(y1 * (C - B))
+        z3 = red(z * (x2 - x1))
+
+        return ECPoint(x3, y3, z=z3, curve=curve)
+
+    def multiply_ladder(self, scalar):
+        #共Z Montgomery阶梯点乘：每比特固定执行一次XYCZ-ADDC与一次XYCZ-ADD，只维护(X, Y)
+        #标量先规约为k + n或k + 2n，使迭代次数恒为n的比特长度，与k无关
+        #循环内无模逆，最终由R_b = ±P反推公共Z，只做一次模逆得到仿射结果
+        curve = self.curve
+        field = curve.field
+        p, n, red = curve.p, curve.n, field.reduce
+        k = scalar % n
+        if k == 0 or self.is_infinity:
+            return self.infinity()
+        if k == 1 or k >= n - 2:
+            #例外标量：阶梯中间结果会出现无穷远点或X坐标相同的两点
+            return self.multiply(k).to_affine()
+        xP, yP, _ = self.to_affine().field_jacobian()
+        k += n
+        if k.bit_length() == n.bit_length():
+            k += n
+
+        #XYCZ-IDBL：R1 = 2P，R0 = P，两者共Z = 2yP
+        yP_sq = red(yP * yP)
+        S = red(4 * xP * yP_sq)
+        T = red(8 * yP_sq * yP_sq)
+        M = (red(3 * xP * xP) + curve.field_a) % p
+        X1 = (red(M * M) - 2 * S) % p
+        X = [S, X1]
+        Y = [T, (red(M * (S - X1)) - T) % p]
+
+        for i in range(k.bit_length() - 2, 0, -1):
+            b = (k >> i) & 1
+            #(R_{1-b}, R_b) <- XYCZ-ADDC(R_b, R_{1-b})；(R_b, R_{1-b}) <- XYCZ-ADD(R_{1-b}, R_b)
+            X[1-b], Y[1-b], X[b], Y[b] = _xycz_addc(X[b], Y[b], X[1-b], Y[1-b], p, red)
+            X[b], Y[b], X[1-b], Y[1-b] = _xycz_add(X[1-b], Y[1-b], X[b], Y[b], p, red)
+
+        b = k & 1
+        X[1-b], Y[1-b], X[b], Y[b] = _xycz_addc(X[b], Y[b], X[1-b], Y[1-b], p, red)
+        #此时R_b = (b ? P : -P)，由X_b = xP·Z², Y_b = ±yP·Z³反推Z，再乘上最后一次加法的Z因子
+        signed_yP = yP if b else p - yP
+        num = red(X[b] * signed_yP)
+        den = red(red(Y[b] * xP) * (X[1-b] - X[b]))
+        X[b], Y[b], X[1-b], Y[1-b] = _xycz_add(X[1-b], Y[1-b], X[b], Y[b], p, red)
+        #出口：转回普通表示后计算lam = 1/Z与仿射坐标
+        fr, mod = field.from_domain, field.mod
+        lam = mod(fr(num) * field.inv(fr(den)))
+        lam_sq = mod(lam * lam)
+        return _point(curve, mod(fr(X[0]) * lam_sq), mod(mod(fr(Y[0]) * lam_sq) * lam), 1)
 
-        return ECPoint(x3, y3, z=z3)
+    def multiply_non_fixed(self, scalar, strategy=None):
+        #非固定点点乘，strategy可选SCALAR_MULT_STRATEGIES中的策略，默认使用NON_FIXED_STRATEGY
+        return SCALAR_MULT_STRATEGIES[strategy or NON_FIXED_STRATEGY](self, scalar)
 
-    def multiply_non_fixed(self, scalar):
-        #非固定点点乘（结合NAF编码和Co-Z优化）
-        scalar = scalar % n
+    def multiply_co_z_naf(self, scalar):
+        #非固定点点乘（结合NAF编码和Co-Z优化，每位需一次模逆对齐Z坐标，仅作对照保留）
+        curve = self.curve
+        red = curve.field.mod
+        scalar = scalar % curve.n
         if scalar == 0:
-            return ECPoint(0, 0, is_infinity=True)
+            return self.infinity()
         
         #生成NAF编码
         naf = []
@@ -140,52 +358,572 @@ class ECPoint:
                 naf.append(0)
             k = k // 2
 
-        result = ECPoint(0, 0, is_infinity=True, z=self.z)  #保持Z一致
+        result = ECPoint(0, 0, is_infinity=True, z=self.z, curve=curve)  #保持Z一致
         current = self.copy()
         for digit in naf:
             if digit == 1:
                 #使用Co-Z点加（result与current的Z相同）
                 result = result.add_co_z(current)
             elif digit == -1:
-                neg_current = ECPoint(current.x, (-current.y) % p, z=current.z)
+                neg_current = -current
                 result = result.add_co_z(neg_current)
             #双倍点时保持Z一致
             current = current + current
             #强制current的Z与result一致（通过坐标转换）
             if result.z != current.z:
-                z_ratio = (result.z * mod_inverse(current.z, p)) % p
-                current.x = (current.x * pow(z_ratio, 2, p)) % p
-                current.y = (current.y * pow(z_ratio, 3, p)) % p
+                z_ratio = red(result.z * curve.field.inv(current.z))
+                z_ratio_sq = red(z_ratio * z_ratio)
+                current.x = red(current.x * z_ratio_sq)
+                current.y = red(current.y * red(z_ratio_sq * z_ratio))
                 current.z = result.z
         return result
 
-#基点G实例（Jacobian坐标z=1）
-G = ECPoint(Gx, Gy)
+def _point(curve, X, Y, Z):
+    #由普通表示的已约简坐标直接构造点对象，跳过__init__中的取模
+    P = object.__new__(ECPoint)
+    if Z:
+        P.x, P.y, P.z, P.is_infinity = X, Y, Z, False
+    else:
+        P.x, P.y, P.z, P.is_infinity = 0, 0, 1, True
+    P.curve = curve
+    return P
 
-#固定点G的预计算表（窗口宽度w=8，存储256个预计算点）
-precomputed_G = []
+def _from_field(curve, X, Y, Z):
+    #出口转换：元组核心结果（域后端表示）转回普通表示并构造点对象
+    field = curve.field
+    if field.domain and Z:
+        fr = field.from_domain
+        X, Y, Z = fr(X), fr(Y), fr(Z)
+    return _point(curve, X, Y, Z)
 
-def init_precomputed_table():
-    #初始化固定点G的预计算表，存储G, 2G, 4G, ..., 2^255G
-    global precomputed_G
-    precomputed_G = [G.copy()]
-    current = G.copy()
-    for _ in range(255):
-        current = current + current  #预计算双倍点
-        precomputed_G.append(current)
+def field_points(points):
+    #入口转换：仿射点列表转为域后端表示的点（仅供点乘循环读取x, y），非域后端原样返回
+    finite = [P for P in points if not P.is_infinity]
+    if not finite or not finite[0].curve.field.domain:
+        return points
+    curve = finite[0].curve
+    to = curve.field.to_domain
+    return [P if P.is_infinity else _point(curve, to(P.x), to(P.y), 1) for P in points]
 
-def multiply_fixed(scalar):
-    #使用预计算表优化的固定点点乘（仅用于G的点乘）
-    scalar = scalar % n
-    if scalar == 0:
-        return ECPoint(0, 0, is_infinity=True)
-    
-    result = ECPoint(0, 0, is_infinity=True)
-    #遍历标量二进制位，通过预计算表加速点乘
-    for i in range(256):
-        if (scalar >> i) & 1:
-            result += precomputed_G[i]  #查表获取2^i*G
+#非固定点点乘策略：名称 -> ECPoint方法
+SCALAR_MULT_STRATEGIES = {
+    'ladder': ECPoint.multiply_ladder,  #共Z Montgomery阶梯（无循环内模逆，迭代次数固定）
+    'naf': ECPoint.multiply,  #Jacobian NAF
+    'co_z_naf': ECPoint.multiply_co_z_naf,
+}
+#默认使用Jacobian NAF（实测最快）；阶梯的迭代次数与标量无关，需要时经环境变量SM2_OPTI_SCALAR_MULT=ladder选用
+NON_FIXED_STRATEGY = os.environ.get('SM2_OPTI_SCALAR_MULT', 'naf')
+if NON_FIXED_STRATEGY not in SCALAR_MULT_STRATEGIES:
+    NON_FIXED_STRATEGY = 'naf'
+
+#国标推荐曲线sm2p256v1（GB/T 32918.5-2017）
+SM2P256V1 = register_curve(Curve(
+    'sm2p256v1',
+    p=0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFF,
+    a=0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFC,
+    b=0x28E9FA9E9D9F5E344D5A9E4BCF6509A7F39789F515AB8F92DDBCBD414D940E93,
+    n=0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFF7203DF6B21C6052B53BBF40939D54123,
+    Gx=0x32C4AE2C1F1981195F9904466A39C9948FE30BBFF2660BE1715A4589334C74C7,
+    Gy=0xBC3736A2F4F6779C59BDCEE36B692153D0A9877CC62A474002DF32E52139F0A0))
+
+#本实验默认使用的测试曲线（即上方模块级参数p, a, b, n, Gx, Gy）
+DEFAULT_CURVE = register_curve(Curve('sm2-test', p, a, b, n, Gx, Gy))
+
+def points_memory(points):
+    #估算点列表占用内存（列表 + 点对象（__slots__，无实例字典） + 坐标整数）
+    total = sys.getsizeof(points)
+    for P in points:
+        total += sys.getsizeof(P) + sys.getsizeof(P.x) + sys.getsizeof(P.y)
+    return total
+
+def batch_inverse(values, mod):
+    #Montgomery联合求逆：n个非零元素只需1次模逆 + 3(n-1)次模乘
+    if not values:
+        return []
+    prefix = [0] * len(values)
+    acc = 1
+    for i, v in enumerate(values):
+        prefix[i] = acc
+        acc = (acc * v) % mod
+    acc_inv = mod_inverse(acc, mod)
+    result = [0] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        result[i] = (acc_inv * prefix[i]) % mod
+        acc_inv = (acc_inv * values[i]) % mod
     return result
 
-#初始化预计算表
-init_precomputed_table()
+def batch_normalize(points):
+    #批量Jacobian→仿射转换：全部z坐标共用一次模逆（Montgomery技巧），无穷远点原样保留
+    #所有点须位于同一曲线上
+    finite = [P for P in points if not P.is_infinity]
+    if not finite:
+        return [P.copy() for P in points]
+    curve = finite[0].curve
+    mod = curve.field.mod
+    z_invs = iter(batch_inverse([P.z for P in finite], curve.p))
+    result = []
+    for P in points:
+        if P.is_infinity:
+            result.append(P.copy())
+            continue
+        z_inv = next(z_invs)
+        z_inv_sq = mod(z_inv * z_inv)
+        result.append(_point(curve, mod(P.x * z_inv_sq), mod(mod(P.y * z_inv_sq) * z_inv), 1))
+    return result
+
+def wnaf(scalar, width):
+    #宽度为width的NAF编码（低位在前）：非零位均为奇数且|d| < 2^(width-1)，相邻width位内至多一个非零位
+    digits = []
+    mask = (1 << width) - 1
+    half = 1 << (width - 1)
+    while scalar > 0:
+        if scalar & 1:
+            d = scalar & mask
+            if d >= half:
+                d -= 1 << width
+            scalar -= d
+        else:
+            d = 0
+        digits.append(d)
+        scalar >>= 1
+    return digits
+
+def odd_multiples(point, width):
+    #预计算奇数倍点[P, 3P, 5P, ..., (2^(width-1)-1)P]，以仿射坐标存储供混合点加使用
+    P = point.to_affine()
+    P2 = P.double()
+    result = [P]
+    current = P
+    for _ in range((1 << (width - 2)) - 1):
+        current = P2 + current
+        result.append(current)
+    return batch_normalize(result)
+
+#默认曲线基点G实例（Jacobian坐标z=1）
+G = DEFAULT_CURVE.G
+
+class FixedBaseTable:
+    #固定基点w比特固定窗口预计算表
+    #table[i][j] = j * 2^(w*i) * P，全部以仿射坐标存储
+    #点乘k*P = Σ table[i][k_i]，k_i为k的第i个w比特窗口，无需倍点，仅需⌈256/w⌉次混合点加
+    def __init__(self, point, window=4, table=None):
+        if not 1 <= window <= 16:
+            raise ValueError("窗口宽度必须在1~16之间")
+        self.curve = point.curve
+        self.window = window
+        self.num_windows = (self.curve.n.bit_length() + window - 1) // window
+        self.mask = (1 << window) - 1
+        self._field_table = None  #域后端表示的表，首次点乘时生成
+        if table is not None:
+            self.table = table  #从缓存载入的现成表
+            return
+        #各窗口基点2^(w*i) * P（Jacobian倍点链），统一转换为仿射坐标
+        bases = [point.copy()]
+        for _ in range(self.num_windows - 1):
+            base = bases[-1]
+            for _ in range(window):
+                base = base.double()
+            bases.append(base)
+        bases = batch_normalize(bases)
+
+        #每行j * base（混合点加），整表一次批量转换为仿射坐标
+        points = []
+        for base in bases:
+            current = base
+            points.append(base)
+            for _ in range(2, 1 << window):
+                current = current.add_mixed(base)
+                points.append(current)
+        points = batch_normalize(points)
+        per_row = (1 << window) - 1
+        self.table = [[point.infinity()] + points[i:i+per_row]
+                      for i in range(0, len(points), per_row)]
+
+    def field_table(self):
+        #点乘循环使用的表：非域后端即table本身，蒙哥马利域后端为一次性转换后的副本
+        if self._field_table is None:
+            self._field_table = [field_points(row) for row in self.table]
+        return self._field_table
+
+    def multiply(self, scalar, result=None):
+        #result不为空时在其基础上累加（用于s*G + t*Q两张表共用一个累加器）
+        curve = self.curve
+        field = curve.field
+        a, p, red, one = curve.field_a, curve.p, field.reduce, field.one
+        scalar = scalar % curve.n
+        X, Y, Z = result.field_jacobian() if result is not None else JACOBIAN_INFINITY
+        window, mask = self.window, self.mask
+        for row in self.field_table():
+            digit = scalar & mask
+            if digit:
+                P = row[digit]
+                X, Y, Z = jacobian_add_mixed(X, Y, Z, P.x, P.y, a, p, red, one)
+            scalar >>= window
+        return _from_field(curve, X, Y, Z)
+
+    def to_bytes(self) -> bytes:
+        #序列化：逐行逐项写出仿射坐标x||y（各32字节），跳过每行的无穷远点
+        return b''.join(P.x.to_bytes(32, 'big') + P.y.to_bytes(32, 'big')
+                        for row in self.table for P in row[1:])
+
+    @classmethod
+    def from_bytes(cls, point, window, data):
+        #由to_bytes的输出重建预计算表
+        data = memoryview(data)
+        curve = point.curve
+        table = []
+        per_row = (1 << window) - 1
+        offset = 0
+        for _ in range((curve.n.bit_length() + window - 1) // window):
+            row = [point.infinity()]
+            for _ in range(per_row):
+                row.append(ECPoint(int.from_bytes(data[offset:offset+32], 'big'),
+                                   int.from_bytes(data[offset+32:offset+64], 'big'), curve=curve))
+                offset += 64
+            table.append(row)
+        if offset != len(data):
+            raise ValueError("预计算表数据长度不匹配")
+        return cls(point, window, table)
+
+    def size(self):
+        #预计算表中的非无穷远点个数
+        return self.num_windows * ((1 << self.window) - 1)
+
+    def memory_bytes(self):
+        #估算预计算表占用内存（点对象 + 坐标整数 + 行列表）
+        return sys.getsizeof(self.table) + sum(points_memory(row) for row in self.table)
+
+#固定点G的预计算表（默认窗口宽度w=4：64个窗口 × 15个点），每条曲线各存一份于curve.precomputed
+#导入时优先从磁盘缓存载入默认曲线的表；缓存不存在时推迟到首次multiply_fixed调用再构建
+DEFAULT_WINDOW = 4
+
+#磁盘缓存文件格式：MAGIC || 版本 || 窗口宽度 || 曲线参数摘要(32B) || 表数据 || SHA-256校验和(32B)
+CACHE_MAGIC = b'SM2FBT'
+CACHE_VERSION = 1
+
+def _curve_digest(window, curve=None):
+    #缓存键：曲线参数 + 窗口宽度 + 格式版本，任一变化都会使旧缓存失效（表内容与域运算后端无关）
+    curve = curve or DEFAULT_CURVE
+    h = hashlib.sha256()
+    for v in (curve.p, curve.a, curve.b, curve.n, curve.Gx, curve.Gy):
+        h.update(v.to_bytes(32, 'big'))
+    h.update(bytes([CACHE_VERSION, window]))
+    return h.digest()
+
+def table_cache_path(window=DEFAULT_WINDOW, curve=None):
+    #缓存目录见SM2_Field.cache_dir（环境变量SM2_OPTI_CACHE_DIR或__pycache__）
+    return os.path.join(cache_dir(), f'sm2_fixed_base_w{window}_{_curve_digest(window, curve)[:8].hex()}.bin')
+
+def save_table_cache(table, path=None):
+    #原子写入缓存文件（先写临时文件再替换），写入失败时静默忽略
+    path = path or table_cache_path(table.window, table.curve)
+    body = CACHE_MAGIC + bytes([CACHE_VERSION, table.window]) + \
+           _curve_digest(table.window, table.curve) + table.to_bytes()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(body + hashlib.sha256(body).digest())
+        os.replace(tmp, path)
+    except OSError:
+        return False
+    return True
+
+def load_table_cache(window=DEFAULT_WINDOW, path=None, curve=None):
+    #一次读取缓存文件并校验；文件缺失、版本/曲线不符或校验失败时返回None
+    curve = curve or DEFAULT_CURVE
+    path = path or table_cache_path(window, curve)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    header_len = len(CACHE_MAGIC) + 2 + 32
+    if len(data) < header_len + 32:
+        return None
+    body, checksum = memoryview(data)[:-32], data[-32:]
+    if hashlib.sha256(body).digest() != checksum:
+        return None
+    if bytes(body[:len(CACHE_MAGIC)]) != CACHE_MAGIC or \
+       bytes(body[len(CACHE_MAGIC):len(CACHE_MAGIC) + 2]) != bytes([CACHE_VERSION, window]) or \
+       bytes(body[len(CACHE_MAGIC) + 2:header_len]) != _curve_digest(window, curve):
+        return None
+    try:
+        return FixedBaseTable.from_bytes(curve.G, window, body[header_len:])
+    except ValueError:
+        return None
+
+def init_precomputed_table(window=DEFAULT_WINDOW, use_cache=True, curve=None):
+    #初始化曲线基点G的窗口预计算表，窗口宽度可在初始化时指定
+    #use_cache为True时先尝试载入磁盘缓存，未命中则构建后写回缓存
+    curve = curve or DEFAULT_CURVE
+    table = load_table_cache(window, curve=curve) if use_cache else None
+    if table is None:
+        table = FixedBaseTable(curve.G, window)
+        if use_cache:
+            save_table_cache(table)
+    curve.precomputed = table
+    return table
+
+def get_precomputed_table(curve=None):
+    #获取曲线当前的预计算表（尚未构建时按默认参数构建）
+    curve = curve or DEFAULT_CURVE
+    if curve.precomputed is None:
+        init_precomputed_table(curve=curve)
+    return curve.precomputed
+
+def multiply_fixed(scalar, curve=None):
+    #使用预计算表优化的固定点点乘（仅用于基点G的点乘）
+    curve = curve or DEFAULT_CURVE
+    scalar = scalar % curve.n
+    if scalar == 0:
+        return ECPoint(0, 0, is_infinity=True, curve=curve)
+    table = curve.precomputed
+    if table is None:
+        table = get_precomputed_table(curve)  #无缓存时首次调用才构建
+    return table.multiply(scalar)
+
+def multiply_joint(s, t, Q, window=5, Q_odd=None):
+    #计算s*G + t*Q（Straus/Shamir交错wNAF，两个标量共享一条倍点链）
+    #G侧直接使用固定点预计算表第0行（j*G, j < 2^w）中的奇数倍点，wNAF宽度为w+1
+    #Q侧预计算2^(window-2)个仿射奇数倍点；同一公钥多次调用时可传入odd_multiples(Q, window)复用
+    curve = Q.curve
+    table = get_precomputed_table(curve)
+    G_row = table.field_table()[0]
+    naf_s = wnaf(s % curve.n, table.window + 1)
+    naf_t = wnaf(t % curve.n, window)
+    if Q_odd is None:
+        Q_odd = odd_multiples(Q, window) if naf_t else []
+    Q_odd = field_points(Q_odd)
+
+    field = curve.field
+    a, p, red, one = curve.field_a, curve.p, field.reduce, field.one
+    X, Y, Z = JACOBIAN_INFINITY
+    len_s, len_t = len(naf_s), len(naf_t)
+    for i in range(max(len_s, len_t) - 1, -1, -1):
+        X, Y, Z = jacobian_double(X, Y, Z, a, p, red)
+        if i < len_s:
+            d = naf_s[i]
+            if d > 0:
+                P = G_row[d]
+                X, Y, Z = jacobian_add_mixed(X, Y, Z, P.x, P.y, a, p, red, one)
+            elif d < 0:
+                P = G_row[-d]
+                X, Y, Z = jacobian_add_mixed(X, Y, Z, P.x, p - P.y, a, p, red, one)
+        if i < len_t:
+            d = naf_t[i]
+            if d > 0:
+                P = Q_odd[d >> 1]
+                X, Y, Z = jacobian_add_mixed(X, Y, Z, P.x, P.y, a, p, red, one)
+            elif d < 0:
+                P = Q_odd[(-d) >> 1]
+                X, Y, Z = jacobian_add_mixed(X, Y, Z, P.x, p - P.y, a, p, red, one)
+    return _from_field(curve, X, Y, Z)
+
+def multiply_wnaf(scalar, odd, width):
+    #使用预计算奇数倍点表odd = odd_multiples(P, width)的wNAF点乘
+    curve = odd[0].curve
+    field = curve.field
+    a, p, red, one = curve.field_a, curve.p, field.reduce, field.one
+    odd = field_points(odd)
+    X, Y, Z = JACOBIAN_INFINITY
+    for d in reversed(wnaf(scalar % curve.n, width)):
+        X, Y, Z = jacobian_double(X, Y, Z, a, p, red)
+        if d > 0:
+            P = odd[d >> 1]
+            X, Y, Z = jacobian_add_mixed(X, Y, Z, P.x, P.y, a, p, red, one)
+        elif d < 0:
+            P = odd[(-d) >> 1]
+            X, Y, Z = jacobian_add_mixed(X, Y, Z, P.x, p - P.y, a, p, red, one)
+    return _from_field(curve, X, Y, Z)
+
+class _KeyTables:
+    #单个公钥的预计算数据
+    __slots__ = ('point', 'odd', 'fixed', 'uses', 'nbytes')
+
+    def __init__(self, point, odd):
+        self.point = point
+        self.odd = odd  #wNAF奇数倍点表
+        self.fixed = None  #升级后的固定点窗口预计算表
+        self.uses = 0
+        self.nbytes = points_memory(odd)
+
+class KeyTableCache:
+    #热点公钥预计算表缓存：以(曲线, 仿射坐标)为键，按内存预算做LRU淘汰
+    #首次使用某公钥时建立wNAF奇数倍点表；使用次数达到promote_after后
+    #为其构建FixedBaseTable，此后该公钥的点乘与G一样走无倍点的固定点路径
+    def __init__(self, memory_budget=32 * 1024 * 1024, promote_after=32,
+                 wnaf_window=5, fixed_window=4):
+        self.memory_budget = memory_budget
+        self.promote_after = promote_after  #为0时不升级
+        self.wnaf_window = wnaf_window
+        self.fixed_window = fixed_window
+        self.memory_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.promotions = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def entry(self, Q):
+        #查找（必要时建立）公钥Q的预计算数据，记一次使用并按需升级
+        if Q.z != 1:
+            Q = Q.to_affine()
+        key = (Q.curve, Q.x, Q.y)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = _KeyTables(Q.copy(), odd_multiples(Q, self.wnaf_window))
+            self._entries[key] = entry
+            self.memory_used += entry.nbytes
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        entry.uses += 1
+        if entry.fixed is None and self.promote_after and entry.uses >= self.promote_after:
+            entry.fixed = FixedBaseTable(entry.point, self.fixed_window)
+            self.promotions += 1
+            extra = entry.fixed.memory_bytes()
+            entry.nbytes += extra
+            self.memory_used += extra
+        self._evict()
+        return entry
+
+    def _evict(self):
+        #超出内存预算时淘汰最久未使用的公钥（至少保留最近一项）
+        while self.memory_used > self.memory_budget and len(self._entries) > 1:
+            _, old = self._entries.popitem(last=False)
+            self.memory_used -= old.nbytes
+            self.evictions += 1
+
+    def multiply(self, Q, scalar):
+        #计算scalar * Q
+        entry = self.entry(Q)
+        if entry.fixed is not None:
+            return entry.fixed.multiply(scalar)
+        return multiply_wnaf(scalar, entry.odd, self.wnaf_window)
+
+    def multiply_joint(self, s, t, Q):
+        #计算s*G + t*Q
+        entry = self.entry(Q)
+        if entry.fixed is not None:
+            #两张固定点表共用一个累加器，全程无倍点
+            return entry.fixed.multiply(t, get_precomputed_table(entry.point.curve).multiply(s))
+        return multiply_joint(s, t, entry.point, self.wnaf_window, entry.odd)
+
+    def clear(self):
+        self._entries.clear()
+        self.memory_used = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+#运算计数（按需启用）
+#count_operations()期间临时把本模块的点运算核心函数、ECPoint.add_co_z、batch_inverse、mod_inverse
+#以及曲线域后端的reduce/mod/inv替换为计数版本，退出时原样恢复；未启用时没有任何额外开销
+#域乘法以约简次数计（含转入/转出蒙哥马利域），其中平方次数按各公式的固定代价归入sqr
+#计数期间其他线程（如预签名池后台线程）在同一曲线上的运算也会被计入
+OPERATION_KINDS = ('mul', 'sqr', 'inv', 'add', 'dbl', 'co_z_add')
+
+#公式名 -> (类别, 完整路径约简次数, 其中平方次数, 提前退出路径的平方次数, 计为一次点运算的最少约简次数)
+_FORMULA_COSTS = {
+    'jacobian_double': ('dbl', 10, 6, 0, 1),
+    'jacobian_add_mixed': ('add', 11, 3, 1, 1),  #H == 0时只算完前4次约简（1S）
+    'jacobian_add': ('add', 16, 4, 2, 1),  #H == 0时只算完前8次约简（2S）
+    '_xycz_add': ('co_z_add', 6, 2, 0, 1),
+    '_xycz_addc': ('co_z_add', 8, 3, 0, 1),
+    'add_co_z': ('co_z_add', 7, 2, 0, 7),  #另含__eq__判断的至多6次乘法
+}
+
+class OperationCounter:
+    #一次计数期间的运算次数
+    def __init__(self):
+        self.reductions = 0  #域约简总次数（乘法 + 平方）
+        self.sqr = 0
+        self.inv = 0
+        self.add = 0
+        self.dbl = 0
+        self.co_z_add = 0
+        self._frame = None  #当前最内层公式的直接约简计数
+
+    @property
+    def mul(self):
+        return self.reductions - self.sqr
+
+    def as_dict(self):
+        return {kind: getattr(self, kind) for kind in OPERATION_KINDS}
+
+    def _reduction(self, fn):
+        def counted(t):
+            self.reductions += 1
+            if self._frame is not None:
+                self._frame[0] += 1
+            return fn(t)
+        return counted
+
+    def _inversion(self, fn):
+        def counted(*args):
+            self.inv += 1
+            return fn(*args)
+        return counted
+
+    def _formula(self, fn, kind, full, sqr, prefix_sqr, min_reductions):
+        #嵌套调用的公式各自计数，约简次数只归入最内层公式
+        def counted(*args):
+            outer, frame = self._frame, [0]
+            self._frame = frame
+            try:
+                return fn(*args)
+            finally:
+                self._frame = outer
+                if frame[0] >= min_reductions:
+                    setattr(self, kind, getattr(self, kind) + 1)
+                    self.sqr += sqr if frame[0] >= full else prefix_sqr
+        return counted
+
+    def _batch_inverse(self, fn):
+        def counted(values, mod):
+            if values:
+                self.reductions += 3 * (len(values) - 1)
+            return fn(values, mod)
+        return counted
+
+_MISSING = object()
+
+@contextlib.contextmanager
+def count_operations(curve=None):
+    #统计with块内curve（默认测试曲线）上的运算次数：
+    #with count_operations() as ops: P.multiply_non_fixed(k)，之后读取ops.mul/ops.sqr/...或ops.as_dict()
+    curve = curve or DEFAULT_CURVE
+    field = curve.field
+    ops = OperationCounter()
+    module = globals()
+    saved_globals = {name: module[name] for name in ('batch_inverse', 'mod_inverse', *_FORMULA_COSTS)
+                     if name in module}
+    saved_field = {name: field.__dict__.get(name, _MISSING) for name in ('reduce', 'mod', 'inv')}
+    saved_co_z = ECPoint.add_co_z
+    try:
+        for name, fn in saved_globals.items():
+            if name in _FORMULA_COSTS:
+                module[name] = ops._formula(fn, *_FORMULA_COSTS[name])
+        module['batch_inverse'] = ops._batch_inverse(saved_globals['batch_inverse'])
+        module['mod_inverse'] = ops._inversion(saved_globals['mod_inverse'])
+        ECPoint.add_co_z = ops._formula(saved_co_z, *_FORMULA_COSTS['add_co_z'])
+        field.reduce = ops._reduction(field.reduce)
+        field.mod = ops._reduction(field.mod)
+        field.inv = ops._inversion(field.inv)
+        yield ops
+    finally:
+        module.update(saved_globals)
+        ECPoint.add_co_z = saved_co_z
+        for name, value in saved_field.items():
+            if value is _MISSING:
+                field.__dict__.pop(name, None)
+            else:
+                setattr(field, name, value)
+
+#进程内共享的公钥预计算表缓存
+key_tables = KeyTableCache()
+
+#导入时仅尝试载入默认曲线的磁盘缓存
+DEFAULT_CURVE.precomputed = load_table_cache(DEFAULT_WINDOW)
@@ -0,0 +1,198 @@
+from SM2_Base import ECPoint, get_curve
+
+#SM2数据的二进制编码（GB/T 32918 / GB/T 35276）
+#点：未压缩04 || x || y（65字节），压缩02/03 || x（33字节，前缀由y的奇偶决定），无穷远点为单字节00
+#密文：C1 || C3 || C2（GB/T 32918-2016）或C1 || C2 || C3（旧版顺序），C3固定32字节
+#  encrypt与encrypt_stream的C2均为M xor KDF(x2 || y2, klen)，编码结果可与其他标准实现互通；
+#  C1C2C3布局即encrypt_stream的输出，可直接交给decrypt_stream
+#签名：原始格式r || s（64字节）或DER编码SEQUENCE { INTEGER r, INTEGER s }
+#解码函数接受bytes/bytearray/memoryview，内部只对memoryview切片，不复制输入数据
+
+CIPHER_C1C3C2 = 'C1C3C2'
+CIPHER_C1C2C3 = 'C1C2C3'
+C3_SIZE = 32
+
+def sqrt_mod(a: int, p: int) -> int:
+    #模p平方根，不存在时抛出ValueError
+    #p ≡ 3 (mod 4)（SM2测试曲线与sm2p256v1均满足）时一次模幂：a^((p+1)/4)，否则使用Tonelli-Shanks
+    a %= p
+    if a == 0:
+        return 0
+    if p % 4 == 3:
+        root = pow(a, (p + 1) // 4, p)
+    else:
+        root = _tonelli_shanks(a, p)
+    if root is None or root * root % p != a:
+        raise ValueError("不存在模平方根")
+    return root
+
+def _tonelli_shanks(a, p):
+    if pow(a, (p - 1) // 2, p) != 1:
+        return None
+    q, s = p - 1, 0
+    while q % 2 == 0:
+        q //= 2
+        s += 1
+    z = 2
+    while pow(z, (p - 1) // 2, p) != p - 1:
+        z += 1
+    m, c, t, root = s, pow(z, q, p), pow(a, q, p), pow(a, (q + 1) // 2, p)
+    while t != 1:
+        i, t2 = 0, t
+        while t2 != 1:
+            t2 = t2 * t2 % p
+            i += 1
+        b = pow(c, 1 << (m - i - 1), p)
+        m, c, t, root = i, b * b % p, t * b * b % p, root * b % p
+    return root
+
+def point_size(curve=None, compressed=False) -> int:
+    #有限点编码长度
+    curve = curve or get_curve()
+    size = (curve.p.bit_length() + 7) // 8
+    return 1 + size if compressed else 1 + 2 * size
+
+def encode_point(P: ECPoint, compressed: bool = False) -> bytes:
+    if P.is_infinity:
+        return b'\x00'
+    P = P.to_affine()
+    size = (P.curve.p.bit_length() + 7) // 8
+    if compressed:
+        return bytes([2 | (P.y & 1)]) + P.x.to_bytes(size, 'big')
+    return b'\x04' + P.x.to_bytes(size, 'big') + P.y.to_bytes(size, 'big')
+
+def decode_point(data, curve=None) -> ECPoint:
+    #解码压缩/未压缩点，并校验点在曲线上
+    curve = curve or get_curve()
+    data = memoryview(data).cast('B')
+    p = curve.p
+    size = (p.bit_length() + 7) // 8
+    if len(data) == 1 and data[0] == 0:
+        return ECPoint(0, 0, is_infinity=True, curve=curve)
+    prefix = data[0]
+    if prefix in (2, 3) and len(data) == 1 + size:
+        x = int.from_bytes(data[1:], 'big')
+        if x >= p:
+            raise ValueError("点坐标超出范围")
+        y = sqrt_mod(x * x * x + curve.a * x + curve.b, p)  #不在曲线上时抛出ValueError
+        if y & 1 != prefix & 1:
+            y = p - y
+        return ECPoint(x, y, curve=curve)
+    if prefix == 4 and len(data) == 1 + 2 * size:
+        x = int.from_bytes(data[1:1+size], 'big')
+        y = int.from_bytes(data[1+size:], 'big')
+        if x >= p or y >= p or (y * y - x * x * x - curve.a * x - curve.b) % p != 0:
+            raise ValueError("点不在曲线上")
+        return ECPoint(x, y, curve=curve)
+    raise ValueError("点编码格式错误")
+
+def encode_ciphertext(cipher, mode: str = CIPHER_C1C3C2, compressed: bool = False, curve=None) -> bytes:
+    #encrypt返回的((x1, y1), c2, c3)编码为字节串
+    (x1, y1), c2, c3 = cipher
+    c1 = encode_point(ECPoint(x1, y1, curve=curve), compressed)
+    if mode == CIPHER_C1C3C2:
+        return c1 + bytes(c3) + bytes(c2)
+    if mode == CIPHER_C1C2C3:
+        return c1 + bytes(c2) + bytes(c3)
+    raise ValueError(f"未知的密文格式: {mode}")
+
+def decode_ciphertext(data, mode: str = CIPHER_C1C3C2, curve=None):
+    #解码为decrypt接受的((x1, y1), c2, c3)，C1的长度由首字节判断
+    curve = curve or get_curve()
+    data = memoryview(data).cast('B')
+    if not data:
+        raise ValueError("密文为空")
+    c1_size = point_size(curve, compressed=data[0] in (2, 3))
+    if len(data) < c1_size + C3_SIZE:
+        raise ValueError("密文长度不足")
+    C1 = decode_point(data[:c1_size], curve)
+    if C1.is_infinity:
+        raise ValueError("C1不能为无穷远点")
+    body = data[c1_size:]
+    if mode == CIPHER_C1C3C2:
+        c3, c2 = body[:C3_SIZE], body[C3_SIZE:]
+    elif mode == CIPHER_C1C2C3:
+        c2, c3 = body[:-C3_SIZE], body[-C3_SIZE:]
+    else:
+        raise ValueError(f"未知的密文格式: {mode}")
+    return (C1.x, C1.y), bytes(c2), bytes(c3)
+
+def encode_signature(signature: tuple, curve=None) -> bytes:
+    #原始格式r || s，各按阶n的字节长度定长编码
+    curve = curve or get_curve()
+    size = (curve.n.bit_length() + 7) // 8
+    r, s = signature
+    return r.to_bytes(size, 'big') + s.to_bytes(size, 'big')
+
+def decode_signature(data, curve=None) -> tuple:
+    curve = curve or get_curve()
+    data = memoryview(data).cast('B')
+    size = (curve.n.bit_length() + 7) // 8
+    if len(data) != 2 * size:
+        raise ValueError("签名长度错误")
+    return int.from_bytes(data[:size], 'big'), int.from_bytes(data[size:], 'big')
+
+def _der_length(length: int) -> bytes:
+    if length < 0x80:
+        return bytes([length])
+    body = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes([0x80 | len(body)]) + body
+
+def _der_integer(value: int) -> bytes:
+    #非负整数：最小长度大端编码，最高位为1时补一个00
+    body = value.to_bytes(value.bit_length() // 8 + 1, 'big')
+    return b'\x02' + _der_length(len(body)) + body
+
+def encode_signature_der(signature: tuple) -> bytes:
+    r, s = signature
+    body = _der_integer(r) + _der_integer(s)
+    return b'\x30' + _der_length(len(body)) + body
+
+def _der_read(data, offset, tag):
+    #读取一个TLV，返回(值memoryview, 下一个偏移)，只接受DER要求的最短长度编码
+    if offset + 2 > len(data) or data[offset] != tag:
+        raise ValueError("DER编码错误")
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        num = length & 0x7F
+        if num == 0 or num > 4 or offset + num > len(data) or data[offset] == 0:
+            raise ValueError("DER长度编码错误")
+        length = int.from_bytes(data[offset:offset+num], 'big')
+        if length < 0x80:
+            raise ValueError("DER长度编码错误")
+        offset += num
+    if offset + length > len(data):
+        raise ValueError("DER数据截断")
+    return data[offset:offset+length], offset + length
+
+def decode_signature_der(data) -> tuple:
+    data = memoryview(data).cast('B')
+    seq, end = _der_read(data, 0, 0x30)
+    if end != len(data):
+        raise ValueError("DER编码后有多余数据")
+    values = []
+    offset = 0
+    for _ in range(2):
+        body, offset = _der_read(seq, offset, 0x02)
+        #拒绝空整数、负数和非最短编码
+        if not body or body[0] & 0x80 or (len(body) > 1 and body[0] == 0 and not body[1] & 0x80):
+            raise ValueError("DER整数编码错误")
+        values.append(int.from_bytes(body, 'big'))
+    if offset != len(seq):
+        raise ValueError("DER编码后有多余数据")
+    return tuple(values)
+
+def encode_private_key(d: int, curve=None) -> bytes:
+    curve = curve or get_curve()
+    return d.to_bytes((curve.n.bit_length() + 7) // 8, 'big')
+
+def decode_private_key(data, curve=None) -> int:
+    curve = curve or get_curve()
+    data = memoryview(data).cast('B')
+    if len(data) != (curve.n.bit_length() + 7) // 8:
+        raise ValueError("私钥长度错误")
+    d = int.from_bytes(data, 'big')
+    if not 1 <= d < curve.n - 1:
+        raise ValueError("私钥超出范围")
+    return d
@@ -0,0 +1,215 @@
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+#素域运算后端
+#点乘循环中每个乘积都经过field.reduce约简，更换后端即可替换模约简算法
+#domain为True的后端（蒙哥马利域）在点乘入口用to_domain转换坐标、出口用from_domain转回，
+#循环内全程保持域内表示；点对象中的坐标始终是普通表示，接口边界上的运算使用field.mod
+
+#国标推荐曲线sm2p256v1的素数 p = 2^256 - 2^224 - 2^96 + 2^64 - 1
+SM2P256_P = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFF
+
+MASK64 = (1 << 64) - 1
+MASK256 = (1 << 256) - 1
+
+class PrimeField:
+    #通用素域后端：乘积直接 % p 约简
+    name = 'generic'
+    domain = False  #域内表示即普通表示
+    one = 1
+
+    def __init__(self, p):
+        self.p = p
+        self.reduce = p.__rmod__  #reduce(t) == t % p，内置方法避免Python层函数调用开销
+        self.mod = self.reduce  #普通表示下的约简
+
+    def to_domain(self, x):
+        return x
+
+    def from_domain(self, x):
+        return x
+
+    def inv(self, x):
+        #普通表示下的模逆
+        return pow(x, -1, self.p)
+
+class SM2P256Field(PrimeField):
+    #sm2p256v1专用后端：利用p的Solinas形式按字折叠约简，避免通用除法
+    #2^256 ≡ 2^224 + 2^96 - 2^64 + 1 (mod p)
+    name = 'solinas'
+
+    def __init__(self, p=SM2P256_P):
+        if p != SM2P256_P:
+            raise ValueError("Solinas约简仅适用于sm2p256v1素数")
+        self.p = p
+        #高256位按64比特字折叠：2^(256+64i) mod p
+        c0, c1, c2, c3 = (pow(2, 256 + 64 * i, p) for i in range(4))
+        P = p
+
+        def reduce(t):
+            if t < 0:
+                r = reduce(-t)
+                return P - r if r else 0
+            h = t >> 256
+            if h:
+                #第一轮：至多512位乘积的高4个64位字乘以预计算常数后相加
+                t = (t & MASK256) + (h & MASK64) * c0 + ((h >> 64) & MASK64) * c1 + \
+                    ((h >> 128) & MASK64) * c2 + (h >> 192) * c3
+                #后续每轮折叠剩余高位（至多3轮）
+                h = t >> 256
+                while h:
+                    t = (t & MASK256) + (h << 224) + (h << 96) - (h << 64) + h
+                    h = t >> 256
+            return t - P if t >= P else t
+
+        self.reduce = reduce
+        self.mod = reduce
+
+class MontgomeryField(PrimeField):
+    #蒙哥马利域后端：元素以x·R mod p表示（R = 2^k ≥ p），乘积用REDC约简，无需除以p
+    #REDC(t) = t·R^-1 mod p：m = (t mod R)·(-p^-1) mod R，(t + m·p) / R 即为结果
+    name = 'montgomery'
+    domain = True
+
+    def __init__(self, p):
+        if p % 2 == 0:
+            raise ValueError("蒙哥马利约简要求模数为奇数")
+        self.p = p
+        k = (p.bit_length() + 63) // 64 * 64
+        R = 1 << k
+        mask = R - 1
+        p_neg_inv = (-pow(p, -1, R)) % R
+        self.R = R
+        self.r_sq = R * R % p  #to_domain(x) = REDC(x·R²)
+        self.one = R % p
+        self.mod = p.__rmod__
+        P = p
+
+        def reduce(t):
+            #对任意整数t结果都与t·R^-1同余；|t| < p·R时至多差一个p，
+            #点运算公式中带小常数倍的乘积（如8Y⁴）偶尔超出该范围，此时退回一次取模
+            u = (t + (((t & mask) * p_neg_inv) & mask) * P) >> k
+            if 0 <= u < P:
+                return u
+            return u % P
+
+        self.reduce = reduce
+
+    def to_domain(self, x):
+        return self.reduce(x * self.r_sq)
+
+    def from_domain(self, x):
+        return self.reduce(x)
+
+#可按名称选择的后端
+FIELD_BACKENDS = {
+    PrimeField.name: PrimeField,
+    SM2P256Field.name: SM2P256Field,
+    MontgomeryField.name: MontgomeryField,
+}
+
+def make_field(p, backend='generic'):
+    #按名称为素数p创建域后端
+    if backend not in FIELD_BACKENDS:
+        raise ValueError(f"未知的域运算后端: {backend}")
+    return FIELD_BACKENDS[backend](p)
+
+def available_backends(p):
+    #适用于素数p的后端名称
+    names = [PrimeField.name, MontgomeryField.name]
+    if p == SM2P256_P:
+        names.append(SM2P256Field.name)
+    return names
+
+def benchmark_fields(p, backends=None, samples=256, rounds=3):
+    #测量各后端约简一批随机512位乘积的耗时（取多轮最小值），返回{名称: 每次约简秒数}
+    rng = random.Random(p)
+    products = [rng.randrange(p) * rng.randrange(p) for _ in range(samples)]
+    timings = {}
+    for name in backends or available_backends(p):
+        reduce = make_field(p, name).reduce
+        best = float('inf')
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for t in products:
+                reduce(t)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best / samples
+    return timings
+
+#未测量过时使用的后端（CPython下通用后端实测最快）
+DEFAULT_FIELD = PrimeField.name
+
+def cache_dir():
+    #磁盘缓存目录（基点预计算表与后端选择结果共用），可由环境变量SM2_OPTI_CACHE_DIR指定，
+    #默认与字节码缓存同放在__pycache__
+    return os.environ.get('SM2_OPTI_CACHE_DIR') or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__')
+
+def field_cache_path(p):
+    #测量结果与解释器相关，文件名带解释器标签（如cpython-312）
+    digest = hashlib.sha256(p.to_bytes((p.bit_length() + 7) // 8, 'big')).hexdigest()[:8]
+    return os.path.join(cache_dir(), f'sm2_field_{sys.implementation.cache_tag}_{digest}.txt')
+
+def load_field_choice(p):
+    #读取缓存的测量结果，缺失或内容无效时返回None
+    try:
+        with open(field_cache_path(p), encoding='ascii') as f:
+            backend = f.read().strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+    return backend if backend in available_backends(p) else None
+
+def calibrate_field(p, timings=None):
+    #测量各后端并把最快者原子写入缓存（写入失败时静默忽略），返回后端名称
+    #只由调用方显式执行（python SM2_Field.py calibrate），导入与建表都不会触发
+    timings = timings or benchmark_fields(p)
+    backend = min(timings, key=timings.get)
+    path = field_cache_path(p)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='ascii') as f:
+            f.write(backend)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return backend
+
+#每个素数已选定的后端（同一进程内只读一次缓存）
+_chosen = {}
+
+def fastest_field(p):
+    #选择素数p的后端：环境变量SM2_OPTI_FIELD（不适用于p时忽略） > 缓存的测量结果 > DEFAULT_FIELD
+    #导入时不做计时：测量只在显式调用calibrate_field时进行，结果落盘后各次运行、各工作进程的选择一致
+    backend = os.environ.get('SM2_OPTI_FIELD')
+    if backend in available_backends(p):
+        return make_field(p, backend)
+    if p not in _chosen:
+        _chosen[p] = load_field_choice(p) or DEFAULT_FIELD
+    return make_field(p, _chosen[p])
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='SM2_Field', description='测量/查看各曲线的域运算后端选择')
+    parser.add_argument('command', nargs='?', choices=('calibrate', 'info'), default='info',
+                        help='calibrate：测量各后端并把最快者写入缓存，之后启动的进程使用该结果')
+    args = parser.parse_args(argv)
+    from SM2_Base import CURVES
+    for name, curve in CURVES.items():
+        if args.command == 'calibrate':
+            timings = benchmark_fields(curve.p)
+            backend = calibrate_field(curve.p, timings)
+            print(f"{name}: {backend}（" + ", ".join(f"{b} {t * 1e6:.2f}us" for b, t in timings.items()) + "）")
+        else:
+            cached = load_field_choice(curve.p)
+            print(f"{name}: {cached or DEFAULT_FIELD}（{'已测量' if cached else '未测量，使用默认后端'}）")
+    print(f"缓存目录: {cache_dir()}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from SM2_Base import ECPoint, FixedBaseTable, batch_normalize, multiply_fixed, get_curve, get_precomputed_table
+from SM2 import decrypt, _encrypt_with_points
+from SM2_Sign import SM2PrivateKeyHandle
+
+#多进程批量签名/加解密服务
+#纯Python点运算受GIL限制，多线程无法提速；这里用进程池把批量任务切块分发到多个核
+#曲线、基点预计算表、密钥及公钥预计算表只在创建工作进程时经initializer传递一次，
+#之后每个任务只携带一块消息/密文；结果按输入顺序流式返回，同时在途的块数有上限，
+#输入可以是任意长的迭代器
+
+#工作进程内的状态（由_init_worker设置）
+_worker = {}
+
+def _init_worker(curve, window, G_table, private_key, ID, public_key, Q_table):
+    #工作进程初始化：载入基点表与公钥表，构建绑定私钥的签名句柄
+    if curve.precomputed is None or curve.precomputed.window != window:
+        curve.precomputed = FixedBaseTable.from_bytes(curve.G, window, G_table)
+    _worker.clear()
+    _worker['curve'] = curve
+    if private_key is not None:
+        _worker['d'] = private_key
+        _worker['signer'] = SM2PrivateKeyHandle(private_key, ID, curve=curve)
+    if public_key is not None:
+        _worker['Q_table'] = FixedBaseTable.from_bytes(public_key, window, Q_table)
+
+def _sign_chunk(messages):
+    sign = _worker['signer'].sign
+    return [sign(message) for message in messages]
+
+def _decrypt_chunk(ciphers):
+    #单条解密失败时以异常对象占位，不影响同一块中的其他密文
+    d, curve = _worker['d'], _worker['curve']
+    results = []
+    for cipher in ciphers:
+        try:
+            results.append(decrypt(d, cipher, curve))
+        except ValueError as error:
+            results.append(error)
+    return results
+
+def _encrypt_chunk(plaintexts):
+    #与encrypt_batch相同：整块的kG与kQ共用一次模逆转换为仿射坐标，kQ查公钥的固定点表
+    curve, Q_table = _worker['curve'], _worker['Q_table']
+    points = []
+    for _ in plaintexts:
+        k = random.randint(1, curve.n - 1)
+        points.append(multiply_fixed(k, curve))
+        points.append(Q_table.multiply(k))
+    points = batch_normalize(points)
+    return [_encrypt_with_points(points[2*i], points[2*i+1], plaintext) or _encrypt_retry(plaintext)
+            for i, plaintext in enumerate(plaintexts)]
+
+def _encrypt_retry(plaintext):
+    #t = KDF(x2 || y2, klen)全为0时换k重新加密（GB/T 32918.4 A5）
+    curve, Q_table = _worker['curve'], _worker['Q_table']
+    while True:
+        k = random.randint(1, curve.n - 1)
+        cipher = _encrypt_with_points(*batch_normalize([multiply_fixed(k, curve), Q_table.multiply(k)]),
+                                      plaintext)
+        if cipher is not None:
+            return cipher
+
+class SM2ProcessPool:
+    #绑定一对密钥的多进程批量服务
+    #private_key用于sign_many/decrypt_many，public_key用于encrypt_many（默认为私钥对应的公钥）
+    #chunk_size为每个任务的条目数：越大进程间通信开销越小，越小首个结果返回越快
+    def __init__(self, private_key: int = None, public_key: ECPoint = None, ID: bytes = b'',
+                 processes: int = None, chunk_size: int = 64, curve=None):
+        if private_key is None and public_key is None:
+            raise ValueError("至少需要提供私钥或公钥")
+        if chunk_size < 1:
+            raise ValueError("chunk_size必须为正整数")
+        if public_key is not None:
+            curve = public_key.curve
+        self.curve = curve or get_curve()
+        if private_key is not None and not 1 <= private_key < self.curve.n - 1:
+            raise ValueError("私钥超出范围")
+        if public_key is None:
+            public_key = multiply_fixed(private_key, self.curve)
+        self.private_key = private_key
+        self.public_key = public_key.to_affine()
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        G_table = get_precomputed_table(self.curve)
+        Q_table = FixedBaseTable(self.public_key, G_table.window)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes, initializer=_init_worker,
+            initargs=(self.curve, G_table.window, G_table.to_bytes(), private_key, ID,
+                      self.public_key, Q_table.to_bytes()))
+
+    def _imap(self, fn, items):
+        #按chunk_size切块提交，至多2倍进程数的块同时在途，按输入顺序逐条产出结果
+        items = iter(items)
+        pending = deque()
+        limit = 2 * self.processes
+        while True:
+            while len(pending) < limit:
+                chunk = list(islice(items, self.chunk_size))
+                if not chunk:
+                    break
+                pending.append(self._executor.submit(fn, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+    def sign_many(self, messages):
+        #逐条返回(r, s)，与SM2PrivateKeyHandle(private_key, ID).sign一致
+        if self.private_key is None:
+            raise ValueError("未提供私钥")
+        return self._imap(_sign_chunk, messages)
+
+    def decrypt_many(self, ciphers):
+        #逐条返回明文；某条C3校验失败时在该位置抛出ValueError
+        if self.private_key is None:
+            raise ValueError("未提供私钥")
+        return self._decrypt_many(ciphers)
+
+    def _decrypt_many(self, ciphers):
+        for result in self._imap(_decrypt_chunk, ciphers):
+            if isinstance(result, ValueError):
+                raise result
+            yield result
+
+    def encrypt_many(self, plaintexts):
+        #逐条返回与encrypt格式相同的密文三元组
+        return self._imap(_encrypt_chunk, plaintexts)
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def benchmark_scaling(max_processes: int = None, count: int = 256, chunk_size: int = 16, curve=None):
+    #1 ~ max_processes个进程下批量签名/加密/解密的吞吐量，返回[(进程数, {操作: 次/秒})]
+    curve = curve or get_curve()
+    max_processes = max_processes or os.cpu_count() or 1
+    d = random.randint(1, curve.n - 2)
+    messages = [b'benchmark message %d' % i for i in range(count)]
+    results = []
+    for processes in range(1, max_processes + 1):
+        with SM2ProcessPool(d, processes=processes, chunk_size=chunk_size, curve=curve) as pool:
+            list(pool.sign_many(messages[:chunk_size * processes]))  #预热：启动全部工作进程
+            rates = {}
+            start = time.perf_counter()
+            list(pool.sign_many(messages))
+            rates['sign'] = count / (time.perf_counter() - start)
+            start = time.perf_counter()
+            ciphers = list(pool.encrypt_many(messages))
+            rates['encrypt'] = count / (time.perf_counter() - start)
+            start = time.perf_counter()
+            list(pool.decrypt_many(ciphers))
+            rates['decrypt'] = count / (time.perf_counter() - start)
+        results.append((processes, rates))
+    return results
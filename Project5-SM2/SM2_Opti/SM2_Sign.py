@@ -1,21 +1,167 @@
 import random
-from SM2_Base import a, b, Gx, Gy, n, p, ECPoint, mod_inverse, multiply_fixed, G
-from SM3 import sm3_hash
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from SM2_Base import ECPoint, FixedBaseTable, mod_inverse, multiply_fixed, batch_inverse, batch_normalize, \
+                     key_tables, get_curve, get_precomputed_table, DEFAULT_WINDOW
+from SM3 import SM3, sm3_hash
+
+DEFAULT_ID = b'1234567812345678'
+
+def compute_Z(ID: bytes, Q: ECPoint) -> bytes:
+    #计算用户标识杂凑值Z = SM3(ENTL || ID || a || b || xG || yG || xA || yA)
+    #公钥坐标必须使用仿射坐标，曲线参数取自Q所在曲线
+    ID = ID or DEFAULT_ID
+    Q = Q.to_affine()
+    curve = Q.curve
+    entl = len(ID) * 8
+    data = entl.to_bytes(2, byteorder='big') + ID + \
+           curve.a.to_bytes(32, byteorder='big') + curve.b.to_bytes(32, byteorder='big') + \
+           curve.Gx.to_bytes(32, byteorder='big') + curve.Gy.to_bytes(32, byteorder='big') + \
+           Q.x.to_bytes(32, byteorder='big') + Q.y.to_bytes(32, byteorder='big')
+    return sm3_hash(data)
+
+class ZCache:
+    #按(ID, 曲线名, Q.x, Q.y)缓存Z值的有界LRU缓存（Z值与域运算后端无关）
+    #同一公钥反复签名/验签时省去一次多分组的SM3计算
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize  #为0时关闭缓存
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, ID: bytes, Q: ECPoint) -> bytes:
+        ID = ID or DEFAULT_ID
+        Q = Q.to_affine()
+        key = (ID, Q.curve.name, Q.x, Q.y)
+        Z = self._entries.get(key)
+        if Z is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return Z
+        self.misses += 1
+        Z = compute_Z(ID, Q)
+        if self.maxsize > 0:
+            self._entries[key] = Z
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)  #淘汰最久未使用项
+        return Z
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+def generate_nonce(curve=None):
+    #签名中与消息无关的部分：随机数k及kG的仿射x坐标x1
+    #k取自secrets（CSPRNG）：预签名池中的k会长时间驻留，不能由可预测的random生成
+    curve = curve or get_curve()
+    k = secrets.randbelow(curve.n - 1) + 1
+    kG = multiply_fixed(k, curve)
+    z_inv = mod_inverse(kG.z, curve.p)
+    return k, (kG.x * z_inv * z_inv) % curve.p
+
+class PresignPool:
+    #离线预签名池：后台线程预先计算(k, x1)对，签名时只剩廉价的模运算
+    #池中数量低于low_watermark时唤醒后台线程补充到high_watermark
+    #每个(k, x1)出池后即被移除，保证只使用一次
+    def __init__(self, low_watermark: int = 16, high_watermark: int = 64, curve=None):
+        if not 0 <= low_watermark < high_watermark:
+            raise ValueError("水位线需满足0 <= low_watermark < high_watermark")
+        self.curve = curve or get_curve()
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.hits = 0
+        self.misses = 0  #池空时同步计算的次数
+        self._entries = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='SM2PresignPool', daemon=True)
+        self._wakeup.set()  #启动后立即填充到高水位
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while not self._closed and len(self._entries) < self.high_watermark:
+                entry = generate_nonce(self.curve)
+                with self._lock:
+                    self._entries.append(entry)
+            if self._closed:
+                return
+
+    def take(self):
+        #取出一个(k, x1)；池空时同步计算，不阻塞等待后台线程
+        #计数与出池在同一把锁内更新，与后台补充线程并发时不丢失
+        with self._lock:
+            entry = self._entries.popleft() if self._entries else None
+            remaining = len(self._entries)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if remaining < self.low_watermark:
+            self._wakeup.set()
+        if entry is None:
+            return generate_nonce(self.curve)
+        return entry
+
+    def wait_filled(self, timeout: float = None) -> bool:
+        #等待池填充到高水位（主要用于服务启动预热与测试）
+        #池中数量介于两条水位线之间时后台线程处于休眠，需主动唤醒补充
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if len(self._entries) < self.high_watermark:
+            self._wakeup.set()
+        while len(self._entries) < self.high_watermark:
+            if self._closed or (deadline is not None and time.monotonic() > deadline):
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        with self._lock:
+            self._entries.clear()  #丢弃未使用的随机数
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 class SM2Signature:
     #SM2数字签名算法实现（优化验签流程）
-    def __init__(self):
-        self.n = n
-        self.G = G  #基点
-        #预计算蒙哥马利参数（用于签名过程中的模运算优化）
-        self.r = 1 << 256
-        self.r_inv = mod_inverse(self.r, p)
-        self.r_sq = (self.r * self.r) % p
+    def __init__(self, z_cache_size: int = 4096, key_table_cache=None, presign_pool: PresignPool = None,
+                 curve=None):
+        #curve为get_curve返回的曲线（可选sm2p256v1及域运算后端），默认使用测试曲线
+        self.curve = curve or get_curve()
+        if presign_pool is not None and presign_pool.curve.name != self.curve.name:
+            raise ValueError("预签名池与签名器的曲线不一致")
+        self.n = self.curve.n
+        self.p = self.curve.p
+        self.G = self.curve.G  #基点
+        self.presign_pool = presign_pool  #可选的离线预签名池
+        self.z_cache = ZCache(z_cache_size)  #每个签名器独立的Z值缓存
+        #公钥预计算表缓存，默认使用进程内共享实例
+        self.key_tables = key_table_cache if key_table_cache is not None else key_tables
 
     def montgomery_mul(self, a: int, b: int) -> int:
         #蒙哥马利乘法优化
-        #直接使用标准模乘，避免蒙哥马利实现的复杂性
-        return (a * b) % p
+        #直接使用曲线域后端的约简，避免蒙哥马利实现的复杂性
+        return self.curve.field.mod(a * b)
 
     def int_to_bytes(self, x: int, length: int = None) -> bytes:
         if length is None:
@@ -27,37 +173,41 @@ class SM2Signature:
         return int.from_bytes(b, byteorder='big')
     
     def compute_Z(self, ID: bytes, Q: ECPoint) -> bytes:
-        #计算用户标识杂凑值Z
-        if not ID:
-            ID = b'1234567812345678'
-        entl = len(ID) * 8
-        data = self.int_to_bytes(entl, 2) + ID + \
-               self.int_to_bytes(a) + self.int_to_bytes(b) + \
-               self.int_to_bytes(Gx) + self.int_to_bytes(Gy) + \
-               self.int_to_bytes(Q.x) + self.int_to_bytes(Q.y)
-        return sm3_hash(data)
+        #计算用户标识杂凑值Z（命中缓存时直接返回）
+        return self.z_cache.get(ID, Q)
     
+    def compute_e(self, Z: bytes, message: bytes) -> bytes:
+        #e = SM3(Z || M)，增量哈希避免拼接大块消息
+        h = SM3(Z)
+        h.update(message)
+        return h.digest()
+
     def generate_keypair(self):
         d = random.randint(1, self.n - 1)
         #使用固定点预计算表加速公钥生成
-        Q = multiply_fixed(d)
+        Q = multiply_fixed(d, self.curve).to_affine()  #公钥以仿射坐标返回，便于Z值缓存查找
         return d, Q
     
-    def sign(self, message: bytes, d: int, Q: ECPoint, ID: bytes = b'') -> tuple:
+    def generate_keypairs(self, count: int):
+        #批量生成密钥对：所有公钥共用一次模逆转换为仿射坐标
+        ds = [random.randint(1, self.n - 1) for _ in range(count)]
+        Qs = batch_normalize([multiply_fixed(d, self.curve) for d in ds])
+        return list(zip(ds, Qs))
+    
+    def sign(self, message: bytes, d: int, Q: ECPoint, ID: bytes = b'', Z: bytes = None) -> tuple:
         #签名生成（复用优化后的点乘）
-        Z = self.compute_Z(ID, Q)
-        e_hash = sm3_hash(Z + message)
+        #调用方已持有Z值时直接传入，跳过Z值计算
+        if Z is None:
+            Z = self.compute_Z(ID, Q)
+        e_hash = self.compute_e(Z, message)
         e = self.bytes_to_int(e_hash)
         
         while True:
-            k = random.randint(1, self.n - 1)
-            #优化1：使用预计算表加速kG计算
-            kG = multiply_fixed(k)
-            
-            #优化2：蒙哥马利模乘加速坐标转换
-            z_inv = mod_inverse(kG.z, p)
-            z_inv_sq = self.montgomery_mul(z_inv, z_inv)
-            x1 = self.montgomery_mul(kG.x, z_inv_sq)  #x = X/z²
+            #(k, x1)与消息无关：优先从预签名池取出，否则使用预计算表现场计算kG
+            if self.presign_pool is not None:
+                k, x1 = self.presign_pool.take()
+            else:
+                k, x1 = generate_nonce(self.curve)
             r = (e + x1) % self.n
             
             if r == 0 or r + k == self.n:
@@ -72,39 +222,158 @@ class SM2Signature:
         
         return (r, s)
     
-    def verify(self, message: bytes, signature: tuple, Q: ECPoint, ID: bytes = b'') -> bool:
-        #验签优化：避免模逆运算 + Co-Z点加
+    def verify(self, message: bytes, signature: tuple, Q: ECPoint, ID: bytes = b'', Z: bytes = None) -> bool:
+        #验签优化：Shamir技巧联合点乘，仅在最终转换仿射坐标时做一次模逆
         r, s = signature
         if not (1 <= r < self.n and 1 <= s < self.n):
             return False
         
-        Z = self.compute_Z(ID, Q)
-        e_hash = sm3_hash(Z + message)
+        if Z is None:
+            Z = self.compute_Z(ID, Q)
+        e_hash = self.compute_e(Z, message)
         e = self.bytes_to_int(e_hash)
         t = (r + s) % self.n
         if t == 0:
             return False
         
-        #优化1：使用预计算表加速sG计算（固定点）
-        sG = multiply_fixed(s)
-        #优化2：使用Co-Z非固定点点乘加速tQ计算
-        tQ = Q.multiply_non_fixed(t)
-        
-        #统一Z坐标后执行Co-Z点加
-        if sG.z != tQ.z:
-            z_ratio = (sG.z * mod_inverse(tQ.z, p)) % p
-            tQ.x = (tQ.x * pow(z_ratio, 2, p)) % p
-            tQ.y = (tQ.y * pow(z_ratio, 3, p)) % p
-            tQ.z = sG.z
-        P = sG.add_co_z(tQ)  #执行低复杂度点加
+        #sG + tQ：交错wNAF联合点乘，G侧查固定点预计算表，共享一条倍点链
+        #Q的奇数倍点表由公钥缓存提供，热点公钥升级为两张固定点表直接查表累加
+        P = self.key_tables.multiply_joint(s, t, Q)
         
         if P.is_infinity:
             return False
         
         #验证R = (e + x_P) mod n == r
         #需要将Jacobian坐标转换为仿射坐标
-        z_inv = mod_inverse(P.z, p)
+        z_inv = mod_inverse(P.z, self.p)
         z_inv_sq = self.montgomery_mul(z_inv, z_inv)
         x_P = self.montgomery_mul(P.x, z_inv_sq)  #转换为仿射坐标x
         R = (e + x_P) % self.n
         return R == r
+    
+    def verify_batch(self, items, processes: int = 1) -> list:
+        #批量验签：items中每项为(message, signature, Q)或(message, signature, Q, ID)
+        #返回与items一一对应的布尔值列表
+        #按(ID, Q)分组共享Z值，Q的预计算表由公钥缓存共享，最终仿射转换使用Montgomery联合求逆
+        #processes > 1时将批次按顺序切分为多个分片，由进程池并行验证
+        items = list(items)
+        if processes > 1 and len(items) > processes:
+            shard_size = (len(items) + processes - 1) // processes
+            shards = [items[i:i+shard_size] for i in range(0, len(items), shard_size)]
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                results = []
+                for shard_result in executor.map(_verify_shard, shards, repeat(self.curve)):
+                    results.extend(shard_result)
+            return results
+
+        results = [False] * len(items)
+        groups = {}  #(ID, Q.x, Q.y) -> Z
+        pending = []  #(下标, e, r, 联合点乘结果P)
+        for index, item in enumerate(items):
+            message, (r, s), Q = item[:3]
+            ID = (item[3] if len(item) > 3 else b'') or DEFAULT_ID
+            if not (1 <= r < self.n and 1 <= s < self.n):
+                continue
+            t = (r + s) % self.n
+            if t == 0:
+                continue
+            Q = Q.to_affine()
+            key = (ID, Q.x, Q.y)
+            Z = groups.get(key)
+            if Z is None:
+                Z = groups[key] = self.compute_Z(ID, Q)
+            e = self.bytes_to_int(self.compute_e(Z, message))
+            P = self.key_tables.multiply_joint(s, t, Q)
+            if not P.is_infinity:
+                pending.append((index, e, r, P))
+
+        #所有结果点一次性转换为仿射坐标x
+        z_invs = batch_inverse([P.z for _, _, _, P in pending], self.p)
+        for (index, e, r, P), z_inv in zip(pending, z_invs):
+            x_P = (P.x * z_inv * z_inv) % self.p
+            results[index] = (e + x_P) % self.n == r
+        return results
+
+def _verify_shard(items, curve=None):
+    #进程池工作函数：在子进程内串行批量验证一个分片
+    return SM2Signature(curve=curve).verify_batch(items)
+
+class SM2PublicKeyHandle:
+    #绑定单个公钥的验签对象：Z值与Q的固定点预计算表在构造时一次算好
+    #verify中sG + tQ两侧都直接查表累加，无倍点、无逐次的公钥相关计算
+    def __init__(self, Q: ECPoint, ID: bytes = b'', window: int = DEFAULT_WINDOW):
+        self.Q = Q.to_affine()
+        self.curve = self.Q.curve
+        self.ID = ID or DEFAULT_ID
+        self.Z = compute_Z(self.ID, self.Q)
+        self.table = FixedBaseTable(self.Q, window)
+        self._h = SM3(self.Z)  #已吸收Z的SM3状态，每条消息copy后继续
+
+    def compute_e(self, message: bytes) -> int:
+        h = self._h.copy()
+        h.update(message)
+        return int.from_bytes(h.digest(), byteorder='big')
+
+    def verify(self, message: bytes, signature: tuple) -> bool:
+        curve = self.curve
+        n, p = curve.n, curve.p
+        r, s = signature
+        if not (1 <= r < n and 1 <= s < n):
+            return False
+        t = (r + s) % n
+        if t == 0:
+            return False
+        e = self.compute_e(message)
+        #sG与tQ共用一个累加器
+        P = self.table.multiply(t, get_precomputed_table(curve).multiply(s))
+        if P.is_infinity:
+            return False
+        z_inv = mod_inverse(P.z, p)
+        x_P = (P.x * z_inv * z_inv) % p
+        return (e + x_P) % n == r
+
+class SM2PrivateKeyHandle:
+    #绑定单个私钥的签名对象：Z值、(1+d)^-1与公钥在构造时一次算好
+    #s = (1+d)^-1·(k - r·d) = (1+d)^-1·(k + r) - r (mod n)，签名时只剩一次模乘
+    def __init__(self, d: int, ID: bytes = b'', presign_pool: PresignPool = None, curve=None):
+        self.curve = curve or get_curve()
+        n = self.curve.n
+        if not 1 <= d < n - 1:
+            raise ValueError("私钥超出范围")
+        if presign_pool is not None and presign_pool.curve.name != self.curve.name:
+            raise ValueError("预签名池与签名器的曲线不一致")
+        self.d = d
+        self.ID = ID or DEFAULT_ID
+        self.Q = multiply_fixed(d, self.curve).to_affine()
+        self.Z = compute_Z(self.ID, self.Q)
+        self.d1_inv = mod_inverse(1 + d, n)
+        self.presign_pool = presign_pool
+        self._h = SM3(self.Z)
+        self._public = None
+
+    @property
+    def public_key(self) -> SM2PublicKeyHandle:
+        #对应的验签对象（首次访问时建表）
+        if self._public is None:
+            self._public = SM2PublicKeyHandle(self.Q, self.ID)
+        return self._public
+
+    def sign(self, message: bytes) -> tuple:
+        h = self._h.copy()
+        h.update(message)
+        e = int.from_bytes(h.digest(), byteorder='big')
+        n, d1_inv = self.curve.n, self.d1_inv
+        while True:
+            if self.presign_pool is not None:
+                k, x1 = self.presign_pool.take()
+            else:
+                k, x1 = generate_nonce(self.curve)
+            r = (e + x1) % n
+            if r == 0 or r + k == n:
+                continue
+            s = (d1_inv * (k + r) - r) % n
+            if s != 0:
+                return (r, s)
+
+    def verify(self, message: bytes, signature: tuple) -> bool:
+        return self.public_key.verify(message, signature)
@@ -1,59 +1,361 @@
-def sm3_hash(message: bytes) -> bytes:
+import hmac
+import os
+import struct
+import SM3_Native
+
+try:
+    import numpy as np  #可选依赖：有NumPy时批量哈希走多通道向量化路径
+except ImportError:
+    np = None
+
+#初始向量
+IV = (0x7380166f, 0x4914b2b9, 0x172442d7, 0xda8a0600,
+      0xa96f30bc, 0x163138aa, 0xe38dee4d, 0xb0fb0e4e)
+T = [0x79cc4519, 0x7a879d8a]  #常量
+
+def _rotl(x, n):
+    #32位循环左移
+    n %= 32
+    return ((x << n) | (x >> (32 - n))) & 0xFFFFFFFF
+
+def _compress_loop(V, B):
+    #SM3压缩函数的逐轮分支实现（与规范逐步对应，仅作对照保留）
+    W = [0] * 68  #消息扩展字
+
+    #前16个字
+    for j in range(16):
+        W[j] = int.from_bytes(B[j*4:(j+1)*4], 'big')
+
+    #后52个字：W[j] = P1(W[j-16] ^ W[j-9] ^ (W[j-3] <<< 15)) ^ (W[j-13] <<< 7) ^ W[j-6]
+    for j in range(16, 68):
+        x = W[j-16] ^ W[j-9] ^ _rotl(W[j-3], 15)
+        W[j] = x ^ _rotl(x, 15) ^ _rotl(x, 23) ^ _rotl(W[j-13], 7) ^ W[j-6]
+
+    W_ = [W[j] ^ W[j+4] for j in range(64)]  #辅助扩展
+
+    #压缩函数
+    A, B_, C, D, E, F, G_, H = V
+    for j in range(64):
+        #计算SS1和SS2
+        A12 = _rotl(A, 12)
+        if j < 16:
+            SS1 = _rotl((A12 + E + _rotl(T[0], j)) & 0xFFFFFFFF, 7)
+        else:
+            SS1 = _rotl((A12 + E + _rotl(T[1], j)) & 0xFFFFFFFF, 7)
+        SS2 = SS1 ^ A12
+
+        #计算TT1和TT2（前16轮为异或，后48轮为多数/选择函数）
+        if j < 16:
+            FF = A ^ B_ ^ C
+            GG = E ^ F ^ G_
+        else:
+            FF = (A & B_) | (A & C) | (B_ & C)
+            GG = (E & F) | (~E & G_)
+        TT1 = (FF + D + SS2 + W_[j]) & 0xFFFFFFFF
+        TT2 = (GG + H + SS1 + W[j]) & 0xFFFFFFFF
+
+        #更新状态
+        A, B_, C, D = TT1, A, _rotl(B_, 9), C
+        E, F, G_, H = TT2 ^ _rotl(TT2, 9) ^ _rotl(TT2, 17), E, _rotl(F, 19), G_
+
+    #更新向量
+    return [V[0] ^ A, V[1] ^ B_, V[2] ^ C, V[3] ^ D,
+            V[4] ^ E, V[5] ^ F, V[6] ^ G_, V[7] ^ H]
+
+MASK32 = 0xFFFFFFFF
+#各轮常量T_j <<< j（j = 0..63）
+_T_ROT = [_rotl(T[0] if j < 16 else T[1], j) for j in range(64)]
+_unpack_block = struct.Struct('>16I').unpack_from
+_pack_digest = struct.Struct('>8I').pack
+
+def _compress(V, B, W=None, offset=0):
+    #SM3压缩函数：输入8字状态V和B[offset:offset+64]处的64字节分组，返回新状态（元组）
+    #前16轮与后48轮分为两段循环，不再逐轮判断j < 16；循环左移内联为移位运算；
+    #T_j <<< j查表；W'_j = W_j ^ W_{j+4}在轮函数中现算；W为可复用的68字扩展缓冲区
+    M = MASK32
+    if W is None:
+        W = [0] * 68
+    W[:16] = _unpack_block(B, offset)
+    for j in range(16, 68):
+        x = W[j-3]
+        x = W[j-16] ^ W[j-9] ^ (((x << 15) & M) | (x >> 17))
+        y = W[j-13]
+        W[j] = x ^ (((x << 15) & M) | (x >> 17)) ^ (((x << 23) & M) | (x >> 9)) ^ \
+            (((y << 7) & M) | (y >> 25)) ^ W[j-6]
+
+    A, B_, C, D, E, F, G_, H = V
+    for j in range(16):
+        A12 = ((A << 12) & M) | (A >> 20)
+        SS1 = (A12 + E + _T_ROT[j]) & M
+        SS1 = ((SS1 << 7) & M) | (SS1 >> 25)
+        Wj = W[j]
+        TT1 = ((A ^ B_ ^ C) + D + (SS1 ^ A12) + (Wj ^ W[j+4])) & M
+        TT2 = ((E ^ F ^ G_) + H + SS1 + Wj) & M
+        D = C
+        C = ((B_ << 9) & M) | (B_ >> 23)
+        B_ = A
+        A = TT1
+        H = G_
+        G_ = ((F << 19) & M) | (F >> 13)
+        F = E
+        E = TT2 ^ (((TT2 << 9) & M) | (TT2 >> 23)) ^ (((TT2 << 17) & M) | (TT2 >> 15))
+    for j in range(16, 64):
+        A12 = ((A << 12) & M) | (A >> 20)
+        SS1 = (A12 + E + _T_ROT[j]) & M
+        SS1 = ((SS1 << 7) & M) | (SS1 >> 25)
+        Wj = W[j]
+        #FF = 多数函数，GG = 选择函数（与(E & F) | (~E & G)等价）
+        TT1 = (((A & (B_ | C)) | (B_ & C)) + D + (SS1 ^ A12) + (Wj ^ W[j+4])) & M
+        TT2 = ((((F ^ G_) & E) ^ G_) + H + SS1 + Wj) & M
+        D = C
+        C = ((B_ << 9) & M) | (B_ >> 23)
+        B_ = A
+        A = TT1
+        H = G_
+        G_ = ((F << 19) & M) | (F >> 13)
+        F = E
+        E = TT2 ^ (((TT2 << 9) & M) | (TT2 >> 23)) ^ (((TT2 << 17) & M) | (TT2 >> 15))
+
+    V0, V1, V2, V3, V4, V5, V6, V7 = V
+    return (V0 ^ A, V1 ^ B_, V2 ^ C, V3 ^ D, V4 ^ E, V5 ^ F, V6 ^ G_, V7 ^ H)
+
+class PythonSM3:
+    #纯Python的增量式SM3哈希对象（接口与hashlib一致：update/copy/digest/hexdigest）
+    #每凑满一个64字节分组立即压缩，缓冲区中只保留不足一个分组的尾部数据
+    name = 'sm3'
+    digest_size = 32
+    block_size = 64
+
+    def __init__(self, data: bytes = b''):
+        self._V = IV
+        self._W = [0] * 68  #消息扩展缓冲区，各分组复用
+        self._buffer = b''
+        self._length = 0  #已输入消息的字节数
+        if data:
+            self.update(data)
+
+    def update(self, data: bytes):
+        #追加消息数据，支持bytes/bytearray/memoryview
+        data = memoryview(data).cast('B')
+        self._length += len(data)
+        offset = 0
+        if self._buffer:
+            #先补齐上次遗留的不完整分组
+            need = 64 - len(self._buffer)
+            if len(data) < need:
+                self._buffer += data.tobytes()
+                return
+            self._V = _compress(self._V, self._buffer + data[:need].tobytes(), self._W)
+            self._buffer = b''
+            offset = need
+        #逐个压缩完整分组（按偏移直接从memoryview解包，不复制消息）
+        end = offset + ((len(data) - offset) & ~63)
+        V, W = self._V, self._W
+        for i in range(offset, end, 64):
+            V = _compress(V, data, W, i)
+        self._V = V
+        if end < len(data):
+            self._buffer = data[end:].tobytes()
+
+    def copy(self):
+        #复制当前中间状态，便于共享公共前缀
+        other = PythonSM3.__new__(PythonSM3)
+        other._V = self._V
+        other._W = [0] * 68
+        other._buffer = self._buffer
+        other._length = self._length
+        return other
+
+    def digest(self) -> bytes:
+        #一次性构造填充：0x80 || 0x00... || 64位消息比特长度
+        msg_len = self._length * 8
+        pad_len = (55 - self._length) % 64
+        tail = self._buffer + b'\x80' + b'\x00' * pad_len + msg_len.to_bytes(8, byteorder='big')
+        V = self._V
+        for i in range(0, len(tail), 64):
+            V = _compress(V, tail, self._W, i)
+        return _pack_digest(*V)
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+#不超过该长度的消息一次性哈希时整体填充后直接压缩；更长的走增量对象，避免为填充复制整条消息
+ONESHOT_MAX = 1 << 16
+
+def python_sm3_hash(message: bytes) -> bytes:
     #SM3哈希函数实现（遵循GB/T 32905-2016）
-    #消息填充
-    msg_len = len(message) * 8
-    message += b'\x80'
-    while (len(message) * 8) % 512 != 448:
-        message += b'\x00'
-    message += msg_len.to_bytes(8, byteorder='big')
-    
-    #初始向量
-    V = [0x7380166f, 0x4914b2b9, 0x172442d7, 0xda8a0600,
-         0xa96f30bc, 0x163138aa, 0xe38dee4d, 0xb0fb0e4e]
-    T = [0x79cc4519, 0x7a879d8a]  #常量
-    
-    #按512位分组处理
-    for i in range(0, len(message), 64):
-        B = message[i:i+64]
-        W = [0] * 68  #消息扩展字
-        
-        #前16个字
-        for j in range(16):
-            W[j] = int.from_bytes(B[j*4:(j+1)*4], 'big') & 0xFFFFFFFF
-        
-        #后52个字
+    #短消息（Z值、KDF输入等热点）只构造一次填充后的字节串，直接调用_compress，
+    #不建增量对象、不做memoryview转换
+    if len(message) > ONESHOT_MAX:
+        return PythonSM3(message).digest()
+    length = len(message)
+    padded = b''.join((message, b'\x80', bytes((55 - length) % 64), (length * 8).to_bytes(8, 'big')))
+    V = IV
+    W = [0] * 68
+    for i in range(0, len(padded), 64):
+        V = _compress(V, padded, W, i)
+    return _pack_digest(*V)
+
+#原生后端：用SM3_Native.py build编译过Project4-SM3的C++实现时，SM3与sm3_hash自动改用原生库，
+#SM2各模块经此导入即随之加速；未编译时使用上面的纯Python实现
+#环境变量SM2_OPTI_SM3可强制指定后端（python/opti1/opti2，不可用时忽略）
+_native = SM3_Native.load_backend(os.environ.get('SM2_OPTI_SM3'))
+if _native is None:
+    SM3_BACKEND = 'python'
+    SM3 = PythonSM3
+    sm3_hash = python_sm3_hash
+else:
+    SM3_BACKEND = _native.backend
+    SM3 = _native
+    sm3_hash = _native.oneshot
+
+class SM3HMACKey:
+    #绑定密钥的HMAC-SM3（RFC 2104）：K ^ ipad与K ^ opad两个分组在构造时各压缩一次，
+    #每条消息从这两个中间状态copy后继续，短消息（不超过55字节）的MAC只需2次压缩而非4次
+    digest_size = 32
+    block_size = 64
+
+    def __init__(self, key: bytes):
+        key = bytes(key)
+        if len(key) > self.block_size:
+            key = sm3_hash(key)
+        key = key.ljust(self.block_size, b'\x00')
+        self._inner = SM3(bytes(k ^ 0x36 for k in key))
+        self._outer = SM3(bytes(k ^ 0x5C for k in key))
+
+    def new(self, message: bytes = b'') -> 'SM3HMAC':
+        #增量式HMAC对象
+        return SM3HMAC(self, message)
+
+    def mac(self, message: bytes) -> bytes:
+        inner = self._inner.copy()
+        inner.update(message)
+        outer = self._outer.copy()
+        outer.update(inner.digest())
+        return outer.digest()
+
+    def verify(self, message: bytes, tag: bytes) -> bool:
+        #常数时间比较
+        return hmac.compare_digest(self.mac(message), tag)
+
+class SM3HMAC:
+    #增量式HMAC-SM3对象（接口与hmac.HMAC一致：update/copy/digest/hexdigest）
+    name = 'hmac-sm3'
+    digest_size = 32
+    block_size = 64
+
+    def __init__(self, key, message: bytes = b''):
+        #key为密钥字节串或已构造的SM3HMACKey（复用其中间状态）
+        if not isinstance(key, SM3HMACKey):
+            key = SM3HMACKey(key)
+        self._key = key
+        self._inner = key._inner.copy()
+        if message:
+            self._inner.update(message)
+
+    def update(self, message: bytes):
+        self._inner.update(message)
+
+    def copy(self):
+        other = SM3HMAC.__new__(SM3HMAC)
+        other._key = self._key
+        other._inner = self._inner.copy()
+        return other
+
+    def digest(self) -> bytes:
+        outer = self._key._outer.copy()
+        outer.update(self._inner.digest())
+        return outer.digest()
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+def hmac_sm3(key: bytes, message: bytes) -> bytes:
+    #一次性HMAC-SM3；同一密钥计算多条消息时应复用SM3HMACKey
+    return SM3HMACKey(key).mac(message)
+
+def hkdf_extract(salt: bytes, ikm: bytes) -> bytes:
+    #HKDF-Extract（RFC 5869）：PRK = HMAC-SM3(salt, IKM)，salt为空时取32个零字节
+    return hmac_sm3(salt or b'\x00' * SM3HMACKey.digest_size, ikm)
+
+def hkdf_expand(prk: bytes, info: bytes = b'', length: int = 32) -> bytes:
+    #HKDF-Expand：T(i) = HMAC-SM3(PRK, T(i-1) || info || i)，各块共用PRK的中间状态
+    if not 0 <= length <= 255 * SM3HMACKey.digest_size:
+        raise ValueError("HKDF输出长度不能超过255 * 32字节")
+    key = SM3HMACKey(prk)
+    blocks, block = [], b''
+    for i in range(1, (length + SM3HMACKey.digest_size - 1) // SM3HMACKey.digest_size + 1):
+        block = key.mac(block + info + bytes([i]))
+        blocks.append(block)
+    return b''.join(blocks)[:length]
+
+def hkdf(ikm: bytes, length: int = 32, salt: bytes = b'', info: bytes = b'') -> bytes:
+    #HKDF-SM3：先提取再扩展
+    return hkdf_expand(hkdf_extract(salt, ikm), info, length)
+
+def _pad(message: bytes) -> bytes:
+    #填充为64字节的整数倍：message || 0x80 || 0x00... || 64位消息比特长度
+    return message + b'\x80' + b'\x00' * ((55 - len(message)) % 64) + (len(message) * 8).to_bytes(8, 'big')
+
+#同一分组数的消息不少于该条数时走NumPy多通道路径，更少的（零散消息）逐条计算
+#实测16条时NumPy仍慢于逐条计算（约3.5k对4.4k次/秒），几十条起才稳定领先，64条时约为逐条的4倍
+NUMPY_SM3_MIN_LANES = 64
+
+def _rotl_lanes(x, n):
+    #uint32数组逐元素循环左移
+    n %= 32
+    return (x << np.uint32(n)) | (x >> np.uint32(32 - n))
+
+def _sm3_lanes(words, blocks):
+    #NumPy多通道SM3：words为(16·blocks, N)的uint32数组，第i列是第i条已填充消息的大端字
+    #每一步消息扩展与轮函数都对N条消息同时计算，返回(8, N)的最终状态
+    lanes = words.shape[1]
+    V = [np.full(lanes, v, dtype=np.uint32) for v in IV]
+    T_rot = [np.uint32(t) for t in _T_ROT]
+    for block in range(blocks):
+        W = list(words[16*block:16*block+16])
         for j in range(16, 68):
-            W[j] = (W[j-16] ^ W[j-9] ^ 
-                   ((W[j-3] << 15) | (W[j-3] >> 17)) ^ 
-                   ((W[j-13] << 7) | (W[j-13] >> 25))) & 0xFFFFFFFF
-        
-        W_ = [W[j] ^ W[j+4] for j in range(64)]  #辅助扩展
-        
-        #压缩函数
+            x = W[j-16] ^ W[j-9] ^ _rotl_lanes(W[j-3], 15)
+            W.append(x ^ _rotl_lanes(x, 15) ^ _rotl_lanes(x, 23) ^ _rotl_lanes(W[j-13], 7) ^ W[j-6])
         A, B_, C, D, E, F, G_, H = V
         for j in range(64):
-            #计算SS1和SS2
+            A12 = _rotl_lanes(A, 12)
+            SS1 = _rotl_lanes(A12 + E + T_rot[j], 7)  #uint32加法自动模2^32
+            SS2 = SS1 ^ A12
             if j < 16:
-                SS1 = ((A << 12) | (A >> 20)) + E + (T[0] << j)
+                FF = A ^ B_ ^ C
+                GG = E ^ F ^ G_
             else:
-                SS1 = ((A << 12) | (A >> 20)) + E + (T[1] << (j % 32))
-            SS1 = SS1 & 0xFFFFFFFF
-            SS2 = SS1 ^ ((A << 12) | (A >> 20))
-            
-            #计算TT1和TT2
-            TT1 = (A ^ B_ ^ C) + D + SS2 + W_[j]
-            TT2 = (E ^ F ^ G_) + H + SS1 + W[j]
-            TT1, TT2 = TT1 & 0xFFFFFFFF, TT2 & 0xFFFFFFFF
-            
-            #更新状态
-            A, B_, C, D = TT1, A, (B_ << 9) | (B_ >> 23), C
-            E = (TT2 ^ ((TT2 << 9) | (TT2 >> 23)) ^ ((TT2 << 17) | (TT2 >> 15))) & 0xFFFFFFFF
-            F, G_, H = E, F, G_
-        
-        #更新向量
-        V = [(V[k] ^ [A, B_, C, D, E, F, G_, H][k]) & 0xFFFFFFFF for k in range(8)]
-    
-    #转换为字节
-    hex_digest = ''.join(f'{x:08x}' for x in V)
-    return bytes.fromhex(hex_digest)
-    
\ No newline at end of file
+                FF = (A & B_) | (A & C) | (B_ & C)
+                GG = (E & F) | (~E & G_)
+            TT1 = FF + D + SS2 + (W[j] ^ W[j+4])
+            TT2 = GG + H + SS1 + W[j]
+            A, B_, C, D = TT1, A, _rotl_lanes(B_, 9), C
+            E, F, G_, H = TT2 ^ _rotl_lanes(TT2, 9) ^ _rotl_lanes(TT2, 17), E, _rotl_lanes(F, 19), G_
+        V = [V[0] ^ A, V[1] ^ B_, V[2] ^ C, V[3] ^ D, V[4] ^ E, V[5] ^ F, V[6] ^ G_, V[7] ^ H]
+    return np.stack(V)
+
+def sm3_hash_many(messages) -> list:
+    #批量SM3：返回与messages一一对应的摘要列表，结果与逐条sm3_hash逐位一致
+    #安装了NumPy时，填充后分组数相同且条数不少于NUMPY_SM3_MIN_LANES的消息组成(N, 16·分组数)的
+    #uint32数组一起计算；其余消息及无NumPy时逐条走标量路径
+    #（逐条路径经sm3_hash，启用原生后端时即调用原生库）
+    messages = [bytes(message) for message in messages]
+    digests = [None] * len(messages)
+    if np is not None:
+        groups = {}  #填充后分组数 -> 消息下标
+        for index, message in enumerate(messages):
+            groups.setdefault((len(message) + 72) // 64, []).append(index)
+        for blocks, indices in groups.items():
+            if len(indices) < NUMPY_SM3_MIN_LANES:
+                continue
+            padded = b''.join(_pad(messages[i]) for i in indices)
+            words = np.frombuffer(padded, dtype='>u4').astype(np.uint32).reshape(len(indices), 16 * blocks)
+            state = _sm3_lanes(np.ascontiguousarray(words.T), blocks)
+            out = np.ascontiguousarray(state.T).astype('>u4').tobytes()
+            for lane, i in enumerate(indices):
+                digests[i] = out[32*lane:32*lane+32]
+    for index, message in enumerate(messages):
+        if digests[index] is None:
+            digests[index] = sm3_hash(message)
+    return digests
@@ -0,0 +1,228 @@
+import argparse
+import ctypes
+import os
+import shutil
+import subprocess
+import sys
+
+#原生SM3后端（可选）：把Project4-SM3的C++实现编译为共享库，经ctypes调用
+#  opti1：SM3_Opti1/SM3_Unrol.cpp（循环展开）
+#  opti2：SM3_Opti2/SM3_SIMD.cpp（以-mavx2编译；单路压缩函数，其8路批量接口未导出）
+#native/sm3_capi.cpp为C++ SM3类加一层C接口；库不随仓库提交，部署时执行一次
+#  python SM3_Native.py build
+#编译到本目录下；未编译、缺少编译器或CPU不支持时load_backend返回None，SM3.py退回纯Python实现
+#输入数据经缓冲区协议直接把指针交给C代码，bytes/bytearray/memoryview/mmap均不复制；
+#ctypes调用期间释放GIL，多线程可并行哈希
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJECT4_DIR = os.path.join(HERE, '..', '..', 'Project4-SM3')
+SHIM_SOURCE = os.path.join(HERE, 'native', 'sm3_capi.cpp')
+#名称 -> (源码目录, 源文件名, 额外编译选项)
+NATIVE_SOURCES = {
+    'opti1': ('SM3_Opti1/SM3_Opti1', 'SM3_Unrol', []),
+    'opti2': ('SM3_Opti2/SM3_Opti2', 'SM3_SIMD', ['-mavx2']),
+}
+PREFERENCE = ('opti1', 'opti2')  #自动选择时的优先顺序：opti1不依赖AVX2，单路吞吐量实测与opti2相当
+_ABC_DIGEST = bytes.fromhex('66c7f0f462eeedd9d1f2d46bdc10e4e24167c4875cf2f7a2297da02b8f4ba8e0')
+
+def library_path(name: str, directory: str = HERE) -> str:
+    suffix = '.dll' if sys.platform == 'win32' else '.so'
+    return os.path.join(directory, f'_sm3_{name}{suffix}')
+
+def source_paths(name: str) -> list:
+    #编译后端name所需的源文件（C接口与Project4的实现）
+    source_dir, stem, _ = NATIVE_SOURCES[name]
+    source_dir = os.path.join(PROJECT4_DIR, source_dir)
+    return [SHIM_SOURCE, os.path.join(source_dir, stem + '.cpp'), os.path.join(source_dir, stem + '.h')]
+
+def buildable_backends() -> list:
+    #源文件齐全、可以编译的后端名称（单独检出Project5-SM2时没有Project4-SM3的源码）
+    return [name for name in NATIVE_SOURCES if all(map(os.path.exists, source_paths(name)))]
+
+def build(names=None, compiler: str = None, directory: str = HERE) -> dict:
+    #用GCC/Clang风格的C++编译器编译原生库，返回{名称: 库路径}；缺少源文件或编译失败时抛出RuntimeError
+    #先写临时文件再替换，不覆盖其他进程已加载的库
+    compiler = compiler or os.environ.get('CXX') or shutil.which('c++') or shutil.which('g++') or \
+        shutil.which('clang++')
+    if not compiler:
+        raise RuntimeError("未找到C++编译器（可用环境变量CXX指定）")
+    built = {}
+    for name in names or NATIVE_SOURCES:
+        if name not in NATIVE_SOURCES:
+            raise ValueError(f"未知的原生SM3后端: {name}")
+        missing = [source for source in source_paths(name) if not os.path.exists(source)]
+        if missing:
+            raise RuntimeError(f"编译原生SM3后端{name}缺少源文件: {', '.join(missing)}")
+        source_dir, stem, flags = NATIVE_SOURCES[name]
+        source_dir = os.path.join(PROJECT4_DIR, source_dir)
+        path = library_path(name, directory)
+        command = [compiler, '-O2', '-std=c++17', '-shared', '-fPIC', *flags,
+                   f'-DSM3_HEADER="{stem}.h"', '-I', source_dir,
+                   SHIM_SOURCE, os.path.join(source_dir, stem + '.cpp'), '-o', path + '.tmp']
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        if result.returncode:
+            if os.path.exists(path + '.tmp'):
+                os.remove(path + '.tmp')
+            raise RuntimeError(f"编译原生SM3后端{name}失败:\n{' '.join(command)}\n{result.stdout}")
+        os.replace(path + '.tmp', path)
+        built[name] = path
+    return built
+
+def _cpu_supports(name):
+    #Project4的实现按小端主机读取消息字；opti2还要求CPU支持AVX2（只在Linux上检测，其他平台视为不支持）
+    if sys.byteorder != 'little':
+        return False
+    if name != 'opti2':
+        return True
+    try:
+        with open('/proc/cpuinfo', encoding='utf-8', errors='replace') as f:
+            return any(line.startswith('flags') and ' avx2' in line for line in f)
+    except OSError:
+        return False
+
+def available_backends(directory: str = HERE) -> list:
+    #已编译且当前CPU可运行的原生后端名称
+    return [name for name in PREFERENCE
+            if os.path.exists(library_path(name, directory)) and _cpu_supports(name)]
+
+#缓冲区协议：PyObject_GetBuffer取得任意字节类对象的数据指针，用完PyBuffer_Release
+#（ctypes.pythonapi在PyPy等解释器上不存在，此时非bytes输入先复制为bytes）
+class _PyBuffer(ctypes.Structure):
+    _fields_ = [('buf', ctypes.c_void_p), ('obj', ctypes.c_void_p), ('len', ctypes.c_ssize_t),
+                ('itemsize', ctypes.c_ssize_t), ('readonly', ctypes.c_int), ('ndim', ctypes.c_int),
+                ('format', ctypes.c_char_p), ('shape', ctypes.c_void_p), ('strides', ctypes.c_void_p),
+                ('suboffsets', ctypes.c_void_p), ('internal', ctypes.c_void_p)]
+
+_pythonapi = getattr(ctypes, 'pythonapi', None)
+if _pythonapi is not None:
+    _get_buffer = _pythonapi.PyObject_GetBuffer
+    _get_buffer.argtypes = [ctypes.py_object, ctypes.POINTER(_PyBuffer), ctypes.c_int]
+    _get_buffer.restype = ctypes.c_int
+    _release_buffer = _pythonapi.PyBuffer_Release
+    _release_buffer.argtypes = [ctypes.POINTER(_PyBuffer)]
+    _release_buffer.restype = None
+else:
+    _get_buffer = None
+PyBUF_SIMPLE = 0  #只要求连续内存，不要求可写
+
+def _call_with_buffer(function, data, *args):
+    #调用function(*args, 数据指针, 字节数)；bytes直接传对象内部指针，其他对象经缓冲区协议取指针
+    if type(data) is bytes:
+        return function(*args, data, len(data))
+    if _get_buffer is None:
+        data = bytes(data)
+        return function(*args, data, len(data))
+    view = _PyBuffer()
+    _get_buffer(data, ctypes.byref(view), PyBUF_SIMPLE)  #非连续或不支持缓冲区协议时抛出异常
+    try:
+        return function(*args, view.buf, view.len)
+    finally:
+        _release_buffer(ctypes.byref(view))
+
+class NativeSM3:
+    #原生库上的增量SM3对象（接口与hashlib一致：update/copy/digest/hexdigest）
+    #每个后端由load_backend生成一个子类，类属性_lib/_state_words绑定对应的库
+    name = 'sm3'
+    digest_size = 32
+    block_size = 64
+    backend = None
+    _lib = None
+    _state_words = 0  #C++ SM3对象占用的64位字数
+
+    def __init__(self, data: bytes = b''):
+        self._state = (ctypes.c_uint64 * self._state_words)()
+        self._lib.sm3_native_init(self._state)
+        if data:
+            self.update(data)
+
+    def update(self, data: bytes):
+        _call_with_buffer(self._lib.sm3_native_update, data, self._state)
+
+    def copy(self):
+        other = type(self).__new__(type(self))
+        other._state = (ctypes.c_uint64 * self._state_words)()
+        ctypes.memmove(other._state, self._state, ctypes.sizeof(self._state))
+        return other
+
+    def digest(self) -> bytes:
+        #C++的final会改写状态，C接口在副本上计算，本对象可继续update
+        out = ctypes.create_string_buffer(32)
+        self._lib.sm3_native_digest(self._state, out)
+        return out.raw
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+    @classmethod
+    def oneshot(cls, message: bytes) -> bytes:
+        #一次性哈希，只跨越一次ctypes边界
+        out = ctypes.create_string_buffer(32)
+        _call_with_buffer(cls._lib.sm3_native_hash, message, out)
+        return out.raw
+
+#已加载的后端类（每个库只加载一次）
+_loaded = {}
+
+def _load(name, directory):
+    lib = ctypes.CDLL(library_path(name, directory))
+    lib.sm3_native_state_size.argtypes = []
+    lib.sm3_native_state_size.restype = ctypes.c_size_t
+    lib.sm3_native_init.argtypes = [ctypes.c_void_p]
+    lib.sm3_native_init.restype = None
+    lib.sm3_native_update.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t]
+    lib.sm3_native_update.restype = None
+    lib.sm3_native_digest.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+    lib.sm3_native_digest.restype = None
+    lib.sm3_native_hash.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t]
+    lib.sm3_native_hash.restype = None
+    words = (lib.sm3_native_state_size() + 7) // 8
+    cls = type(f'NativeSM3_{name}', (NativeSM3,), {'backend': name, '_lib': lib, '_state_words': words})
+    #自检：结果与标准向量不符（如编译器或平台差异）时不启用该后端
+    partial = cls(b'ab').copy()
+    partial.update(b'c')
+    if cls.oneshot(b'abc') != _ABC_DIGEST or partial.digest() != _ABC_DIGEST:
+        raise OSError(f"原生SM3后端{name}自检失败")
+    return cls
+
+def load_backend(name: str = None, directory: str = HERE):
+    #返回指定原生后端的SM3类；name为None时按PREFERENCE选第一个可用的，为'python'时返回None
+    #指定的后端不可用时同样自动选择；库加载失败或自检失败的后端跳过
+    if name == 'python':
+        return None
+    candidates = [name] if name in available_backends(directory) else available_backends(directory)
+    for candidate in candidates:
+        key = (candidate, directory)
+        if key not in _loaded:
+            try:
+                _loaded[key] = _load(candidate, directory)
+            except OSError:
+                _loaded[key] = None
+        if _loaded[key] is not None:
+            return _loaded[key]
+    return None
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='SM3_Native', description='编译/查看原生SM3后端')
+    parser.add_argument('command', nargs='?', choices=('build', 'info'), default='info')
+    parser.add_argument('names', nargs='*', help=f"要编译的后端（默认全部：{', '.join(NATIVE_SOURCES)}）")
+    parser.add_argument('--cxx', help='C++编译器（默认取环境变量CXX或PATH中的c++/g++/clang++）')
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        try:
+            for name, path in build(args.names, args.cxx).items():
+                print(f'{name}: {path}')
+        except (RuntimeError, ValueError) as error:
+            print(error, file=sys.stderr)
+            return 1
+    for name in NATIVE_SOURCES:
+        if not os.path.exists(library_path(name)):
+            state = '未编译'
+        elif not _cpu_supports(name):
+            state = '当前CPU不支持'
+        else:
+            state = '可用' if load_backend(name) and load_backend(name).backend == name else '加载或自检失败'
+        print(f'{name}: {state}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
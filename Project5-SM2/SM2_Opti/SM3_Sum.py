@@ -0,0 +1,205 @@
+import argparse
+import mmap
+import os
+import re
+import stat
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from SM3 import SM3
+
+#sm3sum：按coreutils校验和格式计算/校验文件的SM3摘要
+#普通文件经mmap映射后按64字节对齐的大块送入增量SM3，不把整个文件读入bytes；
+#管道、FIFO、进程替换与/proc文件等（大小不可信）按块读取；
+#多个文件由进程池并发计算，任务按文件大小从大到小提交，使大文件尽早开始、小文件填补空闲；
+#输出仍按命令行参数顺序
+#
+#用法：
+#  python SM3_Sum.py FILE...                  输出"摘要  文件名"
+#  python SM3_Sum.py --tag FILE...            输出"SM3 (文件名) = 摘要"
+#  python SM3_Sum.py -c MANIFEST              校验清单中的每个文件
+
+PROG = 'sm3sum'
+CHUNK_SIZE = 1 << 22  #每次送入SM3的字节数（向下取整为64的倍数）
+
+def _sm3_stream(h, stream, chunk_size):
+    #按块读取到EOF
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        h.update(chunk)
+    return h.digest()
+
+def sm3_file(path: str, chunk_size: int = CHUNK_SIZE) -> bytes:
+    #计算文件的SM3摘要，path为'-'时读取标准输入
+    chunk_size = max(64, chunk_size // 64 * 64)  #按分组对齐，update不会产生跨块的缓冲拷贝
+    h = SM3()
+    if path == '-':
+        return _sm3_stream(h, sys.stdin.buffer, chunk_size)
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        #只有大小非零的普通文件才映射：空文件无法映射，非普通文件的st_size为0或不反映实际内容
+        if not (stat.S_ISREG(st.st_mode) and size > 0):
+            return _sm3_stream(h, f, chunk_size)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, size, chunk_size):
+                    h.update(view[offset:offset+chunk_size])
+            finally:
+                view.release()
+    return h.digest()
+
+def _hash_job(path, chunk_size):
+    #进程池任务：返回(十六进制摘要, None)或(None, 错误信息)
+    try:
+        return sm3_file(path, chunk_size).hex(), None
+    except OSError as error:
+        return None, error.strerror or str(error)
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def hash_files(paths, processes: int = None, chunk_size: int = CHUNK_SIZE):
+    #按paths顺序逐个产出(path, 十六进制摘要或None, 错误信息或None)
+    #多于一个文件时用进程池并发计算，任务按文件大小降序提交；标准输入始终在本进程读取
+    paths = list(paths)
+    processes = processes or os.cpu_count() or 1
+    files = [path for path in paths if path != '-']
+    if processes == 1 or len(files) < 2:
+        for path in paths:
+            yield (path, *_hash_job(path, chunk_size))
+        return
+    with ProcessPoolExecutor(max_workers=min(processes, len(files))) as executor:
+        futures = {}
+        for path in sorted(set(files), key=_file_size, reverse=True):
+            futures[path] = executor.submit(_hash_job, path, chunk_size)
+        for path in paths:
+            if path == '-':
+                yield (path, *_hash_job(path, chunk_size))
+            else:
+                yield (path, *futures[path].result())
+
+def _escape(name):
+    #coreutils约定：文件名含反斜杠或换行时转义，并在行首加反斜杠
+    if '\\' not in name and '\n' not in name and '\r' not in name:
+        return '', name
+    return '\\', name.replace('\\', '\\\\').replace('\n', '\\n').replace('\r', '\\r')
+
+def _unescape(name):
+    return re.sub(r'\\(.)', lambda m: {'n': '\n', 'r': '\r'}.get(m.group(1), m.group(1)), name)
+
+def _status_line(path, status):
+    prefix, name = _escape(path)
+    return f'{prefix}{name}: {status}'
+
+def format_line(path: str, digest: str, tag: bool = False) -> str:
+    prefix, name = _escape(path)
+    if tag:
+        return f'{prefix}SM3 ({name}) = {digest}'
+    return f'{prefix}{digest}  {name}'
+
+_TAG_LINE = re.compile(r'^SM3 \((.*)\) = ([0-9a-fA-F]{64})$')
+_PLAIN_LINE = re.compile(r'^([0-9a-fA-F]{64}) [ *](.*)$')
+
+def parse_line(line: str):
+    #解析一行清单（两种格式均可），返回(path, 小写摘要)，格式不符时返回None
+    line = line.rstrip('\n').rstrip('\r')
+    escaped = line.startswith('\\')
+    if escaped:
+        line = line[1:]
+    match = _TAG_LINE.match(line)
+    if match:
+        name, digest = match.groups()
+    else:
+        match = _PLAIN_LINE.match(line)
+        if not match:
+            return None
+        digest, name = match.groups()
+    return (_unescape(name) if escaped else name), digest.lower()
+
+def check_manifests(manifests, processes=None, chunk_size=CHUNK_SIZE, quiet=False, status=False,
+                    out=None, err=None) -> int:
+    #--check模式：逐行校验清单中的文件，返回退出码（全部通过为0）
+    out = out or sys.stdout
+    err = err or sys.stderr
+    exit_code = 0
+    for manifest in manifests:
+        try:
+            if manifest == '-':
+                lines = sys.stdin.read().splitlines()
+            else:
+                with open(manifest, encoding='utf-8', newline='') as f:
+                    lines = f.read().splitlines()
+        except OSError as error:
+            print(f'{PROG}: {manifest}: {error.strerror}', file=err)
+            exit_code = 1
+            continue
+        entries, malformed = [], 0
+        for line in lines:
+            entry = parse_line(line)
+            if entry is None:
+                malformed += 1
+            else:
+                entries.append(entry)
+        if not entries:
+            print(f'{PROG}: {manifest}: no properly formatted SM3 checksum lines found', file=err)
+            exit_code = 1
+            continue
+        mismatched = unreadable = 0
+        results = hash_files([path for path, _ in entries], processes, chunk_size)
+        for (path, expected), (_, digest, error) in zip(entries, results):
+            if error is not None:
+                unreadable += 1
+                if not status:
+                    print(f'{PROG}: {path}: {error}', file=err)
+                    print(_status_line(path, 'FAILED open or read'), file=out)
+            elif digest != expected:
+                mismatched += 1
+                if not status:
+                    print(_status_line(path, 'FAILED'), file=out)
+            elif not (quiet or status):
+                print(_status_line(path, 'OK'), file=out)
+        if not status:
+            if malformed:
+                print(f'{PROG}: WARNING: {malformed} line{"s are" if malformed > 1 else " is"} '
+                      f'improperly formatted', file=err)
+            if unreadable:
+                print(f'{PROG}: WARNING: {unreadable} listed file{"s" if unreadable > 1 else ""} '
+                      f'could not be read', file=err)
+            if mismatched:
+                print(f'{PROG}: WARNING: {mismatched} computed checksum{"s" if mismatched > 1 else ""} '
+                      f'did NOT match', file=err)
+        if mismatched or unreadable:
+            exit_code = 1
+    return exit_code
+
+def main(argv=None, out=None, err=None) -> int:
+    out = out or sys.stdout
+    err = err or sys.stderr
+    parser = argparse.ArgumentParser(prog=PROG, description='计算或校验文件的SM3摘要')
+    parser.add_argument('files', nargs='*', default=['-'], help="文件（缺省或'-'为标准输入）")
+    parser.add_argument('-c', '--check', action='store_true', help='从清单文件读取摘要并校验')
+    parser.add_argument('--tag', action='store_true', help='输出BSD风格的"SM3 (文件) = 摘要"')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='并发进程数（默认为CPU核数）')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='每次送入SM3的字节数')
+    parser.add_argument('--quiet', action='store_true', help='校验时不输出通过的文件')
+    parser.add_argument('--status', action='store_true', help='校验时不输出任何内容，仅以退出码表示结果')
+    args = parser.parse_args(argv)
+    files = args.files or ['-']
+
+    if args.check:
+        return check_manifests(files, args.jobs, args.chunk_size, args.quiet, args.status, out, err)
+
+    exit_code = 0
+    for path, digest, error in hash_files(files, args.jobs, args.chunk_size):
+        if error is not None:
+            print(f'{PROG}: {path}: {error}', file=err)
+            exit_code = 1
+        else:
+            print(format_line(path, digest, args.tag), file=out)
+    return exit_code
+
+if __name__ == '__main__':
+    sys.exit(main())
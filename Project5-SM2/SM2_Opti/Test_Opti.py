@@ -1,6 +1,21 @@
-from SM2_Sign import SM2Signature
-from SM2 import generate_key, encrypt, decrypt, montgomery_mul, r_inv, r_sq, p
-from SM2_Base import G, ECPoint, precomputed_G, mod_inverse
+from SM2_Sign import SM2Signature, compute_Z, PresignPool, SM2PrivateKeyHandle, SM2PublicKeyHandle
+from SM2 import generate_key, generate_keys, encrypt, encrypt_batch, decrypt, montgomery_mul, r_sq, p, \
+                montgomery_reduce, montgomery_mul_domain, encrypt_stream, decrypt_stream, kdf, xor_bytes
+from SM2_Base import G, n, ECPoint, FixedBaseTable, get_precomputed_table, multiply_fixed, mod_inverse, \
+                     wnaf, multiply_joint, batch_inverse, batch_normalize, KeyTableCache, \
+                     save_table_cache, load_table_cache, table_cache_path, init_precomputed_table, \
+                     get_curve, SCALAR_MULT_STRATEGIES, \
+                     JACOBIAN_INFINITY, jacobian_add, jacobian_add_mixed, jacobian_double, \
+                     count_operations, OPERATION_KINDS
+from SM2_Field import SM2P256_P, SM2P256Field, MontgomeryField, make_field, available_backends, \
+                      fastest_field, calibrate_field, load_field_choice, DEFAULT_FIELD
+from SM2_Codec import encode_point, decode_point, encode_ciphertext, decode_ciphertext, encode_signature, \
+                      decode_signature, encode_signature_der, decode_signature_der, encode_private_key, \
+                      decode_private_key, sqrt_mod
+from SM2_Pool import SM2ProcessPool
+from SM3 import SM3, sm3_hash, sm3_hash_many, NUMPY_SM3_MIN_LANES, SM3HMACKey, SM3HMAC, hmac_sm3, \
+                hkdf, hkdf_extract, hkdf_expand
+import SM3_Sum
 
 def test_montgomery_mul():
     #测试蒙哥马利模乘正确性
@@ -9,21 +24,403 @@ def test_montgomery_mul():
     expected = (a * b) % p
     actual = montgomery_mul(a, b)
     assert actual == expected, f"蒙哥马利模乘错误：预期{hex(expected)}，实际{hex(actual)}"
+
+    #蒙哥马利域：a·r与b·r相乘约简后得到a·b·r，再约简一次回到普通表示
+    a_m, b_m = montgomery_reduce(a * r_sq), montgomery_reduce(b * r_sq)
+    assert montgomery_reduce(montgomery_mul_domain(a_m, b_m)) == expected, "蒙哥马利域乘法错误"
+    field = MontgomeryField(p)
+    for x, y, c in [(0, 5, 1), (p - 1, p - 1, 8), (a, b, -3), (p - 2, 1, 4)]:
+        X, Y = field.to_domain(x), field.to_domain(y)
+        assert field.from_domain(field.reduce(c * X * Y)) == (c * x * y) % p, "REDC结果错误"
+    assert field.from_domain(field.one) == 1
     print("蒙哥马利模乘测试通过")
 
+def test_field_backends():
+    #测试sm2p256v1专用约简与通用约简结果一致，并在标准曲线上验证两种后端
+    import random
+    solinas = SM2P256Field()
+    generic = make_field(SM2P256_P)
+    P = SM2P256_P
+    edge = [0, 1, P - 1, P, P + 1, 2**256 - 1, 2**256, (P - 1) ** 2, -1, -(P - 1) ** 2]
+    for t in edge + [random.randrange(-P * P, P * P) for _ in range(1000)]:
+        assert solinas.reduce(t) == generic.reduce(t) == t % P, f"约简结果错误: {t}"
+    try:
+        make_field(SM2P256_P, 'unknown')
+        assert False, "未知后端应抛出异常"
+    except ValueError:
+        pass
+
+    #GB/T 32918.5示例私钥对应的公钥
+    d = 0x3945208F7B2144B13F36E38AC6D39F95889393692860B51A42FB81EF4DF7C5B8
+    Qx = 0x09F9DF311E5421A150DD7D161E4BC5C672179FAD1833FC076BB08FF356F35020
+    Qy = 0xCCEA490CE26775A52DC6EA718CC1AA600AED05FBF35E084A6632F6072DA9AD13
+    assert available_backends(SM2P256_P) == ['generic', 'montgomery', 'solinas']
+    assert fastest_field(p).name in available_backends(p)
+
+    #后端选择不在导入时计时：无缓存时为固定默认后端，calibrate_field的测量结果落盘后各进程一致
+    import os, tempfile
+    import SM2_Field
+    saved = {name: os.environ.get(name) for name in ('SM2_OPTI_CACHE_DIR', 'SM2_OPTI_FIELD')}
+    saved_chosen = dict(SM2_Field._chosen)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['SM2_OPTI_CACHE_DIR'] = tmp
+        os.environ.pop('SM2_OPTI_FIELD', None)
+        try:
+            SM2_Field._chosen.clear()
+            assert load_field_choice(SM2P256_P) is None
+            assert fastest_field(SM2P256_P).name == DEFAULT_FIELD
+            #构建并缓存基点表不会顺带测量后端，测量只在显式调用时进行
+            test_curve = get_curve()
+            saved_table = test_curve.precomputed
+            try:
+                init_precomputed_table(3, curve=test_curve)
+                assert os.path.exists(table_cache_path(3, test_curve))
+                assert load_field_choice(test_curve.p) is None, "建表不应写入后端测量结果"
+            finally:
+                test_curve.precomputed = saved_table
+            assert SM2_Field.main(['calibrate']) == 0
+            assert load_field_choice(test_curve.p) is not None
+            measured = calibrate_field(SM2P256_P)
+            assert load_field_choice(SM2P256_P) == measured
+            assert fastest_field(SM2P256_P).name == DEFAULT_FIELD, "测量结果不应改变当前进程已选定的后端"
+            SM2_Field._chosen.clear()  #相当于新进程
+            assert fastest_field(SM2P256_P).name == measured
+            os.environ['SM2_OPTI_FIELD'] = 'solinas'
+            assert fastest_field(SM2P256_P).name == 'solinas', "环境变量应优先于缓存"
+            with open(SM2_Field.field_cache_path(SM2P256_P), 'w') as f:
+                f.write('unknown')
+            assert load_field_choice(SM2P256_P) is None, "无效的缓存内容应忽略"
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+            SM2_Field._chosen.clear()
+            SM2_Field._chosen.update(saved_chosen)
+    for backend in ('generic', 'solinas', 'montgomery'):
+        curve = get_curve('sm2p256v1', backend)
+        assert curve.field.name == backend
+        assert curve.G.multiply(curve.n).is_infinity, "n*G应为无穷远点"
+        Q = multiply_fixed(d, curve).to_affine()
+        assert (Q.x, Q.y) == (Qx, Qy), f"{backend}后端公钥计算错误"
+
+        signer = SM2Signature(curve=curve)
+        d2, Q2 = signer.generate_keypair()
+        signature = signer.sign(b'sm2p256v1', d2, Q2)
+        assert signer.verify(b'sm2p256v1', signature, Q2), f"{backend}后端验签失败"
+        assert not signer.verify(b'sm2p256v1!', signature, Q2)
+        assert signer.verify_batch([(b'sm2p256v1', signature, Q2)]) == [True]
+
+        k, Qe = generate_key(curve)
+        assert decrypt(k, encrypt(Qe, b'standard curve'), curve) == b'standard curve'
+    #测试曲线上的蒙哥马利域后端：点乘全程保持域内表示，结果与通用后端一致
+    curve = get_curve(None, 'montgomery')
+    k = n - 0x1234567
+    expected = G.multiply(k)
+    assert curve.G.multiply(k) == expected and curve.G.multiply_ladder(k) == expected
+    assert multiply_fixed(k, curve) == expected
+    assert multiply_joint(k, 3, curve.G) == G.multiply(k + 3)
+    assert curve.G + curve.G.double() == G.multiply(3)
+    assert get_curve().name == 'sm2-test' and G is get_curve().G, "默认曲线应为测试曲线"
+    print("域运算后端测试通过")
+
+def test_sm3_incremental():
+    #测试SM3标准向量（GB/T 32905-2016附录A）及增量接口
+    assert sm3_hash(b"abc").hex() == "66c7f0f462eeedd9d1f2d46bdc10e4e24167c4875cf2f7a2297da02b8f4ba8e0"
+    assert sm3_hash(b"abcd" * 16).hex() == "debe9ff92275b8a138604889c18e5a4d6fdb70e5387e5765293dcba39c0c5732"
+    
+    #分段输入（跨越分组边界）与一次性输入结果一致
+    message = bytes(range(256)) * 3
+    for step in (1, 7, 63, 64, 65, 200):
+        h = SM3()
+        for i in range(0, len(message), step):
+            h.update(message[i:i+step])
+        assert h.digest() == sm3_hash(message), f"增量SM3错误，分段长度{step}"
+    
+    #copy后两个对象互不影响
+    h = SM3(b"ab")
+    h2 = h.copy()
+    h.update(b"c")
+    assert h.hexdigest() == sm3_hash(b"abc").hex()
+    assert h2.digest() == sm3_hash(b"ab"), "SM3.copy中间状态错误"
+
+    #两段展开的压缩函数与逐轮分支实现逐位一致（复用扩展缓冲区、按偏移读取分组）
+    import random
+    import SM3 as sm3_module
+    rng = random.Random(3)
+    W = [0] * 68
+    for _ in range(50):
+        V = tuple(rng.getrandbits(32) for _ in range(8))
+        data = bytes(rng.getrandbits(8) for _ in range(80))
+        expected = tuple(sm3_module._compress_loop(V, data[16:80]))
+        assert sm3_module._compress(V, data, W, 16) == expected, "SM3压缩函数结果错误"
+        assert sm3_module._compress(V, memoryview(data)[16:]) == expected
+
+    #一次性哈希的短消息直接路径与增量对象结果一致（含填充跨分组的边界长度）
+    for length in (0, 1, 55, 56, 63, 64, 65, 119, 120, 1000):
+        message = bytes(rng.getrandbits(8) for _ in range(length))
+        expected = sm3_module.PythonSM3(message).digest()
+        for data in (message, bytearray(message), memoryview(message)):
+            assert sm3_module.python_sm3_hash(data) == expected, f"一次性SM3错误: {length}"
+    oneshot_max, sm3_module.ONESHOT_MAX = sm3_module.ONESHOT_MAX, 64
+    try:
+        assert sm3_module.python_sm3_hash(message) == expected
+    finally:
+        sm3_module.ONESHOT_MAX = oneshot_max
+    print("SM3增量哈希测试通过")
+
+def test_sm3_backends():
+    #测试原生SM3后端：所有可用后端（纯Python与已编译的Project4 C++实现）摘要逐位一致
+    #本目录下尚未编译原生库而系统有C++编译器且Project4-SM3源码存在时，编译到临时目录再测试；
+    #单独检出Project5-SM2（没有Project4源码）时只测试纯Python实现
+    import array
+    import mmap
+    import os
+    import random
+    import shutil
+    import sys
+    import tempfile
+    import SM3 as sm3_module
+    import SM3_Native
+    directory = SM3_Native.HERE
+    temp_dir = None
+    buildable = SM3_Native.buildable_backends()
+    if not SM3_Native.available_backends() and buildable and (shutil.which('c++') or shutil.which('g++')):
+        temp_dir = tempfile.mkdtemp()
+        SM3_Native.build(buildable, directory=temp_dir)
+        directory = temp_dir
+    try:
+        backends = {'python': sm3_module.PythonSM3}
+        for name in SM3_Native.available_backends(directory):
+            backend = SM3_Native.load_backend(name, directory)
+            assert backend is not None and backend.backend == name, f"原生SM3后端{name}加载失败"
+            backends[name] = backend
+        assert sm3_module.SM3_BACKEND in backends
+
+        rng = random.Random(25)
+        random_bytes = lambda n: rng.getrandbits(8 * n).to_bytes(n, 'big')
+        messages = [b"", b"abc", b"abcd" * 16] + [random_bytes(n) for n in (55, 56, 63, 64, 65, 1000, 65536)]
+        messages += [random_bytes(rng.randrange(300)) for _ in range(50)]
+        expected = [sm3_module.python_sm3_hash(m) for m in messages]
+        assert expected[1].hex() == "66c7f0f462eeedd9d1f2d46bdc10e4e24167c4875cf2f7a2297da02b8f4ba8e0"
+        assert expected[2].hex() == "debe9ff92275b8a138604889c18e5a4d6fdb70e5387e5765293dcba39c0c5732"
+        for name, backend in backends.items():
+            oneshot = getattr(backend, 'oneshot', lambda m: backend(m).digest())
+            for message, digest in zip(messages, expected):
+                assert oneshot(message) == digest == backend(message).digest(), f"后端{name}摘要错误"
+                #分段输入、copy及digest后继续update
+                h = backend()
+                for i in range(0, len(message), 37):
+                    h.update(message[i:i+37])
+                snapshot = h.copy()
+                assert h.digest() == digest and h.hexdigest() == digest.hex(), f"后端{name}增量摘要错误"
+                h.update(b"tail")
+                assert h.digest() == sm3_module.python_sm3_hash(message + b"tail")
+                assert snapshot.digest() == digest, f"后端{name}的copy错误"
+            #各种实现缓冲区协议的输入（原生后端直接取指针，不复制）
+            data = messages[-1]
+            with mmap.mmap(-1, len(data) + 10) as mapped:
+                mapped[5:5+len(data)] = data
+                view = memoryview(mapped)
+                assert backend(view[5:5+len(data)]).digest() == expected[-1]
+                view.release()
+            assert backend(bytearray(data)).digest() == backend(memoryview(data)).digest() == expected[-1]
+            words = array.array('I', range(100))
+            assert backend(words).digest() == sm3_module.python_sm3_hash(words.tobytes())
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    #缺少Project4源码时不可编译，build给出缺少的文件而不是调用编译器
+    project4_dir, SM3_Native.PROJECT4_DIR = SM3_Native.PROJECT4_DIR, os.path.join(tempfile.gettempdir(), 'missing')
+    try:
+        assert SM3_Native.buildable_backends() == []
+        try:
+            SM3_Native.build(['opti1'], compiler=sys.executable, directory=tempfile.gettempdir())
+            assert False, "缺少源文件时应抛出RuntimeError"
+        except RuntimeError as error:
+            assert "SM3_Unrol.cpp" in str(error)
+    finally:
+        SM3_Native.PROJECT4_DIR = project4_dir
+    print(f"SM3后端一致性测试通过（{', '.join(backends)}；当前使用{sm3_module.SM3_BACKEND}）")
+
+def test_sm3_many():
+    #测试批量SM3：与逐条sm3_hash逐位一致（含分组边界长度、零散消息与非bytes输入）
+    assert sm3_hash_many([]) == []
+    assert sm3_hash_many([b"abc", bytearray(b"abcd" * 16), memoryview(b"")]) == \
+        [sm3_hash(b"abc"), sm3_hash(b"abcd" * 16), sm3_hash(b"")]
+    #同一分组数的消息足够多时走NumPy多通道路径（安装了NumPy时）
+    messages = [b"record-%d" % i for i in range(2 * NUMPY_SM3_MIN_LANES)]
+    messages += [bytes([i]) * length for i, length in enumerate((55, 56, 63, 64, 119, 120, 200))]
+    messages += [bytes(range(i % 256)) * 2 for i in range(40)]
+    assert sm3_hash_many(messages) == [sm3_hash(m) for m in messages], "批量SM3结果错误"
+    print("批量SM3测试通过")
+
+def test_hmac_hkdf():
+    #测试HMAC-SM3与HKDF-SM3（向量与OpenSSL 3的HMAC/HKDF输出一致）
+    import hmac
+    import SM3 as sm3_module
+    assert hmac_sm3(b"Jefe", b"what do ya want for nothing?").hex() == \
+        "2e87f1d16862e6d964b50a5200bf2b10b764faa9680a296a2405f24bec39f882"
+    assert hmac_sm3(b"\x0b" * 20, b"Hi There").hex() == \
+        "51b00d1fb49832bfb01c3ce27848e59f871d9ba938dc563b338ca964755cce70"
+    assert hmac_sm3(b"\xaa" * 100, b"Test Using Larger Than Block-Size Key - Hash Key First").hex() == \
+        "ddfd727df11b435760f1fa6638e2c059a66a74da8432815201915246e6211294"
+
+    #与标准库hmac（以SM3为摘要构造器）一致；增量接口与copy
+    key = SM3HMACKey(b"secret key")
+    for message in (b"", b"short", bytes(range(256)) * 3):
+        tag = key.mac(message)
+        assert tag == hmac.new(b"secret key", message, SM3).digest() == hmac_sm3(b"secret key", message)
+        assert key.verify(message, tag) and not key.verify(message + b"!", tag)
+    h = key.new(b"part one, ")
+    h2 = h.copy()
+    h.update(b"part two")
+    assert h.digest() == key.mac(b"part one, part two") and h.hexdigest() == h.digest().hex()
+    assert h2.digest() == SM3HMAC(b"secret key", b"part one, ").digest(), "HMAC.copy中间状态错误"
+
+    #缓存内外层中间状态后，短消息MAC只需2次压缩（在纯Python实现上计数压缩函数调用）
+    tag_55 = key.mac(b"x" * 55)
+    compress, calls = sm3_module._compress, []
+    sm3_class, sm3_module.SM3 = sm3_module.SM3, sm3_module.PythonSM3
+    try:
+        python_key = SM3HMACKey(b"secret key")
+        sm3_module._compress = lambda *args: calls.append(1) or compress(*args)
+        assert python_key.mac(b"x" * 55) == tag_55
+        assert len(calls) == 2, f"短消息MAC应为2次压缩，实际{len(calls)}次"
+    finally:
+        sm3_module._compress = compress
+        sm3_module.SM3 = sm3_class
+
+    #HKDF（RFC 5869 A.1/A.2的输入，摘要为SM3）
+    ikm = b"\x0b" * 22
+    prk = hkdf_extract(bytes(range(13)), ikm)
+    assert prk.hex() == "e0d6f7b0bd056327b7659f1f39ad850561fbcf4fb10fb58e88eafa55cf7cd01e"
+    okm = hkdf_expand(prk, bytes(range(0xf0, 0xfa)), 42)
+    assert okm.hex() == "c69fe91b7aaee2dd5718d72dcaee0cce93f1b8e41f792da51261b6a517e68b36ed2c595572b01dfa359b"
+    assert hkdf(ikm, 42, bytes(range(13)), bytes(range(0xf0, 0xfa))) == okm
+    assert hkdf(ikm, 82).hex() == "c8c91a38ae2fb3b023a7c38ce9f0748f28230d59b6b950ba3ba949bf0d713a57" \
+        "74815778801741cb2034291acb392784c3fe1cd353149e62551c19803bf8beec7f5a0c18d7a17c9dd1a10e6daac5ac1a6a7b"
+    assert hkdf(ikm, 10) == hkdf(ikm, 82)[:10] and hkdf(ikm, 0) == b""
+    try:
+        hkdf_expand(prk, b"", 255 * 32 + 1)
+        assert False, "HKDF输出过长应被拒绝"
+    except ValueError:
+        pass
+    print("HMAC-SM3/HKDF测试通过")
+
+def test_sm3_sum():
+    #测试sm3sum：mmap分块哈希、进程池并发、coreutils格式输出与--check校验
+    import io
+    import os
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        contents = {"empty": b"", "abc": b"abc", "block": bytes(range(64)), "large": os.urandom(5000),
+                    "we\\ird\nname": b"escaped"}
+        paths = []
+        for name, data in contents.items():
+            path = os.path.join(directory, name)
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+            assert SM3_Sum.sm3_file(path, chunk_size=100) == sm3_hash(data), f"文件哈希错误: {name}"
+
+        #清单按参数顺序输出（进程池按大小降序调度）
+        out, err = io.StringIO(), io.StringIO()
+        assert SM3_Sum.main(["-j", "2", "--chunk-size", "128"] + paths, out, err) == 0
+        lines = out.getvalue().splitlines()
+        assert lines[1] == f"{sm3_hash(b'abc').hex()}  {paths[1]}"
+        assert lines[-1].startswith("\\") and "\\\\ird\\nname" in lines[-1], "特殊文件名应转义"
+        assert [SM3_Sum.parse_line(line) for line in lines] == \
+            [(path, sm3_hash(data).hex()) for path, data in zip(paths, contents.values())]
+        tagged = io.StringIO()
+        SM3_Sum.main(["--tag", paths[1]], tagged)
+        assert tagged.getvalue() == f"SM3 ({paths[1]}) = {sm3_hash(b'abc').hex()}\n"
+
+        #--check：全部通过；篡改文件、删除文件后失败
+        manifest = os.path.join(directory, "SM3SUMS")
+        with open(manifest, "w", encoding="utf-8", newline="") as f:
+            f.write(out.getvalue() + tagged.getvalue())
+        out = io.StringIO()
+        assert SM3_Sum.main(["-c", "-j", "2", manifest], out, io.StringIO()) == 0
+        assert out.getvalue().count(": OK") == len(contents) + 1
+        with open(paths[1], "wb") as f:
+            f.write(b"abd")
+        os.remove(paths[3])
+        out, err = io.StringIO(), io.StringIO()
+        assert SM3_Sum.main(["-c", manifest], out, err) == 1
+        assert f"{paths[1]}: FAILED\n" in out.getvalue() and f"{paths[3]}: FAILED open or read" in out.getvalue()
+        assert "2 computed checksums did NOT match" in err.getvalue() and "1 listed file could not be read" in err.getvalue()
+        out = io.StringIO()
+        assert SM3_Sum.main(["-c", "--status", manifest], out, io.StringIO()) == 1 and not out.getvalue()
+
+        #非普通文件（FIFO、管道，其st_size为0）按块读取，不能当作空文件
+        if hasattr(os, "mkfifo"):
+            import threading
+            fifo = os.path.join(directory, "fifo")
+            os.mkfifo(fifo)
+            data = os.urandom(3000)
+            def writer():
+                with open(fifo, "wb") as f:
+                    f.write(data)
+            thread = threading.Thread(target=writer)
+            thread.start()
+            assert SM3_Sum.sm3_file(fifo, chunk_size=128) == sm3_hash(data), "FIFO哈希错误"
+            thread.join()
+        if os.path.isdir("/dev/fd"):
+            read_fd, write_fd = os.pipe()
+            os.write(write_fd, b"abc")
+            os.close(write_fd)
+            try:
+                assert SM3_Sum.sm3_file(f"/dev/fd/{read_fd}") == sm3_hash(b"abc"), "管道哈希错误"
+            finally:
+                os.close(read_fd)
+    print("sm3sum测试通过")
+
 def test_precomputed_table():
-    #测试固定点预计算表正确性
-    #验证2G = G + G
-    G_double = G + G
-    assert precomputed_G[1] == G_double, "预计算表索引1错误"
-    #验证4G = 2G + 2G
-    G_4 = precomputed_G[1] + precomputed_G[1]
-    assert precomputed_G[2] == G_4, "预计算表索引2错误"
-    #验证8G = 4G + 4G
-    G_8 = precomputed_G[2] + precomputed_G[2]
-    assert precomputed_G[3] == G_8, "预计算表索引3错误"
+    #测试固定点窗口预计算表正确性：table[i][j] = j * 2^(w*i) * G
+    precomputed_G = get_precomputed_table()
+    w = precomputed_G.window
+    table = precomputed_G.table
+    assert table[0][1] == G, "预计算表索引(0,1)错误"
+    assert table[0][3] == G.multiply(3), "预计算表索引(0,3)错误"
+    assert table[1][1] == G.multiply(1 << w), "预计算表索引(1,1)错误"
+    assert table[2][5] == G.multiply(5 << (2 * w)), "预计算表索引(2,5)错误"
+    assert all(P.z == 1 for row in table for P in row[1:]), "预计算点应为仿射坐标"
+    
+    #不同窗口宽度的固定点点乘与普通点乘一致
+    for window in (1, 3, 5):
+        fixed = FixedBaseTable(G, window)
+        for k in (1, 2, (1 << 200) + 12345, n - 1):
+            assert fixed.multiply(k) == G.multiply(k), f"窗口宽度{window}点乘错误"
+    for k in (1, n - 1, 0xDEADBEEF << 128):
+        assert multiply_fixed(k) == G.multiply(k), "multiply_fixed结果错误"
     print("固定点预计算表测试通过")
 
+def test_table_cache():
+    #测试预计算表磁盘缓存：写入/载入一致，损坏或参数不符时拒绝载入
+    import os, tempfile
+    table = FixedBaseTable(G, 3)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "table.bin")
+        assert save_table_cache(table, path)
+        loaded = load_table_cache(3, path)
+        assert loaded is not None and loaded.to_bytes() == table.to_bytes(), "缓存载入结果不一致"
+        assert loaded.multiply(n - 2) == G.multiply(n - 2)
+        
+        #窗口宽度不符
+        assert load_table_cache(4, path) is None, "窗口宽度不符的缓存应被拒绝"
+        
+        #篡改任一字节后校验失败
+        with open(path, "r+b") as f:
+            f.seek(100)
+            byte = f.read(1)
+            f.seek(100)
+            f.write(bytes([byte[0] ^ 1]))
+        assert load_table_cache(3, path) is None, "损坏的缓存应被拒绝"
+        assert load_table_cache(3, os.path.join(tmp, "missing.bin")) is None
+    print("预计算表磁盘缓存测试通过")
+
 def test_co_z_addition():
     #测试Co-Z点加优化正确性
     P = G.multiply(3)
@@ -41,6 +438,147 @@ def test_co_z_addition():
     assert co_z_result == normal_result, "Co-Z点加结果错误"
     print("Co-Z点加测试通过")
 
+def test_point_core():
+    #测试元组点运算核心：倍点/互逆点的退化处理与ECPoint接口结果一致
+    from SM2_Base import a
+    P = G.multiply(7)
+    Q = G.multiply(11)
+    Pa = P.to_affine()
+    assert not hasattr(P, '__dict__'), "点对象应使用__slots__"
+    assert P + P == P.double() == G.multiply(14), "H == 0时应退化为倍点"
+    assert (P + -P).is_infinity and P.add_mixed(-Pa).is_infinity, "互逆点之和应为无穷远点"
+    assert P.add_mixed(Pa) == G.multiply(14)
+    assert P + Q == Q + P == G.multiply(18)
+
+    X, Y, Z = jacobian_add(*P.jacobian(), *Q.jacobian(), a, p, p.__rmod__)
+    assert ECPoint(X, Y, z=Z) == G.multiply(18)
+    assert jacobian_add(*JACOBIAN_INFINITY, *P.jacobian(), a, p, p.__rmod__) == P.jacobian()
+    assert jacobian_add_mixed(*JACOBIAN_INFINITY, Pa.x, Pa.y, a, p, p.__rmod__) == (Pa.x, Pa.y, 1)
+    assert jacobian_double(*JACOBIAN_INFINITY, a, p, p.__rmod__)[2] == 0
+    print("元组点运算核心测试通过")
+
+def test_co_z_ladder():
+    #测试共Z Montgomery阶梯与各点乘策略结果一致（含例外标量与标准曲线）
+    import random
+    for curve in (get_curve(), get_curve('sm2p256v1'), get_curve('sm2p256v1', 'solinas')):
+        P = curve.G.multiply(random.randrange(2, curve.n))
+        scalars = [0, 1, 2, 3, curve.n - 3, curve.n - 2, curve.n - 1, curve.n, curve.n + 2]
+        scalars += [random.randrange(curve.n) for _ in range(10)]
+        for k in scalars:
+            expected = P.multiply(k)
+            result = P.multiply_ladder(k)
+            assert result == expected, f"共Z阶梯点乘结果错误: {k}"
+            assert result.is_infinity or result.z == 1, "阶梯点乘应返回仿射坐标"
+        for strategy in SCALAR_MULT_STRATEGIES:
+            assert P.multiply_non_fixed(scalars[-1], strategy) == P.multiply(scalars[-1])
+    import os, SM2_Base
+    assert SM2_Base.NON_FIXED_STRATEGY == os.environ.get('SM2_OPTI_SCALAR_MULT', 'naf'), "阶梯应为可选策略，默认NAF"
+    print("共Z阶梯点乘测试通过")
+
+def test_operation_counts():
+    #运算计数：各点乘策略的点运算/域运算次数符合算法结构，退出后恢复原函数
+    import SM2_Base
+    curve = get_curve()
+    originals = (SM2_Base.jacobian_double, SM2_Base._xycz_add, ECPoint.add_co_z, curve.field.reduce)
+    P = G.multiply(12345).to_affine()
+    k = n - 987654321
+    with count_operations() as ops:
+        R = P.multiply_ladder(k)
+    assert ops.co_z_add == 2 * n.bit_length() and ops.inv == 1 and ops.add == ops.dbl == 0, "阶梯计数错误"
+    assert (SM2_Base.jacobian_double, SM2_Base._xycz_add, ECPoint.add_co_z, curve.field.reduce) == originals
+    assert 'inv' not in vars(curve.field), "计数结束后应恢复域后端"
+    with count_operations() as ops:
+        assert P.multiply(k).to_affine() == R
+    assert ops.dbl == k.bit_length() - 1 and ops.inv == 1 and ops.co_z_add == 0
+    assert ops.mul + ops.sqr == ops.reductions and ops.sqr >= 6 * ops.dbl
+    with count_operations() as ops:
+        multiply_fixed(k)
+    assert ops.dbl == 0 and ops.inv == 0 and 0 < ops.add <= get_precomputed_table().num_windows
+    conversions = 3 if curve.field.domain else 0  #蒙哥马利域出口转回X, Y, Z
+    assert ops.mul == 8 * ops.add + conversions and ops.sqr == 3 * ops.add, "混合点加应为8M + 3S"
+    #只统计指定曲线
+    other = get_curve('sm2p256v1')
+    with count_operations() as ops:
+        other.G.multiply(k)
+    assert not any(ops.as_dict().values())
+    with count_operations(other) as ops:
+        other.G.multiply_ladder(k)
+    assert ops.co_z_add == 2 * other.n.bit_length()
+
+    #每种高层操作的运算代价表（只统计SM2_Base中的点运算与域运算）
+    d, Q = generate_key()
+    cipher = encrypt(Q, b"cost")
+    rows = [("multiply_fixed", lambda: multiply_fixed(k)),
+            ("naf", lambda: P.multiply(k)),
+            ("ladder", lambda: P.multiply_ladder(k)),
+            ("co_z_naf", lambda: P.multiply_co_z_naf(k)),
+            ("multiply_joint", lambda: multiply_joint(k, k + 1, P)),
+            ("encrypt", lambda: encrypt(Q, b"cost")),
+            ("decrypt", lambda: decrypt(d, cipher))]
+    print("运算代价表: " + " ".join(f"{kind:>8}" for kind in OPERATION_KINDS))
+    for label, fn in rows:
+        with count_operations() as ops:
+            fn()
+        print(f"  {label:<15}" + " ".join(f"{count:>8}" for count in ops.as_dict().values()))
+    print("运算计数测试通过")
+
+def test_batch_normalize():
+    #测试Montgomery联合求逆与批量仿射转换
+    values = [3, 5, 0x1234567, p - 1]
+    assert batch_inverse(values, p) == [mod_inverse(v, p) for v in values], "联合求逆错误"
+    assert batch_inverse([], p) == []
+    
+    points = [G.multiply(3), ECPoint(0, 0, is_infinity=True), G.multiply(n - 1), G]
+    normalized = batch_normalize(points)
+    assert normalized[1].is_infinity
+    for P, A in zip(points, normalized):
+        assert A == P and (A.is_infinity or A.z == 1), "批量仿射转换错误"
+    
+    #批量密钥生成与批量加密
+    for k, Q in generate_keys(3):
+        assert Q.z == 1 and Q == multiply_fixed(k)
+    k, Q = generate_key()
+    plaintexts = [b"", b"batch", b"\x00" * 40]
+    for cipher, plaintext in zip(encrypt_batch(Q, plaintexts), plaintexts):
+        assert decrypt(k, cipher) == plaintext, "批量加密结果错误"
+    print("批量仿射转换测试通过")
+
+def test_joint_multiplication():
+    #测试交错wNAF联合点乘s*G + t*Q
+    for k in (1, 7, 0xFFFF, n - 1):
+        for width in (2, 4, 5):
+            digits = wnaf(k, width)
+            assert sum(d << i for i, d in enumerate(digits)) == k, "wNAF编码错误"
+    
+    Q = G.multiply(0x123456789ABCDEF)
+    for s, t in ((1, 1), (n - 1, 2), (0xABCDEF << 200, n - 3), (5, 0), (0, 9)):
+        for window in (3, 5):
+            expected = G.multiply(s) + Q.multiply(t)
+            assert multiply_joint(s, t, Q, window) == expected, f"联合点乘错误：s={s}, t={t}"
+    #s*G + t*Q为无穷远点
+    assert multiply_joint(5, n - 5, G).is_infinity
+    print("联合点乘测试通过")
+
+def test_key_table_cache():
+    #测试公钥预计算表缓存：升级为固定点路径前后结果一致，超出内存预算时LRU淘汰
+    cache = KeyTableCache(promote_after=3, fixed_window=3)
+    Q = G.multiply(0xC0FFEE)
+    for i in range(5):
+        k = (0x1234 << (40 * i)) + i
+        assert cache.multiply(Q, k) == Q.multiply(k), f"第{i + 1}次公钥点乘错误"
+        assert cache.multiply_joint(k, n - k - 1, Q) == G.multiply(k) + Q.multiply(n - k - 1)
+    assert cache.promotions == 1 and cache.entry(Q).fixed is not None, "公钥未升级为固定点表"
+    assert (cache.hits, cache.misses) == (10, 1)
+    
+    #内存预算只够容纳一个公钥时，旧公钥被淘汰
+    small = KeyTableCache(memory_budget=1, promote_after=0)
+    Q2 = G.multiply(7)
+    small.multiply(Q, 5)
+    small.multiply(Q2, 5)
+    assert len(small) == 1 and small.evictions == 1
+    assert small.multiply(Q, 5) == Q.multiply(5) and small.misses == 3
+    print("公钥预计算表缓存测试通过")
+
 def test_encrypt_decrypt():
     #测试加解密流程完整性
     k, Q = generate_key()
@@ -54,8 +592,196 @@ def test_encrypt_decrypt():
         cipher = encrypt(Q, plaintext)
         decrypted = decrypt(k, cipher)
         assert decrypted == plaintext, f"加解密失败，明文: {plaintext}"
+
+    #C2使用GB/T 32918.4的KDF：与流式接口互通，GB/T 32918.5示例密文可由decrypt解密
+    import io
+    plaintext = bytes(range(100))
+    out = io.BytesIO()
+    decrypt_stream(k, io.BytesIO(encode_ciphertext(encrypt(Q, plaintext), "C1C2C3")), out)
+    assert out.getvalue() == plaintext, "encrypt的密文应能由decrypt_stream解密"
+    stream = io.BytesIO()
+    encrypt_stream(Q, io.BytesIO(plaintext), stream)
+    assert decrypt(k, decode_ciphertext(stream.getvalue(), "C1C2C3")) == plaintext, \
+        "encrypt_stream的密文应能由decrypt解密"
+    curve = get_curve('sm2p256v1')
+    d = 0x3945208F7B2144B13F36E38AC6D39F95889393692860B51A42FB81EF4DF7C5B8
+    cipher = bytes.fromhex(
+        "04" "04EBFC718E8D1798620432268E77FEB6415E2EDE0E073C0F4F640ECD2E149A73"
+        "E858F9D81E5430A57B36DAAB8F950A3C64E6EE6A63094D99283AFF767E124DF0"
+        "21886CA989CA9C7D58087307CA93092D651EFA"
+        "59983C18F809E262923C53AEC295D30383B54E39D609D160AFCB1908D0BD8766")
+    assert decrypt(d, decode_ciphertext(cipher, "C1C2C3", curve), curve) == b"encryption standard", \
+        "标准示例密文解密错误"
+
+    #B1：C1不在曲线上时拒绝解密
+    (x1, y1), c2, c3 = encrypt(Q, b"abc")
+    for bad in (((x1, y1 + 1), c2, c3), ((x1, Q.curve.p + y1), c2, c3)):
+        try:
+            decrypt(k, bad)
+            assert False, "C1不在曲线上时应解密失败"
+        except ValueError:
+            pass
+
+    #A5/B4：t全为0时加密换k重试（C2不能等于明文），解密报错
+    import SM2 as sm2_module
+    kdf_function, calls = sm2_module.kdf, []
+    def zero_once(Z, klen):
+        calls.append(klen)
+        return bytes(klen) if len(calls) == 1 else kdf_function(Z, klen)
+    try:
+        sm2_module.kdf = zero_once
+        cipher = encrypt(Q, b"x")
+        assert len(calls) == 2 and cipher[1] != b"x", "t全为0时应重新选取k"
+        calls.clear()
+        assert [c[1] != b"x" for c in encrypt_batch(Q, [b"x", b"x"])] == [True, True]
+        assert decrypt(k, cipher) == b"x"
+        sm2_module.kdf = lambda Z, klen: bytes(klen)
+        try:
+            decrypt(k, cipher)
+            assert False, "t全为0时应解密失败"
+        except ValueError:
+            pass
+    finally:
+        sm2_module.kdf = kdf_function
+    blocks_function = sm2_module.kdf_blocks
+    def zero_first(Z):
+        blocks = blocks_function(Z)
+        if not calls:
+            calls.append(1)
+            next(blocks)
+            yield bytes(32)
+        yield from blocks
+    try:
+        calls.clear()
+        sm2_module.kdf_blocks = zero_first
+        stream = io.BytesIO()
+        encrypt_stream(Q, io.BytesIO(b"x"), stream)
+        assert stream.getvalue()[65:66] != b"x", "流式加密第一个密钥流分组全为0时应重新选取k"
+        calls.clear()
+        try:
+            decrypt_stream(k, io.BytesIO(stream.getvalue()), io.BytesIO())
+            assert False, "流式解密第一个密钥流分组全为0时应失败"
+        except ValueError:
+            pass
+    finally:
+        sm2_module.kdf_blocks = blocks_function
     print("加解密流程测试通过")
 
+def test_xor_keystream():
+    #测试KDF密钥流的整块异或与逐字节异或结果逐字节一致（含NumPy路径阈值两侧）
+    import os
+    for length in (0, 1, 31, 32, 33, 1000, 4095, 4096, 10001):
+        data = os.urandom(length)
+        key = kdf(b"keystream", length)
+        expected = bytes([c ^ key[i] for i, c in enumerate(data)])
+        assert xor_bytes(data, key) == expected, f"整块异或结果错误: {length}"
+        assert xor_bytes(expected, key) == data
+    assert xor_bytes(b"\x00\xff", b"\xff\xff\x01") == b"\xff\x00"
+    print("整块异或测试通过")
+
+def test_stream_encrypt():
+    #测试流式加解密：GB/T 32918.5示例密文、不同分块大小的往返与篡改检测
+    import io
+    curve = get_curve('sm2p256v1')
+    d = 0x3945208F7B2144B13F36E38AC6D39F95889393692860B51A42FB81EF4DF7C5B8
+    cipher = bytes.fromhex(
+        "04" "04EBFC718E8D1798620432268E77FEB6415E2EDE0E073C0F4F640ECD2E149A73"
+        "E858F9D81E5430A57B36DAAB8F950A3C64E6EE6A63094D99283AFF767E124DF0"
+        "21886CA989CA9C7D58087307CA93092D651EFA"
+        "59983C18F809E262923C53AEC295D30383B54E39D609D160AFCB1908D0BD8766")
+    for chunk_size in (1, 7, 1 << 16):
+        out = io.BytesIO()
+        assert decrypt_stream(d, io.BytesIO(cipher), out, curve, chunk_size) == 19
+        assert out.getvalue() == b"encryption standard", "标准示例解密错误"
+    assert len(kdf(b"\x00" * 64, 100)) == 100 and kdf(b"\x00" * 64, 100)[:32] == kdf(b"\x00" * 64, 32)
+
+    k, Q = generate_key()
+    for message in (b"", b"a", bytes(range(256)) * 5):
+        for chunk_size in (3, 32, 1 << 16):
+            encrypted = io.BytesIO()
+            assert encrypt_stream(Q, io.BytesIO(message), encrypted, chunk_size) == len(message)
+            data = encrypted.getvalue()
+            assert len(data) == 65 + len(message) + 32
+            decrypted = io.BytesIO()
+            decrypt_stream(k, io.BytesIO(data), decrypted, chunk_size=chunk_size)
+            assert decrypted.getvalue() == message, "流式加解密结果不一致"
+    tampered = bytearray(data)
+    tampered[70] ^= 1
+    for bad in (bytes(tampered), data[:-1], data[:64], b"\x04" + bytes(96)):
+        try:
+            decrypt_stream(k, io.BytesIO(bad), io.BytesIO())
+            assert False, "篡改密文应解密失败"
+        except ValueError:
+            pass
+    print("流式加解密测试通过")
+
+def test_codec():
+    #测试点/密文/签名/私钥的二进制编码
+    import io
+    for curve in (get_curve(), get_curve('sm2p256v1')):
+        for k in (1, 2, 3, 0x1234567, curve.n - 1):
+            P = multiply_fixed(k, curve)
+            full, short = encode_point(P), encode_point(P, compressed=True)
+            assert len(full) == 65 and len(short) == 33 and short[0] in (2, 3)
+            for data in (full, short, bytearray(short), memoryview(b"pad" + short)[3:]):
+                Q = decode_point(data, curve)
+                assert Q == P and Q.z == 1, "点解码错误"
+        assert decode_point(encode_point(curve.G.infinity()), curve).is_infinity
+        x = curve.Gx + 1
+        while True:  #找一个不在曲线上的x
+            try:
+                sqrt_mod(x ** 3 + curve.a * x + curve.b, curve.p)
+                x += 1
+            except ValueError:
+                break
+        for bad in (b"\x02" + x.to_bytes(32, "big"), full[:-1] + bytes([full[-1] ^ 1]), b"\x05" + full[1:], full[:40]):
+            try:
+                decode_point(bad, curve)
+                assert False, "非法点编码应被拒绝"
+            except ValueError:
+                pass
+    assert sqrt_mod(4, 13) in (2, 11) and sqrt_mod(10, 13) in (6, 7)  #p ≡ 1 (mod 4)走Tonelli-Shanks
+
+    #密文：两种排列 × 压缩/未压缩，解码结果可直接解密
+    k, Q = generate_key()
+    cipher = encrypt(Q, b"codec test")
+    for mode in ("C1C3C2", "C1C2C3"):
+        for compressed in (False, True):
+            data = encode_ciphertext(cipher, mode, compressed)
+            assert len(data) == (33 if compressed else 65) + 32 + len(b"codec test")
+            assert decode_ciphertext(memoryview(data), mode) == cipher
+            assert decrypt(k, decode_ciphertext(data, mode)) == b"codec test"
+    assert encode_ciphertext(cipher, "C1C3C2")[65:97] == cipher[2]
+    #流式接口的压缩C1
+    out, dec = io.BytesIO(), io.BytesIO()
+    encrypt_stream(Q, io.BytesIO(b"compressed"), out, compressed=True)
+    assert len(out.getvalue()) == 33 + 10 + 32
+    decrypt_stream(k, io.BytesIO(out.getvalue()), dec)
+    assert dec.getvalue() == b"compressed"
+
+    #签名：原始r || s与DER
+    signature = (n - 1, 0x80)
+    assert decode_signature(encode_signature(signature)) == signature
+    assert encode_signature_der((1, 0x80)).hex() == "3007020101020200" "80"
+    for sig in ((1, 1), (0x80, 0x7F), signature, (2 ** 255 + 1, 2 ** 200)):
+        assert decode_signature_der(encode_signature_der(sig)) == sig
+    for bad in ("3007020101020200800" "0", "300702010102020080"[:-2], "3008020200010202" "0080",
+                "30070201ff02020080", "3081070201010202" "0080"):
+        try:
+            decode_signature_der(bytes.fromhex(bad))
+            assert False, "非法DER应被拒绝"
+        except ValueError:
+            pass
+
+    assert decode_private_key(encode_private_key(k)) == k
+    for bad in (bytes(32), n.to_bytes(32, "big"), b"\x01"):
+        try:
+            decode_private_key(bad)
+            assert False, "非法私钥应被拒绝"
+        except ValueError:
+            pass
+    print("二进制编码测试通过")
+
 def test_sign_verify():
     #测试签名验签功能
     signer = SM2Signature()
@@ -77,6 +803,196 @@ def test_sign_verify():
     
     print("签名验签测试通过")
 
+def test_key_handles():
+    #测试绑定密钥的签名/验签对象：与SM2Signature的签名互通
+    for curve in (get_curve(), get_curve('sm2p256v1')):
+        signer = SM2Signature(curve=curve)
+        d, Q = signer.generate_keypair()
+        ID = b'user123456'
+        private = SM2PrivateKeyHandle(d, ID, curve=curve)
+        public = SM2PublicKeyHandle(Q, ID)
+        assert private.Q == Q and private.Z == public.Z == compute_Z(ID, Q)
+        for i in range(5):
+            message = b'handle message %d' % i
+            signature = private.sign(message)
+            assert public.verify(message, signature) and private.verify(message, signature)
+            assert signer.verify(message, signature, Q, ID), "句柄签名应能被SM2Signature验证"
+            assert public.verify(message, signer.sign(message, d, Q, ID)), "句柄应能验证SM2Signature签名"
+            assert not public.verify(message + b'!', signature), "篡改消息验签应失败"
+        r, s = signature
+        assert not public.verify(message, (r, 0)) and not public.verify(message, (r, curve.n - r))
+        assert not SM2PublicKeyHandle(Q, b'other').verify(message, signature), "错误ID验签应失败"
+
+    #使用预签名池
+    with PresignPool(2, 4) as pool:
+        d, Q = SM2Signature().generate_keypair()
+        private = SM2PrivateKeyHandle(d, presign_pool=pool)
+        pool.wait_filled(timeout=10)
+        assert private.public_key.verify(b'pooled', private.sign(b'pooled'))
+        assert pool.hits == 1
+    for bad in (0, n - 1):
+        try:
+            SM2PrivateKeyHandle(bad)
+            assert False, "非法私钥应被拒绝"
+        except ValueError:
+            pass
+    print("密钥句柄测试通过")
+
+def test_verify_batch():
+    #测试批量验签：结果与逐条验签一致，支持多公钥、多ID与进程池模式
+    signer = SM2Signature()
+    keys = [signer.generate_keypair() for _ in range(3)]
+    items = []
+    expected = []
+    for i in range(12):
+        d, Q = keys[i % 3]
+        ID = b'user%d' % (i % 2)
+        message = b'batch message %d' % i
+        signature = signer.sign(message, d, Q, ID)
+        if i % 5 == 0:
+            message += b'(tampered)'  #篡改部分消息
+        items.append((message, signature, Q, ID))
+        expected.append(i % 5 != 0)
+    items.append((b'no id', signer.sign(b'no id', *keys[0]), keys[0][1]))  #省略ID使用默认值
+    expected.append(True)
+    items.append((b'bad range', (0, 1), keys[0][1]))  #r越界
+    expected.append(False)
+    
+    assert [signer.verify(*item) for item in items] == expected
+    assert signer.verify_batch(items) == expected, "批量验签结果错误"
+    assert signer.verify_batch(items, processes=2) == expected, "进程池批量验签结果错误"
+    assert signer.verify_batch([]) == []
+    print("批量验签测试通过")
+
+def test_process_pool():
+    #测试多进程批量服务：结果按输入顺序返回，与单进程接口互通
+    for curve in (get_curve(), get_curve('sm2p256v1')):
+        d, Q = generate_key(curve)
+        messages = [b'pool message %d' % i for i in range(11)]
+        with SM2ProcessPool(d, ID=b'pool', processes=2, chunk_size=3, curve=curve) as pool:
+            assert pool.public_key == Q
+            verifier = SM2PublicKeyHandle(Q, b'pool')
+            signatures = list(pool.sign_many(iter(messages)))  #输入可为迭代器
+            assert len(signatures) == len(messages)
+            assert all(verifier.verify(m, sig) for m, sig in zip(messages, signatures)), "批量签名验签失败"
+            ciphers = list(pool.encrypt_many(messages))
+            assert [decrypt(d, c, curve) for c in ciphers] == messages, "批量加密结果应能被decrypt解密"
+            ciphers.append(encrypt(Q, b'single'))
+            assert list(pool.decrypt_many(ciphers)) == messages + [b'single'], "批量解密结果错误"
+            (x1, y1), c2, c3 = ciphers[4]
+            results = pool.decrypt_many(ciphers[:4] + [((x1, y1), c2, bytes(32))])
+            assert [next(results) for _ in range(4)] == messages[:4]
+            try:
+                next(results)
+                assert False, "C3校验失败应抛出ValueError"
+            except ValueError:
+                pass
+
+    #只有公钥时只能加密
+    d, Q = generate_key()
+    with SM2ProcessPool(public_key=Q, processes=1) as pool:
+        assert decrypt(d, next(pool.encrypt_many([b'public only']))) == b'public only'
+        try:
+            pool.sign_many([b'x'])
+            assert False, "无私钥时不能签名"
+        except ValueError:
+            pass
+    print("多进程批量服务测试通过")
+
+def test_z_cache():
+    #测试Z值LRU缓存：命中/未命中计数、容量淘汰、外部传入Z
+    signer = SM2Signature(z_cache_size=2)
+    d, Q = signer.generate_keypair()
+    _, Q2 = signer.generate_keypair()
+    _, Q3 = signer.generate_keypair()
+    ID = b'user123456'
+    
+    Z = signer.compute_Z(ID, Q)
+    assert Z == compute_Z(ID, Q)
+    assert signer.compute_Z(ID, Q) == Z
+    assert (signer.z_cache.hits, signer.z_cache.misses) == (1, 1)
+    
+    #Jacobian坐标表示的同一公钥命中同一缓存项
+    Q_jac = ECPoint(Q.x * 4 % p, Q.y * 8 % p, z=2)
+    assert signer.compute_Z(ID, Q_jac) == Z
+    assert signer.z_cache.hits == 2
+    
+    #超出容量时淘汰最久未使用项
+    signer.compute_Z(ID, Q2)
+    signer.compute_Z(ID, Q3)
+    assert len(signer.z_cache) == 2
+    signer.compute_Z(ID, Q)
+    assert signer.z_cache.misses == 4, "LRU淘汰错误"
+    
+    #传入预计算Z时不访问缓存
+    signer.z_cache.clear()
+    message = b"Z cache test"
+    signature = signer.sign(message, d, Q, ID, Z=Z)
+    assert signer.verify(message, signature, Q, ID, Z=Z)
+    assert signer.verify(message, signature, Q, ID)
+    assert (signer.z_cache.hits, signer.z_cache.misses) == (0, 1)
+    print("Z值缓存测试通过")
+
+def test_presign_pool():
+    #测试离线预签名池：签名可验证，(k, x1)只使用一次，低于低水位时自动补充
+    with PresignPool(low_watermark=2, high_watermark=6) as pool:
+        assert pool.wait_filled(timeout=30), "预签名池未能填充"
+        signer = SM2Signature(presign_pool=pool)
+        d, Q = signer.generate_keypair()
+        message = b"presign pool"
+        signatures = [signer.sign(message, d, Q) for _ in range(10)]
+        assert all(signer.verify(message, sig, Q) for sig in signatures), "预签名池签名验签失败"
+        assert len({sig[0] for sig in signatures}) == len(signatures), "随机数被重复使用"
+        assert pool.hits + pool.misses >= 10
+        assert pool.wait_filled(timeout=30), "预签名池未能重新补充"
+    assert len(pool) == 0  #关闭后丢弃未使用的随机数
+
+    #多线程与后台补充线程并发取用时计数不丢失
+    import threading
+    with PresignPool(low_watermark=4, high_watermark=8) as pool:
+        def worker():
+            for _ in range(25):
+                pool.take()
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert pool.hits + pool.misses == 100, "并发取用时命中/未命中计数丢失"
+    print("离线预签名池测试通过")
+
+def test_benchmark_compare():
+    #基准脚本的回退门限：吞吐量下降超过阈值时退出码为1，否则为0；公钥升级至多使用promote_after次
+    import json, os, sys, tempfile
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import SM2_Benchmark
+    from SM2_Base import key_tables
+    def report(rate):
+        stats = lambda ops: SM2_Benchmark._summarize([1 / ops] * 5)
+        return {'results': {'opti': {'sign/64': stats(rate), 'verify/64': stats(100.0)}}}
+    baseline = report(100.0)
+    assert SM2_Benchmark.compare(report(95.0), baseline, 0.10) == []
+    regressions = SM2_Benchmark.compare(report(80.0), baseline, 0.10)
+    assert [(name, metric) for name, metric, *_ in regressions] == [('opti', 'sign/64')]
+    assert abs(regressions[0][4] + 0.2) < 1e-9
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for label, data in (('baseline', baseline), ('pass', report(105.0)), ('regression', report(80.0))):
+            paths[label] = os.path.join(tmp, label + '.json')
+            with open(paths[label], 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+        for label, status in (('pass', 0), ('regression', 1)):
+            argv = ['--input', paths[label], '--compare', paths['baseline']]
+            assert SM2_Benchmark.main(argv) == status, f"基线比较退出码错误: {label}"
+        assert SM2_Benchmark.main(['--input', paths['regression'], '--compare', paths['baseline'],
+                                   '--threshold', '0.25']) == 0
+
+    _, Q = generate_key()
+    SM2_Benchmark._promote_keys([Q])
+    entry = key_tables.entry(Q)
+    assert entry.fixed is not None and entry.uses == key_tables.promote_after + 1
+    print("基准回退门限测试通过")
+
 def test_performance():
     #简单性能测试（对比优化前后）
     import time
@@ -101,10 +1017,32 @@ def test_performance():
 
 if __name__ == "__main__":
     test_montgomery_mul()
+    test_field_backends()
+    test_sm3_incremental()
+    test_sm3_backends()
+    test_sm3_many()
+    test_hmac_hkdf()
+    test_sm3_sum()
     test_precomputed_table()
+    test_table_cache()
     test_co_z_addition()
+    test_point_core()
+    test_co_z_ladder()
+    test_operation_counts()
+    test_batch_normalize()
+    test_joint_multiplication()
+    test_key_table_cache()
     test_encrypt_decrypt()
+    test_xor_keystream()
+    test_stream_encrypt()
+    test_codec()
     test_sign_verify()
+    test_key_handles()
+    test_process_pool()
+    test_z_cache()
+    test_verify_batch()
+    test_presign_pool()
+    test_benchmark_compare()
     test_performance()
     print("所有测试通过")
     
\ No newline at end of file
@@ -0,0 +1,41 @@
+//Project4-SM3中C++ SM3类的C接口封装，供SM3_Native.py经ctypes调用
+//编译时用-DSM3_HEADER指定要封装的头文件（SM3_Unrol.h或SM3_SIMD.h），与对应的.cpp一起编译为共享库
+//哈希状态由调用方分配sm3_native_state_size()字节的缓冲区，SM3对象只含整数成员，可直接memcpy复制
+//各函数的数据参数统一放在最后（指针, 长度），便于Python侧统一经缓冲区协议传参
+
+#include SM3_HEADER
+#include <cstring>
+#include <new>
+
+#if defined(_WIN32)
+#define SM3_API extern "C" __declspec(dllexport)
+#else
+#define SM3_API extern "C" __attribute__((visibility("default")))
+#endif
+
+SM3_API size_t sm3_native_state_size() {
+    return sizeof(SM3);
+}
+
+SM3_API void sm3_native_init(void* state) {
+    new (state) SM3();
+}
+
+SM3_API void sm3_native_update(void* state, const uint8_t* data, size_t len) {
+    static_cast<SM3*>(state)->update(data, len);
+}
+
+//final会修改状态，这里先复制一份，原状态可继续update
+SM3_API void sm3_native_digest(const void* state, uint8_t* out) {
+    alignas(SM3) unsigned char copy[sizeof(SM3)];
+    std::memcpy(copy, state, sizeof(SM3));
+    std::vector<uint8_t> digest = reinterpret_cast<SM3*>(copy)->final();
+    std::memcpy(out, digest.data(), SM3_DIGEST_SIZE);
+}
+
+SM3_API void sm3_native_hash(uint8_t* out, const uint8_t* data, size_t len) {
+    SM3 sm3;
+    sm3.update(data, len);
+    std::vector<uint8_t> digest = sm3.final();
+    std::memcpy(out, digest.data(), SM3_DIGEST_SIZE);
+}